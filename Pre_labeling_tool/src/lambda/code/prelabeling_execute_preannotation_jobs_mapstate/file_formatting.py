@@ -1,45 +1,36 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: MIT-0
 
-import copy
+from helpers.block_graph import BlockGraph
+from helpers.compact_blocks import block_dict
 
 
 def get_blocks_for_block_file(blocks):
     saved_blocks = []
     for block in blocks:
-        local_block = copy.copy(block)
-        if local_block["BlockType"] == "LINE":
-            local_block["Page"] = 1
-            local_block["parentBlockIndex"] = -1
-            local_block["blockIndex"] = 0
-            saved_blocks.append(local_block)
-        elif local_block["BlockType"] == "WORD":
-            local_block["Page"] = 1
-            local_block["parentBlockIndex"] = 0
-            local_block["blockIndex"] = 1
-            saved_blocks.append(local_block)
+        if block["BlockType"] == "LINE":
+            saved_blocks.append(
+                block_dict(block, Page=1, parentBlockIndex=-1, blockIndex=0)
+            )
+        elif block["BlockType"] == "WORD":
+            saved_blocks.append(
+                block_dict(block, Page=1, parentBlockIndex=0, blockIndex=1)
+            )
 
     return saved_blocks
 
 
-def get_blocks_for_annotation_file(blocks):
+def get_blocks_for_annotation_file(blocks, block_graph=None):
+    if block_graph is None:
+        block_graph = BlockGraph(blocks)
     saved_blocks = []
     for block in blocks:
-        local_block = copy.copy(block)
-        if local_block["BlockType"] == "LINE":
-            local_block["Page"] = 1
-
-            saved_blocks.append(local_block)
-            child_blocks = []
-            for relatives in local_block['Relationships']:
-                if relatives["Type"] == 'CHILD':
-                    child_blocks = [
-                        c_block for c_block in blocks if c_block["Id"] in relatives["Ids"]]
+        if block["BlockType"] == "LINE":
+            saved_blocks.append(block_dict(block, Page=1))
+            child_blocks = block_graph.children(block)
             for child in child_blocks:
 
                 if child["BlockType"] == "WORD":
-                    child["Relationships"] = []
-                    child["Page"] = 1
-                    saved_blocks.append(child)
+                    saved_blocks.append(block_dict(child, Relationships=[], Page=1))
 
-    return saved_blocks
\ No newline at end of file
+    return saved_blocks
@@ -0,0 +1,42 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Id-indexed view of the Textract blocks of one page."""
+
+
+class BlockGraph(object):
+    """Index of the blocks of a page by Id with the children of every LINE resolved once."""
+
+    def __init__(self, blocks):
+        """
+        Index the blocks and resolve the CHILD relationships of the LINE blocks.
+
+        :param blocks: Textract blocks of one page
+        """
+        self.blocks = blocks
+        self.blocks_by_id = {}
+        self.positions = {}
+        for position, block in enumerate(blocks):
+            self.blocks_by_id[block["Id"]] = block
+            self.positions[block["Id"]] = position
+        self.line_children = {}
+        for block in blocks:
+            if block["BlockType"] == "LINE":
+                self.line_children[block["Id"]] = self._resolve_children(block)
+
+    def children(self, block):
+        """Return the child blocks of a block in page order."""
+        if block["Id"] in self.line_children:
+            return self.line_children[block["Id"]]
+        return self._resolve_children(block)
+
+    def _resolve_children(self, block):
+        """Look up the blocks referenced by the (last) CHILD relationship of a block."""
+        child_ids = []
+        for relatives in block.get("Relationships") or []:
+            if relatives["Type"] == "CHILD":
+                child_ids = relatives["Ids"]
+        positions = sorted(
+            {self.positions[c_id] for c_id in child_ids if c_id in self.positions}
+        )
+        return [self.blocks[position] for position in positions]
@@ -0,0 +1,38 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Block files of the pages stored once under the hash of their content, the annotation files reference them."""
+
+import hashlib
+
+# shared by all executions, a page processed again (e.g. by a rematch) gets the key of its first block file
+BLOCK_STORE_FOLDER = "prelabeling/textract-blocks/"
+
+
+def block_store_key(content):
+    """
+    Return the name of a block file in the store.
+
+    :param content: serialized block file (str or bytes)
+    :return: hex sha256 digest of the content followed by .json
+    """
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return hashlib.sha256(content).hexdigest() + ".json"
+
+
+def store_block_content(content, s3_helper, bucket, folder=BLOCK_STORE_FOLDER):
+    """
+    Write a block file to the store.
+
+    :param content: serialized block file (str or bytes)
+    :param s3_helper: S3Helper (or S3Writer) used to write the file
+    :param bucket: bucket of the store, e.g. the output bucket of the tool
+    :param folder: folder of the store in the bucket, ending with "/"
+    :return: s3 uri of the block file, the same for the same content
+    """
+    s3_uri = s3_helper.s3_uri_from_bucket_folder_file(
+        bucket, folder, block_store_key(content)
+    )
+    s3_helper.write_content(s3_uri, content)
+    return s3_uri
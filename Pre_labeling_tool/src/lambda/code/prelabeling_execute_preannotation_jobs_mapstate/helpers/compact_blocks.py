@@ -0,0 +1,197 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Compact form of the LINE and WORD blocks of a page, the only blocks and fields the matching and the files use."""
+
+import sys
+from array import array
+
+# the PAGE blocks are only needed to split a document into pages, before the blocks are compacted
+COMPACT_BLOCK_TYPES = ("LINE", "WORD")
+# order of the BoundingBox values at the start of CompactBlock.geometry, the X, Y of the Polygon points follow
+BOUNDING_BOX_KEYS = ("Width", "Height", "Left", "Top")
+# fields read as they are through the mapping interface
+PLAIN_FIELDS = ("BlockType", "Confidence", "Text", "TextType", "Id", "Page")
+
+
+class CompactBlock(object):
+    """
+    LINE or WORD block stored in slots with its geometry in a single array of floats.
+
+    A Textract block is a dict of nested dicts and lists, its geometry alone is 7 dicts of Python floats. The
+    blocks are read by the matching like dicts, so a CompactBlock answers block["Text"], block.get("Geometry")
+    and block.get("Relationships") the same way. The Textract dict is rebuilt by to_dict when the files are written.
+    """
+
+    __slots__ = (
+        "BlockType",
+        "Confidence",
+        "Text",
+        "TextType",
+        "Id",
+        "Page",
+        "geometry",
+        "relationships",
+    )
+
+    def __init__(
+        self,
+        BlockType,
+        Id,
+        Text,
+        Confidence=None,
+        TextType=None,
+        Page=None,
+        geometry=None,
+        relationships=None,
+    ):
+        """
+        :param BlockType: "LINE" or "WORD"
+        :param Id: Id of the block
+        :param Text: text of the block
+        :param Confidence: confidence of the text, None if the block has none
+        :param TextType: "PRINTED" or "HANDWRITING", None if the block has none
+        :param Page: page of the block in its document, None if the block has none
+        :param geometry: array of the BoundingBox values in BOUNDING_BOX_KEYS order and of the X, Y of every Polygon
+                         point, None if the block has no geometry
+        :param relationships: tuple of (Type, tuple of Ids), None if the block has no Relationships
+        """
+        self.BlockType = BlockType
+        self.Confidence = Confidence
+        self.Text = Text
+        self.TextType = TextType
+        self.Id = Id
+        self.Page = Page
+        self.geometry = geometry
+        self.relationships = relationships
+
+    @classmethod
+    def from_dict(cls, block):
+        """
+        Build the compact form of a Textract LINE or WORD block.
+
+        :param block: Textract block
+        :return: CompactBlock
+        """
+        geometry = None
+        if block.get("Geometry"):
+            box = block["Geometry"]["BoundingBox"]
+            geometry = array("d", [box[key] for key in BOUNDING_BOX_KEYS])
+            for point in block["Geometry"].get("Polygon", []):
+                geometry.append(point["X"])
+                geometry.append(point["Y"])
+        relationships = None
+        if "Relationships" in block:
+            relationships = tuple(
+                (relatives["Type"], tuple(map(sys.intern, relatives["Ids"])))
+                for relatives in block["Relationships"] or []
+            )
+        text_type = block.get("TextType")
+        return cls(
+            # the types repeat on every block, they are shared instead of kept once per block
+            sys.intern(block["BlockType"]),
+            # the Ids of the children are then the same strings as the Ids of their blocks
+            sys.intern(block["Id"]),
+            block["Text"],
+            Confidence=block.get("Confidence"),
+            TextType=sys.intern(text_type) if text_type is not None else None,
+            Page=block.get("Page"),
+            geometry=geometry,
+            relationships=relationships,
+        )
+
+    def geometry_dict(self):
+        """Return the Geometry of the block as Textract returns it, None if it has none."""
+        if self.geometry is None:
+            return None
+        values = self.geometry
+        return {
+            "BoundingBox": dict(zip(BOUNDING_BOX_KEYS, values[:4])),
+            "Polygon": [
+                {"X": values[position], "Y": values[position + 1]}
+                for position in range(4, len(values), 2)
+            ],
+        }
+
+    def relationships_list(self):
+        """Return the Relationships of the block as Textract returns them, None if it has none."""
+        if self.relationships is None:
+            return None
+        return [
+            {"Type": relationship_type, "Ids": list(ids)}
+            for relationship_type, ids in self.relationships
+        ]
+
+    def to_dict(self, **fields):
+        """
+        Rebuild the Textract dict of the block.
+
+        :param fields: fields added to the dict or replacing those of the block (e.g. Page=1)
+        :return: dict with the keys of the Textract block
+        """
+        block = {"BlockType": self.BlockType}
+        if self.Confidence is not None:
+            block["Confidence"] = self.Confidence
+        block["Text"] = self.Text
+        if self.TextType is not None:
+            block["TextType"] = self.TextType
+        if self.geometry is not None:
+            block["Geometry"] = self.geometry_dict()
+        block["Id"] = self.Id
+        if self.relationships is not None:
+            block["Relationships"] = self.relationships_list()
+        if self.Page is not None:
+            block["Page"] = self.Page
+        block.update(fields)
+        return block
+
+    def get(self, key, default=None):
+        """Return a field of the block by its Textract key, default if the block does not have it."""
+        if key in PLAIN_FIELDS:
+            value = getattr(self, key)
+        elif key == "Geometry":
+            value = self.geometry_dict()
+        elif key == "Relationships":
+            value = self.relationships_list()
+        else:
+            value = None
+        return default if value is None else value
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __repr__(self):
+        return "CompactBlock({}, {}, {!r})".format(self.BlockType, self.Id, self.Text)
+
+
+def compact_page(blocks):
+    """
+    Return the LINE and WORD blocks of a page in compact form, in page order.
+
+    :param blocks: Textract blocks of one page
+    :return: list of CompactBlock
+    """
+    return [
+        CompactBlock.from_dict(block)
+        for block in blocks
+        if block["BlockType"] in COMPACT_BLOCK_TYPES
+    ]
+
+
+def block_dict(block, **fields):
+    """
+    Return a new Textract dict of a block, the blocks of the page are left as they are.
+
+    :param block: CompactBlock or Textract block
+    :param fields: fields added to the dict or replacing those of the block
+    :return: dict
+    """
+    if isinstance(block, CompactBlock):
+        return block.to_dict(**fields)
+    return dict(block, **fields)
@@ -0,0 +1,120 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Compiled form of an expected entities file, cached by content hash in memory and on local disk."""
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+
+from helpers.exact_matcher import ExactTextMatcher
+from helpers.prepared_page import prepare_entities
+
+LOGGER = logging.getLogger("PreLabeling")
+
+# bump when the compiled structures change, older artifacts are then ignored
+ARTIFACT_VERSION = 2
+PICKLE_PROTOCOL = 5
+# /tmp is the only writable directory of a Lambda function and survives between warm invocations
+ARTIFACT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "compiled-entities")
+# number of compiled files kept in memory
+MEMORY_CACHE_SIZE = 32
+
+_MEMORY_CACHE = OrderedDict()
+
+
+class CompiledEntities(object):
+    """Prepared entities of an expected entities file with the automaton of their exact matching."""
+
+    def __init__(self, objects_to_find, language="de"):
+        """
+        Clean, split and index all expected texts once.
+
+        :param objects_to_find: content of an expected entities file
+        :param language: language used to clean the texts
+        """
+        self.language = language
+        self.objects_to_find = objects_to_find
+        # cleaned texts, single items, token sets and q-gram signatures of every object
+        self.prepared_entities = prepare_entities(objects_to_find, language=language)
+        self.exact_matcher = ExactTextMatcher(self.prepared_entities)
+
+
+def content_hash(content, language="de"):
+    """
+    Return the key of the compiled form of an expected entities file.
+
+    :param content: raw content (str or bytes) of the expected entities file
+    :param language: language used to clean the texts
+    :return: hex sha256 digest
+    """
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    digest = hashlib.sha256(content)
+    digest.update("|{}|{}".format(language, ARTIFACT_VERSION).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _remember(key, compiled_entities):
+    _MEMORY_CACHE[key] = compiled_entities
+    _MEMORY_CACHE.move_to_end(key)
+    while len(_MEMORY_CACHE) > MEMORY_CACHE_SIZE:
+        _MEMORY_CACHE.popitem(last=False)
+
+
+def _read_artifact(path):
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        LOGGER.warning(f"Ignoring unreadable compiled entities {path}: {e}")
+        return None
+
+
+def _write_artifact(path, compiled_entities):
+    # written to a temporary file first so that a concurrent reader never sees a partial artifact
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as f:
+            pickle.dump(compiled_entities, f, protocol=PICKLE_PROTOCOL)
+        os.replace(f.name, path)
+    except OSError as e:
+        LOGGER.warning(f"Could not store compiled entities {path}: {e}")
+
+
+def load_compiled_entities(content, language="de", cache_dir=ARTIFACT_CACHE_DIR):
+    """
+    Return the compiled form of an expected entities file, compiling it only if it is not cached.
+
+    The compiled form is looked up in memory, then in cache_dir, and stored in both when it is compiled.
+
+    :param content: raw content (str or bytes) of the expected entities file
+    :param language: language used to clean the texts
+    :param cache_dir: directory of the compiled artifacts, None to only cache in memory
+    :return: CompiledEntities
+    """
+    key = content_hash(content, language=language)
+    if key in _MEMORY_CACHE:
+        _MEMORY_CACHE.move_to_end(key)
+        return _MEMORY_CACHE[key]
+
+    path = os.path.join(cache_dir, key + ".pkl") if cache_dir else None
+    compiled_entities = _read_artifact(path) if path else None
+    if compiled_entities is None:
+        LOGGER.debug(f"Compiling expected entities {key}")
+        compiled_entities = CompiledEntities(json.loads(content), language=language)
+        if path:
+            _write_artifact(path, compiled_entities)
+    _remember(key, compiled_entities)
+    return compiled_entities
+
+
+def clear_memory_cache():
+    """Forget the compiled files kept in memory."""
+    _MEMORY_CACHE.clear()
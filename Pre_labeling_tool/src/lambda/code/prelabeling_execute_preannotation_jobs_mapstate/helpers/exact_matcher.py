@@ -0,0 +1,173 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Exact matching of the cleaned expected texts on a page with an Aho-Corasick automaton."""
+
+from collections import deque
+
+from helpers.string_cleaning.clean_text import clean_text
+
+# separates the lines in the page text, the cleaned patterns never contain it
+LINE_SEPARATOR = "\n"
+
+
+class AhoCorasickAutomaton(object):
+    """Multi-pattern automaton that finds all occurrences of all patterns in one pass over a text."""
+
+    def __init__(self, patterns):
+        """
+        Build the trie of the patterns and its failure links.
+
+        :param patterns: list of strings, a pattern is identified by its position in the list
+        """
+        self.patterns = patterns
+        self.goto = [{}]
+        self.fail = [0]
+        self.outputs = [[]]
+        for pattern_id, pattern in enumerate(patterns):
+            if not pattern:
+                continue
+            state = 0
+            for char in pattern:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.outputs.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.outputs[state].append(pattern_id)
+
+        # breadth first computation of the failure links
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fail_state = self.fail[state]
+                while fail_state and char not in self.goto[fail_state]:
+                    fail_state = self.fail[fail_state]
+                self.fail[next_state] = self.goto[fail_state].get(char, 0)
+                self.outputs[next_state] = (
+                    self.outputs[next_state] + self.outputs[self.fail[next_state]]
+                )
+
+    def iter_matches(self, text):
+        """Yield (begin, end, pattern_id) for every occurrence of a pattern in the text."""
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for pattern_id in self.outputs[state]:
+                begin = position + 1 - len(self.patterns[pattern_id])
+                yield begin, position + 1, pattern_id
+
+
+def original_offsets(text, cleaned_text, language="de"):
+    """
+    Map every position of a cleaned text to the position of the original text it comes from.
+
+    :return: list of len(cleaned_text) + 1 offsets or None if the cleaning does not work character by character
+    """
+    if len(text) == len(cleaned_text):
+        return list(range(len(text) + 1))
+    offsets = []
+    cleaned_chars = []
+    for position, char in enumerate(text):
+        cleaned_char = clean_text(char, language=language)
+        cleaned_chars.append(cleaned_char)
+        offsets += [position] * len(cleaned_char)
+    if "".join(cleaned_chars) != cleaned_text:
+        return None
+    return offsets + [len(text)]
+
+
+class ExactTextMatcher(object):
+    """Finds the verbatim occurrences of the cleaned expected texts of a list of objects on a page."""
+
+    def __init__(self, prepared_entities):
+        """
+        Build one automaton over the cleaned expected texts of all prepared entities.
+
+        :param prepared_entities: list of PreparedEntity
+        """
+        patterns = []
+        self.pattern_owners = []
+        pattern_ids = {}
+        for index, prepared_entity in enumerate(prepared_entities):
+            for cleaned_word in prepared_entity.cleaned_expected_texts:
+                pattern = " ".join(cleaned_word.split())
+                if not pattern or LINE_SEPARATOR in pattern:
+                    continue
+                if pattern not in pattern_ids:
+                    pattern_ids[pattern] = len(patterns)
+                    patterns.append(pattern)
+                    self.pattern_owners.append([])
+                if index not in self.pattern_owners[pattern_ids[pattern]]:
+                    self.pattern_owners[pattern_ids[pattern]].append(index)
+        self.automaton = AhoCorasickAutomaton(patterns)
+
+    def find(self, prepared_page):
+        """
+        Run the automaton once over the concatenated cleaned lines of a page.
+
+        Only occurrences that start and end on word boundaries are kept.
+
+        :param prepared_page: PreparedPage
+        :return: dict mapping the index of an entity to its list of (line position, begin, end, child blocks),
+                 begin and end are offsets in the original LINE text
+        """
+        line_starts = []
+        cursor = 0
+        for cleaned_line in prepared_page.cleaned_lines:
+            line_starts.append(cursor)
+            cursor += len(cleaned_line) + len(LINE_SEPARATOR)
+        page_text = LINE_SEPARATOR.join(prepared_page.cleaned_lines)
+
+        matches = {}
+        line_position = 0
+        for begin, end, pattern_id in sorted(self.automaton.iter_matches(page_text)):
+            while (
+                line_position + 1 < len(line_starts)
+                and line_starts[line_position + 1] <= begin
+            ):
+                line_position += 1
+            match = self._locate(
+                prepared_page,
+                line_position,
+                begin - line_starts[line_position],
+                end - line_starts[line_position],
+            )
+            if match is None:
+                continue
+            for index in self.pattern_owners[pattern_id]:
+                matches.setdefault(index, []).append((line_position,) + match)
+        return matches
+
+    def _locate(self, prepared_page, line_position, begin, end):
+        """Translate an occurrence in a cleaned line to the original LINE text and its WORD blocks."""
+        cleaned_line = prepared_page.cleaned_lines[line_position]
+        if begin > 0 and not cleaned_line[begin - 1].isspace():
+            return None
+        if end < len(cleaned_line) and not cleaned_line[end].isspace():
+            return None
+        line = prepared_page.line_blocks[line_position]
+        offsets = original_offsets(line["Text"], cleaned_line, prepared_page.language)
+        if offsets is None:
+            return None
+        begin, end = offsets[begin], offsets[end]
+        child_blocks = prepared_page.block_graph.children(line)
+        spans = prepared_page.word_offsets[line["Id"]]
+        if spans is None:
+            return None
+        words_in_match = [
+            c_block
+            for c_block, (word_begin, word_end) in zip(child_blocks, spans)
+            if begin <= word_begin and word_end <= end
+        ]
+        # the occurrence has to cover complete words
+        if not any(word_begin == begin for word_begin, _ in spans) or not any(
+            word_end == end for _, word_end in spans
+        ):
+            return None
+        return begin, end, words_in_match
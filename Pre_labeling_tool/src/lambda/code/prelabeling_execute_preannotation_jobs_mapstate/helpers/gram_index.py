@@ -0,0 +1,122 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Inverted token and q-gram index used to prune the lines scored by the line fuzzy matching."""
+
+from collections import Counter, namedtuple
+
+import numpy as np
+from helpers.score_matrix import fuzzywuzzy_processor
+
+GRAM_SIZE = 3
+
+# what candidate_positions needs to know about an expected text, it can be computed once per expected text
+GramSignature = namedtuple("GramSignature", ["tokens", "length", "grams", "gram_size"])
+
+
+def count_grams(text, gram_size=GRAM_SIZE):
+    """Return the multiset of the q-grams of a text."""
+    return Counter(text[i : i + gram_size] for i in range(len(text) - gram_size + 1))
+
+
+def gram_signature(cleaned_text, gram_size=GRAM_SIZE):
+    """Return the GramSignature (token set, length and q-grams of the sorted tokens) of a cleaned text."""
+    tokens = frozenset(fuzzywuzzy_processor(cleaned_text).split())
+    sorted_tokens = " ".join(sorted(tokens))
+    return GramSignature(
+        tokens,
+        len(sorted_tokens),
+        dict(count_grams(sorted_tokens, gram_size)),
+        gram_size,
+    )
+
+
+class LineGramIndex(object):
+    """
+    Index from normalized tokens and character q-grams to the lines of a page.
+
+    The pruning is exact for fuzzywuzzy's token_set_ratio with a threshold thr:
+    - a line sharing a token with the expected text is always kept.
+    - otherwise token_set_ratio is the ratio r of the two strings made of the sorted tokens.
+      round(100 * r) > thr requires r > floor(thr) / 100, which bounds the Levenshtein distance k
+      between those strings by k < (la + lb) * (1 - floor(thr) / 100). Two strings within distance k
+      share at least max(la, lb) - q + 1 - k * q q-grams (q-gram lemma) and their ratio is at most
+      2 * min(la, lb) / (la + lb). Lines failing one of these bounds can not pass the threshold.
+    """
+
+    def __init__(self, cleaned_lines, gram_size=GRAM_SIZE):
+        """
+        Index the tokens and q-grams of the lines of a page.
+
+        :param cleaned_lines: cleaned texts of the LINE blocks of the page
+        :param gram_size: size q of the character q-grams
+        """
+        self.gram_size = gram_size
+        token_postings = {}
+        gram_postings = {}
+        lengths = []
+        for position, cleaned_line in enumerate(cleaned_lines):
+            tokens = set(fuzzywuzzy_processor(cleaned_line).split())
+            sorted_tokens = " ".join(sorted(tokens))
+            for token in tokens:
+                token_postings.setdefault(token, []).append(position)
+            for gram, count in count_grams(sorted_tokens, gram_size).items():
+                gram_postings.setdefault(gram, []).append((position, count))
+            lengths.append(len(sorted_tokens))
+        self.token_postings = {
+            token: np.array(positions) for token, positions in token_postings.items()
+        }
+        self.gram_postings = {
+            gram: (
+                np.array([position for position, _ in postings]),
+                np.array([count for _, count in postings]),
+            )
+            for gram, postings in gram_postings.items()
+        }
+        self.lengths = np.array(lengths, dtype=np.int64)
+
+    def candidate_positions(self, cleaned_text, fuzzymatch_line_thr, signature=None):
+        """
+        Return the positions of the lines that can pass the line threshold for an expected text.
+
+        :param cleaned_text: cleaned expected text
+        :param fuzzymatch_line_thr: threshold applied to token_set_ratio
+        :param signature: precomputed GramSignature of cleaned_text
+        :return: sorted numpy array of line positions
+        """
+        number_lines = len(self.lengths)
+        threshold = int(np.floor(fuzzymatch_line_thr))
+        if threshold < 0:  # even a score of 0 passes the threshold
+            return np.arange(number_lines)
+        if signature is None or signature.gram_size != self.gram_size:
+            signature = gram_signature(cleaned_text, self.gram_size)
+        tokens = signature.tokens
+        if not tokens:  # token_set_ratio is 0 for every line
+            return np.arange(0)
+
+        candidates = np.zeros(number_lines, dtype=bool)
+        for token in tokens:
+            if token in self.token_postings:
+                candidates[self.token_postings[token]] = True
+
+        text_length = signature.length
+        common_grams = np.zeros(number_lines, dtype=np.int64)
+        for gram, count in signature.grams.items():
+            if gram in self.gram_postings:
+                positions, counts = self.gram_postings[gram]
+                common_grams[positions] += np.minimum(counts, count)
+
+        total_lengths = self.lengths + text_length
+        # largest integer distance k with 100 * k < (la + lb) * (100 - threshold)
+        max_distance = (total_lengths * (100 - threshold) - 1) // 100
+        required_grams = (
+            np.maximum(self.lengths, text_length)
+            - self.gram_size
+            + 1
+            - self.gram_size * max_distance
+        )
+        length_ok = (
+            200 * np.minimum(self.lengths, text_length) > threshold * total_lengths
+        )
+        candidates |= (self.lengths > 0) & length_ok & (common_grams >= required_grams)
+        return np.flatnonzero(candidates)
@@ -0,0 +1,106 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Sliding windows over consecutive lines in reading order for entities that wrap over several lines."""
+
+from fuzzywuzzy import fuzz
+from helpers.score_memo import SCORE_MEMO
+
+
+def coverage_ratio(expected_tokens, tokens):
+    """
+    Return how much of an expected text appears in a text, as the token_set_ratio term of the expected text.
+
+    token_set_ratio is 100 as soon as one token set contains the other, so every line holding a part of a
+    wrapped entity passes it. This term compares the tokens the texts have in common with all the tokens of
+    the expected text and only passes the threshold once (almost) all of them are found.
+
+    :param expected_tokens: set of the processed tokens of the expected text
+    :param tokens: set of the processed tokens of the text
+    :return: integer score between 0 and 100
+    """
+    common_tokens = expected_tokens & tokens
+    if not common_tokens:
+        return 0
+    sorted_sect = " ".join(sorted(common_tokens))
+    combined = (
+        sorted_sect + " " + " ".join(sorted(expected_tokens - common_tokens))
+    ).strip()
+    return SCORE_MEMO.score(fuzz.ratio, sorted_sect, combined)
+
+
+def matched_windows(
+    line_tokens,
+    reading_order,
+    expected_tokens,
+    fuzzymatch_line_thr,
+    window_lines,
+    allowed_positions=None,
+):
+    """
+    Find the windows of 2 to window_lines consecutive lines that together hold an expected text.
+
+    A window matches if the coverage_ratio of an expected text passes the line threshold while none of its
+    lines and none of its smaller windows does, and if its first and last lines share a token with an
+    expected text. Windows are built by size: the token set of a window is the token set of the window one
+    line shorter plus the tokens of its last line, so every window costs a single set union and the cost
+    stays O(lines x window_lines).
+
+    :param line_tokens: processed token set of every line of the page
+    :param reading_order: positions of the lines in reading order
+    :param expected_tokens: processed token sets of the expected texts of the entity
+    :param fuzzymatch_line_thr: threshold applied to the coverage ratio
+    :param window_lines: maximum number of lines of a window
+    :param allowed_positions: set of the positions of the lines a window may contain, None for all lines
+    :return: list of windows, a window is the list of its line positions in reading order
+    """
+
+    def is_match(tokens):
+        return any(
+            coverage_ratio(expected, tokens) > fuzzymatch_line_thr
+            for expected in expected_tokens
+        )
+
+    all_expected_tokens = set().union(*expected_tokens) if expected_tokens else set()
+    # lines that can be the first or last line of a window
+    bounds = [
+        not line_tokens[position].isdisjoint(all_expected_tokens)
+        and (allowed_positions is None or position in allowed_positions)
+        for position in reading_order
+    ]
+    # per start of a window of the current size: whether it matched, whether it contains a smaller
+    # matched window and its token set
+    matched = [
+        bound and is_match(line_tokens[position])
+        for bound, position in zip(bounds, reading_order)
+    ]
+    covered = [False for _ in reading_order]
+    window_tokens = [line_tokens[position] for position in reading_order]
+    windows = []
+    for size in range(2, window_lines + 1):
+        next_matched = []
+        next_covered = []
+        next_tokens = []
+        for start in range(len(reading_order) - size + 1):
+            last = start + size - 1
+            is_covered = (
+                covered[start]
+                or covered[start + 1]
+                or matched[start]
+                or matched[start + 1]
+            )
+            tokens = window_tokens[start] | line_tokens[reading_order[last]]
+            window_match = False
+            if not is_covered and bounds[start] and bounds[last]:
+                positions = reading_order[start : last + 1]
+                if allowed_positions is None or all(
+                    position in allowed_positions for position in positions
+                ):
+                    window_match = is_match(tokens)
+                    if window_match:
+                        windows.append(positions)
+            next_matched.append(window_match)
+            next_covered.append(is_covered)
+            next_tokens.append(tokens)
+        matched, covered, window_tokens = next_matched, next_covered, next_tokens
+    return windows
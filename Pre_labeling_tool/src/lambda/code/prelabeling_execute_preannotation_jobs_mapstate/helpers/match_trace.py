@@ -0,0 +1,116 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Explanation of the entities found on a page and counters of the work done to find them."""
+
+import json
+from collections import Counter
+
+COUNTERS = [
+    "line_pairs_scored",
+    "line_pairs_pruned",
+    "word_pairs_scored",
+    "exact_matches",
+    "windows",
+    "scorer_seconds",
+]
+
+
+class MatchTrace(object):
+    """
+    Collects, for one page, how every emitted entity was found and the per-page counters.
+
+    The matching functions only touch a trace when one is given, without it they do no extra work.
+    """
+
+    def __init__(self):
+        self.counters = Counter({name: 0 for name in COUNTERS})
+        # best line score, window score and word scores per (entity, LINE Id), only needed while the page is matched
+        self.line_scores = {}
+        self.window_scores = {}
+        self.words = {}
+        self.entities = []
+
+    def count(self, name, value=1):
+        """Add a value to a counter."""
+        self.counters[name] += value
+
+    def record_line_score(
+        self, prepared_entity, line_id, score, expected_text, scorer_name
+    ):
+        """Keep the best score of an entity on a line with the expected text and scorer that gave it."""
+        key = (id(prepared_entity), line_id)
+        if key not in self.line_scores or self.line_scores[key]["score"] < score:
+            self.line_scores[key] = {
+                "score": int(score),
+                "expected_text": expected_text,
+                "scorer": scorer_name,
+            }
+
+    def record_window_score(self, prepared_entity, line_ids, score):
+        """Record the coverage score of a window of lines for every line of the window."""
+        for line_id in line_ids:
+            self.window_scores[(id(prepared_entity), line_id)] = int(score)
+
+    def record_words(self, prepared_entity, line_id, words, substring_fallback):
+        """
+        Record the words of a line checked for an entity.
+
+        :param words: list of (text, best word score, whether the word is part of the entity)
+        :param substring_fallback: whether no word passed the word threshold and the substring check decided
+        """
+        self.words[(id(prepared_entity), line_id)] = {
+            "words": [
+                {"Text": text, "score": int(score), "in_entity": bool(in_entity)}
+                for text, score, in_entity in words
+            ],
+            "substring_fallback": substring_fallback,
+        }
+
+    def record_entity(self, entity, prepared_entity, path):
+        """
+        Record an emitted entity with the scores recorded for its lines.
+
+        :param entity: the entity as written to the annotation file
+        :param prepared_entity: PreparedEntity of the object the entity was found for
+        :param path: "line", "window" or "exact"
+        """
+        lines = []
+        for block_ref in entity["BlockReferences"]:
+            key = (id(prepared_entity), block_ref["BlockId"])
+            line = {"BlockId": block_ref["BlockId"]}
+            if key in self.line_scores:
+                line["line_score"] = self.line_scores[key]
+            line.update(self.words.get(key, {}))
+            lines.append(line)
+        record = {"Type": entity["Type"], "Text": entity["Text"], "path": path}
+        if path == "window":
+            record["window_score"] = self.window_scores.get(
+                (id(prepared_entity), entity["BlockReferences"][0]["BlockId"])
+            )
+        record["lines"] = lines
+        self.entities.append(record)
+
+    def finish(self):
+        """Drop what is only needed while the page is matched, e.g. before the trace is sent to another process."""
+        self.line_scores = {}
+        self.window_scores = {}
+        self.words = {}
+
+    def to_jsonl(self, document_meta_data=None):
+        """
+        Return the trace as JSON lines: the counters of the page first, then one line per entity.
+
+        :param document_meta_data: metadata of the page added to the counters line
+        :return: str
+        """
+        counters = dict(self.counters)
+        counters["scorer_seconds"] = round(counters["scorer_seconds"], 6)
+        header = {"counters": counters}
+        if document_meta_data is not None:
+            header["DocumentMetadata"] = document_meta_data
+        lines = [header] + self.entities
+        return "".join(
+            json.dumps(line, separators=(",", ":"), ensure_ascii=False) + "\n"
+            for line in lines
+        )
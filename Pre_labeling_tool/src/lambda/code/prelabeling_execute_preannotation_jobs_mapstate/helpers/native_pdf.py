@@ -0,0 +1,284 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""LINE and WORD blocks of the pages of a PDF read from its text layer, only scanned pages need Textract."""
+
+import io
+import logging
+import uuid
+
+import pdfplumber
+from PyPDF2 import PdfFileReader, PdfFileWriter
+
+LOGGER = logging.getLogger("PreLabeling")
+
+# DocumentType of the annotation files, as the annotation UI names the pages
+NATIVE_PDF = "NativePDF"
+SCANNED_PDF = "ScannedPDF"
+# a page whose images cover this ratio of its surface is a scan, the same threshold as the annotation UI
+TOTAL_IMAGE_SIZE_TO_PAGE_SIZE_RATIO_THRESHOLD = 0.25
+
+
+def is_scanned_pdf(images, page_width, page_height):
+    """
+    Return whether a PDF page is scanned given its images and dimensions.
+
+    :param images: images of the page, as given by pdfplumber
+    :param page_width: width of the page
+    :param page_height: height of the page
+    :return: True if the images cover TOTAL_IMAGE_SIZE_TO_PAGE_SIZE_RATIO_THRESHOLD of the page
+    """
+    image_size_total = sum(
+        float(image["width"]) * float(image["height"]) for image in images
+    )
+    return (
+        len(images) >= 1
+        and image_size_total / (page_width * page_height)
+        >= TOTAL_IMAGE_SIZE_TO_PAGE_SIZE_RATIO_THRESHOLD
+    )
+
+
+def is_scanned_page(pdfplumber_page):
+    """Return whether a pdfplumber page is scanned or has no text layer, its text then has to be detected."""
+    return (
+        is_scanned_pdf(
+            pdfplumber_page.images,
+            float(pdfplumber_page.width),
+            float(pdfplumber_page.height),
+        )
+        or not pdfplumber_page.chars
+    )
+
+
+def pdf_page_types(document):
+    """
+    Classify every page of a PDF.
+
+    :param document: bytes of the PDF file
+    :return: NATIVE_PDF or SCANNED_PDF for every page in page order
+    """
+    page_types = []
+    with pdfplumber.open(io.BytesIO(document)) as pdf:
+        for page in pdf.pages:
+            page_types.append(SCANNED_PDF if is_scanned_page(page) else NATIVE_PDF)
+            # pdfplumber keeps the parsed objects of every page it has read
+            page.flush_cache()
+    return page_types
+
+
+def pdf_file_reader(document):
+    """Return the PyPDF2 reader of a PDF, parsed once for all the pages split out of it."""
+    return PdfFileReader(io.BytesIO(document), strict=False)
+
+
+def pdf_page_bytes(pdf_reader, page_number):
+    """
+    Return a PDF made of a single page of a PDF.
+
+    :param pdf_reader: PdfFileReader of the PDF, as returned by pdf_file_reader
+    :param page_number: number of the page, starting at 1
+    :return: bytes of the single page PDF
+    """
+    pdf_file_writer = PdfFileWriter()
+    pdf_file_writer.addPage(pdf_reader.getPage(page_number - 1))
+    page_bytes = io.BytesIO()
+    pdf_file_writer.write(page_bytes)
+    return page_bytes.getvalue()
+
+
+def block_geometry(width, height, left, top):
+    """Return the Geometry of a block as Textract gives it, from its bounding box in ratios of the page size."""
+    return {
+        "BoundingBox": {"Width": width, "Height": height, "Left": left, "Top": top},
+        "Polygon": [
+            {"X": left, "Y": top},
+            {"X": left + width, "Y": top},
+            {"X": left + width, "Y": top + height},
+            {"X": left, "Y": top + height},
+        ],
+    }
+
+
+def block_id(page_num, block_index, text):
+    """Return the Id of a block, the same for the same page so that its block file is stored once."""
+    return str(uuid.uuid5(uuid.NAMESPACE_OID, f"{page_num}-{block_index}-{text}"))
+
+
+def plumber_lines(pdfplumber_page):
+    """
+    Group the words of a page into the lines of its text.
+
+    The words given by extract_words are assigned to the lines of extract_text, a word of one can be made of
+    several words of the other.
+
+    :param pdfplumber_page: pdfplumber page
+    :return: list of lines, each a list of pdfplumber words
+    """
+    text = pdfplumber_page.extract_text()
+    lines = [
+        stripped_line
+        for stripped_line in [
+            line.strip() for line in (text if text else "").split("\n")
+        ]
+        if stripped_line
+    ]
+    if not lines:
+        return []
+    line_index = 0
+    line_words = lines[line_index].split()
+    word_index = 0
+
+    plumber_text = []
+    plumber_line = []
+
+    words = pdfplumber_page.extract_words()
+    token_sub_search_index = 0
+    word_sub_search_index = 0
+    token_block_list_idx = 0
+    while token_block_list_idx < len(words):
+        token_block = words[token_block_list_idx]
+        block_word_index_in_line_word = line_words[word_index][
+            word_sub_search_index:
+        ].find(token_block["text"][token_sub_search_index:])
+        if block_word_index_in_line_word > -1:
+            # block word is a sub-part of text word ex. text: "word__in__line", block: "word"
+            if (
+                line_words[word_index][word_sub_search_index:]
+                == token_block["text"][:token_sub_search_index]
+            ):
+                word_sub_search_index = len(line_words[word_index])
+            else:
+                word_sub_search_index = (
+                    word_sub_search_index
+                    + block_word_index_in_line_word
+                    + len(token_block["text"][token_sub_search_index:])
+                )
+            plumber_line.append(token_block)
+            if word_sub_search_index == len(line_words[word_index]):
+                if word_index < len(line_words) - 1:
+                    word_index += 1
+                elif line_index < len(lines) - 1:
+                    line_index += 1
+                    line_words = lines[line_index].split()
+                    word_index = 0
+                    plumber_text.append(plumber_line)
+                    plumber_line = []
+                word_sub_search_index = 0
+
+            token_block_list_idx += 1
+            token_sub_search_index = 0
+        else:
+            # text word is a sub-part of block word ex. text: "word", block: "word__in___line"
+            token_sub_search_index += len(line_words[word_index])
+            if word_index < len(line_words) - 1:
+                word_index += 1
+            elif line_index < len(lines) - 1:
+                line_index += 1
+                line_words = lines[line_index].split()
+                word_index = 0
+                if plumber_line:
+                    plumber_text.append(plumber_line)
+                    plumber_line = []
+
+    if plumber_line:
+        plumber_text.append(plumber_line)
+    return plumber_text
+
+
+def plumber_line_to_blocks(
+    page_num, plumber_line, block_index, page_width, page_height
+):
+    """
+    Return the LINE block of a line of pdfplumber words followed by its WORD blocks.
+
+    :param page_num: number of the page, starting at 1
+    :param plumber_line: pdfplumber words of the line
+    :param block_index: index of the last block of the page
+    :param page_width: width of the page
+    :param page_height: height of the page
+    :return: (blocks, index of the last block)
+    """
+    block_index += 1
+    line_text = " ".join([plumber_word["text"] for plumber_word in plumber_line])
+    line_block = {
+        "BlockType": "LINE",
+        "Text": line_text,
+        "Id": block_id(page_num, block_index, line_text),
+        "Page": page_num,
+    }
+    word_blocks = []
+    for plumber_word in plumber_line:
+        block_index += 1
+        word_blocks.append(
+            {
+                "BlockType": "WORD",
+                "Text": plumber_word["text"],
+                "Geometry": block_geometry(
+                    float(abs(plumber_word["x0"] - plumber_word["x1"])) / page_width,
+                    float(abs(plumber_word["top"] - plumber_word["bottom"]))
+                    / page_height,
+                    float(plumber_word["x0"]) / page_width,
+                    float(plumber_word["top"]) / page_height,
+                ),
+                "Id": block_id(page_num, block_index, plumber_word["text"]),
+                "Page": page_num,
+            }
+        )
+    # the line covers the boxes of its words
+    boxes = [word["Geometry"]["BoundingBox"] for word in word_blocks]
+    left = min(box["Left"] for box in boxes)
+    top = min(box["Top"] for box in boxes)
+    line_block["Geometry"] = block_geometry(
+        max(box["Left"] + box["Width"] for box in boxes) - left,
+        max(box["Top"] + box["Height"] for box in boxes) - top,
+        left,
+        top,
+    )
+    line_block["Relationships"] = [
+        {"Type": "CHILD", "Ids": [word["Id"] for word in word_blocks]}
+    ]
+    return [line_block] + word_blocks, block_index
+
+
+def blocks_from_native_pdf(pdfplumber_page, page_num, page_width, page_height):
+    """
+    Return the LINE and WORD blocks of a page read from its text layer, in the Textract format.
+
+    :param pdfplumber_page: pdfplumber page
+    :param page_num: number of the page, starting at 1
+    :param page_width: width of the page
+    :param page_height: height of the page
+    :return: list of blocks, every LINE followed by its WORD blocks
+    """
+    blocks = []
+    block_index = -1
+    for plumber_line in plumber_lines(pdfplumber_page):
+        line_blocks, block_index = plumber_line_to_blocks(
+            page_num, plumber_line, block_index, page_width, page_height
+        )
+        blocks.extend(line_blocks)
+    return blocks
+
+
+def iter_pdf_pages(document, page_types, detect_scanned_page):
+    """
+    Yield the blocks of every page of a PDF, read from the text layer of the native pages.
+
+    :param document: bytes of the PDF file
+    :param page_types: NATIVE_PDF or SCANNED_PDF for every page, as returned by pdf_page_types
+    :param detect_scanned_page: function of the number of a scanned page returning its Textract blocks
+    :return: generator of the blocks of every page in page order
+    """
+    with pdfplumber.open(io.BytesIO(document)) as pdf:
+        for page_num, (page, page_type) in enumerate(
+            zip(pdf.pages, page_types), start=1
+        ):
+            if page_type == NATIVE_PDF:
+                blocks = blocks_from_native_pdf(
+                    page, page_num, float(page.width), float(page.height)
+                )
+                page.flush_cache()
+            else:
+                LOGGER.info(f"Detecting the text of the scanned page {page_num}")
+                blocks = detect_scanned_page(page_num)
+            yield blocks
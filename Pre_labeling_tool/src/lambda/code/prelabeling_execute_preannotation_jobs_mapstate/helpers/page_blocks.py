@@ -0,0 +1,39 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Textract blocks of a document split into the blocks of its pages while they are read."""
+
+# blocks of a single page document analysed with the synchronous API have no Page
+DEFAULT_PAGE = 1
+
+
+def iter_page_blocks(block_batches):
+    """
+    Yield the blocks of every page as soon as the page is complete.
+
+    Textract returns the blocks of a document in page order, so a page is complete once a block of a later page
+    is read: the blocks of the first pages can be processed while the next result pages are still fetched.
+
+    :param block_batches: iterable of lists of blocks, e.g. the Blocks of every result page of an asynchronous
+                          Textract job
+    :return: generator of (page number, blocks of the page) in page order
+    """
+    current_page = None
+    current_blocks = []
+    for blocks in block_batches:
+        for block in blocks:
+            page = block.get("Page", DEFAULT_PAGE)
+            if page != current_page:
+                if current_page is not None:
+                    if page < current_page:
+                        raise ValueError(
+                            "Block of page {} found after the blocks of page {}, the blocks are not in page order".format(
+                                page, current_page
+                            )
+                        )
+                    yield current_page, current_blocks
+                current_page = page
+                current_blocks = []
+            current_blocks.append(block)
+    if current_page is not None:
+        yield current_page, current_blocks
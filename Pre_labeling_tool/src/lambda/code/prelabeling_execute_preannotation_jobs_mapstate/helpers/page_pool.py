@@ -0,0 +1,108 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Process pool that spreads the pages of a document over the available CPUs."""
+
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+LOGGER = logging.getLogger("PreLabeling")
+
+# multiprocessing locks and queues are backed by POSIX shared memory (missing on AWS Lambda)
+SHARED_MEMORY_PATH = "/dev/shm"
+
+
+def available_cpus():
+    """Return the number of CPUs this process is allowed to run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def shared_memory_available():
+    """Return whether a process pool can be created in this environment."""
+    return os.path.isdir(SHARED_MEMORY_PATH)
+
+
+def worker_count(max_workers=None, number_items=None):
+    """
+    Return the number of worker processes to use, 1 to process the items in the current process.
+
+    :param max_workers: requested number of worker processes, defaults to the number of available CPUs
+    :param number_items: number of items to process if known
+    """
+    if max_workers is None:
+        max_workers = available_cpus()
+    if number_items is not None:
+        max_workers = min(max_workers, number_items)
+    if max_workers > 1 and not shared_memory_available():
+        LOGGER.info(
+            f"{SHARED_MEMORY_PATH} is not available, processing the pages in a single process"
+        )
+        max_workers = 1
+    return max_workers
+
+
+def map_pages(function, items, max_workers=None):
+    """
+    Apply a function to every item in worker processes and return the results in the order of the items.
+
+    Falls back to applying the function in the current process when there is a single worker or item,
+    or when the environment has no shared memory for a process pool.
+
+    :param function: picklable function taking a single item (module level function or functools.partial)
+    :param items: list of arguments, e.g. the blocks of every page
+    :param max_workers: number of worker processes, defaults to the number of available CPUs
+    :return: list of the results
+    """
+    max_workers = worker_count(max_workers, len(items))
+    if max_workers <= 1:
+        return [function(item) for item in items]
+
+    # fork shares the already imported modules (and their clients) with the workers
+    with ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context("fork")
+    ) as executor:
+        return list(executor.map(function, items))
+
+
+def imap_pages(function, items, max_workers=None, max_pending=None):
+    """
+    Apply a function to every item in worker processes and yield the items with their results in the order of
+    the items.
+
+    The items are read lazily: at most max_pending items are submitted and not yet yielded, so that an iterator
+    fetching the pages of a document is only read ahead of the processed pages by a few pages. Falls back to
+    applying the function in the current process like map_pages.
+
+    :param function: picklable function taking a single item (module level function or functools.partial)
+    :param items: iterable of arguments, e.g. a generator of the blocks of every page
+    :param max_workers: number of worker processes, defaults to the number of available CPUs
+    :param max_pending: number of items submitted ahead, defaults to twice the number of workers
+    :return: generator of (item, result)
+    """
+    max_workers = worker_count(
+        max_workers, len(items) if hasattr(items, "__len__") else None
+    )
+    if max_workers <= 1:
+        for item in items:
+            yield item, function(item)
+        return
+
+    if max_pending is None:
+        max_pending = 2 * max_workers
+    with ProcessPoolExecutor(
+        max_workers=max_workers, mp_context=multiprocessing.get_context("fork")
+    ) as executor:
+        pending = deque()
+        for item in items:
+            pending.append((item, executor.submit(function, item)))
+            if len(pending) >= max_pending:
+                item, future = pending.popleft()
+                yield item, future.result()
+        while pending:
+            item, future = pending.popleft()
+            yield item, future.result()
@@ -0,0 +1,160 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Prepared matching state of the pages of a document, stored so that a document can be re-matched without Textract."""
+
+import io
+import pickle
+import re
+import zlib
+
+from botocore.exceptions import ClientError
+from helpers.prepared_page import PreparedPage
+
+# bump when PreparedPage or the state file changes, states of an older version can not be re-matched
+PAGE_STATE_VERSION = 3
+PICKLE_PROTOCOL = 5
+# every page is compressed on its own, it is mostly repeated JSON keys and texts so a fast level is enough
+COMPRESSION_LEVEL = 1
+# ids given by the prelabeling_create_execution_id lambda: <prefix>-<YYYY-MM-DD-HH-MM>-<4 random characters>
+EXECUTION_ID_PATTERN = re.compile(
+    r"[A-Za-z0-9][A-Za-z0-9_-]*-\d{4}-\d{2}-\d{2}-\d{2}-\d{2}-[a-z0-9]{4}"
+)
+
+
+def check_execution_id(execution_id):
+    """
+    Return the id of the execution whose page states are re-matched.
+
+    The id comes from the event and names the S3 prefix the states are unpickled from, so only ids of the format
+    created by the tool are accepted.
+
+    :param execution_id: execution id given by the event
+    :return: execution_id
+    :raises ValueError: if the id does not have the format of an execution id
+    """
+    if not isinstance(execution_id, str) or not EXECUTION_ID_PATTERN.fullmatch(
+        execution_id
+    ):
+        raise ValueError("Invalid rematch_execution_id {!r}".format(execution_id))
+    return execution_id
+
+
+def prepare_page_state(blocks, language="de"):
+    """
+    Return the PreparedPage of the blocks of a page with all its indexes built.
+
+    The indexes are otherwise only built when the matching first needs them, they are built here so
+    that a re-match with other options finds them in the stored state.
+
+    :param blocks: Textract blocks of one page
+    :param language: language used to clean the texts
+    :return: PreparedPage
+    """
+    prepared_page = PreparedPage(blocks, language=language)
+    prepared_page.gram_index
+    prepared_page.line_grid
+    prepared_page.line_tokens
+    prepared_page.reading_order
+    return prepared_page
+
+
+def page_state_file(document_key):
+    """Return the name of the state file of a document, next to its annotation files."""
+    return document_key.split("/")[-1][:-4] + "_state.pkl"
+
+
+def dump_page_state(prepared_page):
+    """
+    Serialize the prepared state of one page.
+
+    :param prepared_page: PreparedPage, e.g. returned by prepare_page_state
+    :return: compressed bytes
+    """
+    return zlib.compress(
+        pickle.dumps(prepared_page, protocol=PICKLE_PROTOCOL), COMPRESSION_LEVEL
+    )
+
+
+def join_page_states(page_states, document_types=None):
+    """
+    Build the state file of a document from the states of its pages.
+
+    The pages are dumped one at a time (possibly in worker processes) so that the prepared pages of the whole
+    document never have to be kept in memory together.
+
+    :param page_states: bytes returned by dump_page_state for every page in page order
+    :param document_types: DocumentType of every page (native or scanned), None if not known
+    :return: bytes of the state file
+    """
+    page_states = list(page_states)
+    content = io.BytesIO()
+    pickle.dump(
+        {
+            "version": PAGE_STATE_VERSION,
+            "pages": len(page_states),
+            "document_types": document_types,
+        },
+        content,
+        protocol=PICKLE_PROTOCOL,
+    )
+    for page_state in page_states:
+        pickle.dump(page_state, content, protocol=PICKLE_PROTOCOL)
+    return content.getvalue()
+
+
+def load_document_state(content):
+    """
+    Deserialize the prepared pages of a document with the DocumentType of its pages.
+
+    :param content: bytes written by join_page_states
+    :return: (PreparedPage of every page in page order, DocumentType of every page or None if not stored)
+    """
+    content = io.BytesIO(content)
+    header = pickle.load(content)
+    if header.get("version") != PAGE_STATE_VERSION:
+        raise ValueError(
+            "Page state version {} can not be re-matched (expected {})".format(
+                header.get("version"), PAGE_STATE_VERSION
+            )
+        )
+    prepared_pages = [
+        pickle.loads(zlib.decompress(pickle.load(content)))
+        for _ in range(header["pages"])
+    ]
+    return prepared_pages, header.get("document_types")
+
+
+def store_page_states(page_states, s3_uri, s3_helper, document_types=None):
+    """
+    Write the prepared pages of a document to S3.
+
+    :param page_states: bytes returned by dump_page_state for every page in page order
+    :param s3_uri: uri of the state file
+    :param s3_helper: S3Helper used to write the file
+    :param document_types: DocumentType of every page (native or scanned), None if not known
+    :return: s3_uri
+    """
+    s3_helper.write_content(s3_uri, join_page_states(page_states, document_types))
+    return s3_uri
+
+
+def fetch_document_state(s3_uri, s3_helper):
+    """
+    Read the prepared pages of a document from S3 with the DocumentType of its pages.
+
+    :param s3_uri: uri of the state file
+    :param s3_helper: S3Helper used to read the file
+    :return: (PreparedPage of every page in page order, DocumentType of every page or None if not stored)
+    """
+    try:
+        response = s3_helper.get_object_response_from_s3(s3_uri)
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+            raise ValueError(
+                "No page state at {}, the document has to be processed once without rematch and with SAVE_PAGE_STATE".format(
+                    s3_uri
+                )
+            )
+        raise
+    return load_document_state(response["Body"].read())
@@ -0,0 +1,220 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Page and entity structures shared by the fuzzy matching functions."""
+
+from helpers.block_graph import BlockGraph
+from helpers.gram_index import LineGramIndex, gram_signature
+from helpers.score_matrix import fuzzywuzzy_processor
+from helpers.scorers import DEFAULT_SCORER, get_scorer
+from helpers.spatial_index import (
+    ANCHOR_DISTANCE_X,
+    ANCHOR_DISTANCE_Y,
+    SpatialGridIndex,
+    reading_order,
+)
+from helpers.string_cleaning.clean_text import clean_text
+
+
+def word_spans(line_text, words):
+    """Return the (begin, end) span of every word in the text of its line, None if a word can not be located."""
+    spans = []
+    cursor = 0
+    for word in words:
+        begin = line_text.find(word["Text"], cursor)
+        if begin < 0:
+            return None
+        cursor = begin + len(word["Text"])
+        spans.append((begin, cursor))
+    return spans
+
+
+def cumulative_word_spans(words):
+    """Return the spans of words assumed to be separated by a single space, starting at 0."""
+    spans = []
+    cursor = 0
+    for word in words:
+        spans.append((cursor, cursor + len(word["Text"])))
+        cursor += len(word["Text"]) + 1
+    return spans
+
+
+class PreparedPage(object):
+    """Textract blocks of a single page with their block graph and the LINE and WORD texts cleaned once."""
+
+    def __init__(self, blocks, language="de"):
+        """
+        Clean the text of every LINE and WORD block of the page.
+
+        :param blocks: Textract blocks of one page
+        :param language: language used to clean the texts
+        """
+        self.blocks = blocks
+        self.language = language
+        self.block_graph = BlockGraph(blocks)
+        self.line_blocks = [block for block in blocks if block["BlockType"] == "LINE"]
+        self.cleaned_texts = {}
+        for block in blocks:
+            if block["BlockType"] in ("LINE", "WORD"):
+                self.cleaned_texts[block["Id"]] = clean_text(
+                    block["Text"], language=language
+                )
+        self.cleaned_lines = [
+            self.cleaned_texts[block["Id"]] for block in self.line_blocks
+        ]
+        # character span of every child WORD in the text of its LINE, None if a word can not be located
+        self.word_offsets = {
+            block["Id"]: word_spans(block["Text"], self.block_graph.children(block))
+            for block in self.line_blocks
+        }
+        self._gram_index = None
+        self._line_grid = None
+        self._line_tokens = None
+        self._reading_order = None
+
+    @property
+    def gram_index(self):
+        """Token and q-gram index of the cleaned lines, built the first time it is needed."""
+        if self._gram_index is None:
+            self._gram_index = LineGramIndex(self.cleaned_lines)
+        return self._gram_index
+
+    @property
+    def line_grid(self):
+        """Spatial grid index of the LINE blocks, built the first time it is needed."""
+        if self._line_grid is None:
+            self._line_grid = SpatialGridIndex(self.line_blocks)
+        return self._line_grid
+
+    @property
+    def line_tokens(self):
+        """Token sets of the cleaned lines as seen by token_set_ratio, built the first time they are needed."""
+        if self._line_tokens is None:
+            self._line_tokens = [
+                frozenset(fuzzywuzzy_processor(cleaned_line).split())
+                for cleaned_line in self.cleaned_lines
+            ]
+        return self._line_tokens
+
+    @property
+    def reading_order(self):
+        """Positions of the LINE blocks in reading order, computed the first time it is needed."""
+        if self._reading_order is None:
+            self._reading_order = reading_order(self.line_blocks)
+        return self._reading_order
+
+    def cleaned_text(self, block):
+        """Return the cleaned text of a block, cleaning it if it is not part of the page."""
+        if block["Id"] not in self.cleaned_texts:
+            self.cleaned_texts[block["Id"]] = clean_text(
+                block["Text"], language=self.language
+            )
+        return self.cleaned_texts[block["Id"]]
+
+
+class PreparedEntity(object):
+    """Expected texts of one object to find with their cleaned forms computed once."""
+
+    def __init__(
+        self,
+        expected_texts,
+        entity_type="UNASSIGNED",
+        ignore_list=[],
+        language="de",
+        anchor_label=None,
+        anchor_distance_x=ANCHOR_DISTANCE_X,
+        anchor_distance_y=ANCHOR_DISTANCE_Y,
+        scorer=DEFAULT_SCORER,
+        fuzzymatch_line_thr=None,
+        fuzzymatch_word_thr=None,
+    ):
+        """
+        Split the expected texts into single items and clean both.
+
+        :param expected_texts: possible texts of the entity
+        :param entity_type: type of the entity
+        :param ignore_list: texts that should be ignored in the match
+        :param language: language used to clean the texts
+        :param anchor_label: text of a label next to the entity (e.g. "Savings balance"), used by the spatial matching
+        :param anchor_distance_x: horizontal distance (ratio of the page width) to the anchor searched for the entity
+        :param anchor_distance_y: vertical distance (ratio of the page height) to the anchor searched for the entity
+        :param scorer: name of a registered scorer (see helpers.scorers) or list of names, a line or word matches
+                       if one of them accepts it and the cheapest scorers are tried first
+        :param fuzzymatch_line_thr: line threshold of the entity, None for the threshold of the page
+        :param fuzzymatch_word_thr: word threshold of the entity, None for the threshold of the page
+        """
+        self.expected_texts = expected_texts
+        self.entity_type = entity_type
+        self.ignore_list = ignore_list
+        self.language = language
+        self.anchor_distance_x = anchor_distance_x
+        self.anchor_distance_y = anchor_distance_y
+        scorer_names = [scorer] if isinstance(scorer, str) or scorer is None else scorer
+        self.scorers = sorted(
+            [get_scorer(name) for name in scorer_names], key=lambda s: s.cost
+        )
+        self.fuzzymatch_line_thr = fuzzymatch_line_thr
+        self.fuzzymatch_word_thr = fuzzymatch_word_thr
+        # the anchor is matched against the lines like the expected texts of an entity
+        self.anchor = None
+        if anchor_label:
+            self.anchor = PreparedEntity([anchor_label], language=language)
+        # Separate the possible text into all words to later find all "WORD" blocks that belong to the entity
+        self.single_items = [item for word in expected_texts for item in word.split()]
+        self.cleaned_expected_texts = [
+            clean_text(word, language=language) for word in expected_texts
+        ]
+        self.cleaned_single_items = [
+            clean_text(item, language=language) for item in self.single_items
+        ]
+        # token sets and q-grams of the cleaned expected texts as seen by token_set_ratio
+        self.gram_signatures = [
+            gram_signature(cleaned_word) for cleaned_word in self.cleaned_expected_texts
+        ]
+        self.expected_tokens = [signature.tokens for signature in self.gram_signatures]
+
+    def line_threshold(self, fuzzymatch_line_thr):
+        """Return the line threshold of the entity, fuzzymatch_line_thr if it has none."""
+        if self.fuzzymatch_line_thr is None:
+            return fuzzymatch_line_thr
+        return self.fuzzymatch_line_thr
+
+    def word_threshold(self, fuzzymatch_word_thr):
+        """Return the word threshold of the entity, fuzzymatch_word_thr if it has none."""
+        if self.fuzzymatch_word_thr is None:
+            return fuzzymatch_word_thr
+        return self.fuzzymatch_word_thr
+
+    @property
+    def token_set_lines(self):
+        """Whether the lines of the entity are only scored with token_set_ratio (pruning, matrix and windows apply)."""
+        return all(scorer.token_set_lines for scorer in self.scorers)
+
+
+def prepare_entities(objects_to_find, language="de"):
+    """
+    Build one PreparedEntity per object of the expected entities file.
+
+    :param objects_to_find: list of dicts with the keys expected_texts, entity_type (optional), ignore_list (optional)
+                            and anchor_label, anchor_distance_x, anchor_distance_y, scorer, fuzzymatch_line_thr,
+                            fuzzymatch_word_thr (optional)
+    :param language: language used to clean the texts
+    :return: list of PreparedEntity in the order of objects_to_find
+    """
+    prepared_entities = []
+    for object in objects_to_find:
+        prepared_entities.append(
+            PreparedEntity(
+                object["expected_texts"],
+                entity_type=object.get("entity_type", "UNASSIGNED"),
+                ignore_list=object.get("ignore_list", []),
+                language=language,
+                anchor_label=object.get("anchor_label"),
+                anchor_distance_x=object.get("anchor_distance_x", ANCHOR_DISTANCE_X),
+                anchor_distance_y=object.get("anchor_distance_y", ANCHOR_DISTANCE_Y),
+                scorer=object.get("scorer", DEFAULT_SCORER),
+                fuzzymatch_line_thr=object.get("fuzzymatch_line_thr"),
+                fuzzymatch_word_thr=object.get("fuzzymatch_word_thr"),
+            )
+        )
+    return prepared_entities
@@ -57,6 +57,11 @@ class S3Helper(object):
         self.s3_client.upload_fileobj(io.BytesIO(content_bytes), bucket, key)
         #print(f'Uploaded data to {s3_path}')
 
+    def delete_object(self, s3_path: str):
+        """Delete the object of the given s3 path, nothing happens if there is none."""
+        bucket, key = S3Helper.bucket_key_from_s3_uri(s3_path)
+        self.s3_client.delete_object(Bucket=bucket, Key=key)
+
     def copy_file(self, old_s3_path: str, new_s3_path: str):
         """Copy object from one location to another within the same bucket."""
         old_bucket_name, old_key = S3Helper.bucket_key_from_s3_uri(old_s3_path)
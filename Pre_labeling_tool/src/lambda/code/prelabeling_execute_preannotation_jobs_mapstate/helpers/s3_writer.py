@@ -0,0 +1,120 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Writes to S3 submitted to a thread pool, so that the files of the pages are not written one round trip at a time."""
+
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
+
+LOGGER = logging.getLogger("PreLabeling")
+
+# the default connection pool of a boto3 client holds 10 connections
+MAX_CONCURRENT_WRITES = 10
+# writes submitted and not yet done, their content is kept in memory until they are done
+MAX_PENDING_WRITES = 50
+
+
+class S3Writer(object):
+    """
+    Drop-in replacement of S3Helper whose writes return at once and are done in a thread pool.
+
+    The writes go through the client of the wrapped S3Helper, shared by all threads. Everything else (reads, uri
+    helpers) is delegated to the wrapped S3Helper. flush waits for the writes and raises if any of them failed.
+    """
+
+    def __init__(
+        self,
+        s3_helper,
+        max_workers=MAX_CONCURRENT_WRITES,
+        max_pending=MAX_PENDING_WRITES,
+    ):
+        """
+        :param s3_helper: S3Helper doing the writes
+        :param max_workers: number of writes done at the same time
+        :param max_pending: number of writes submitted and not yet done, a write waits when it is reached
+        """
+        self.s3_helper = s3_helper
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="s3-writer"
+        )
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.lock = threading.Lock()
+        self.pending = set()
+        # exception of every s3 path that could not be written
+        self.errors = {}
+        self.written = 0
+
+    def __getattr__(self, name):
+        return getattr(self.s3_helper, name)
+
+    def write_content(self, s3_path, content):
+        """
+        Submit the write of a content to the given s3 path.
+
+        :param s3_path: S3 path to write to.
+        :param content: content to write
+        :return: s3_path
+        """
+        self.slots.acquire()
+        future = self.executor.submit(self.s3_helper.write_content, s3_path, content)
+        with self.lock:
+            self.pending.add(future)
+        future.add_done_callback(partial(self._write_done, s3_path))
+        return s3_path
+
+    def write_json_dict(self, s3_path, dict):
+        """Submit the write of a dict as JSON, it is serialized at once so that it can be changed afterwards."""
+        return self.write_content(s3_path, json.dumps(dict))
+
+    def write_jsonl(self, s3_path, rows):
+        """Submit the write of a list of dictionaries as JSONL."""
+        return self.write_content(
+            s3_path, "".join([f"{json.dumps(row)}\n" for row in rows])
+        )
+
+    def _write_done(self, s3_path, future):
+        with self.lock:
+            self.pending.discard(future)
+            if future.exception() is not None:
+                self.errors[s3_path] = future.exception()
+            else:
+                self.written += 1
+        self.slots.release()
+
+    def flush(self):
+        """
+        Wait for all submitted writes.
+
+        :raises ValueError: naming every s3 path that could not be written, the exceptions are in errors
+        """
+        with self.lock:
+            pending = list(self.pending)
+        wait(pending)
+        with self.lock:
+            errors = dict(self.errors)
+        if errors:
+            for s3_path, error in errors.items():
+                LOGGER.error(f"Could not write {s3_path}: {error}")
+            raise ValueError(
+                "{} S3 writes failed: {}".format(len(errors), ", ".join(sorted(errors)))
+            )
+
+    def close(self):
+        """Flush the writes and stop the threads."""
+        try:
+            self.flush()
+        finally:
+            self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # the writes already submitted are still done, the original exception is not hidden by their errors
+            self.executor.shutdown(wait=True)
@@ -0,0 +1,60 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Batched fuzzy scoring of expected texts against the texts of a page."""
+
+import numpy as np
+from fuzzywuzzy.utils import full_process
+from rapidfuzz import fuzz, process
+
+# number of threads used by rapidfuzz to fill a score matrix (-1 uses all available cores)
+SCORE_MATRIX_WORKERS = -1
+
+
+def fuzzywuzzy_processor(text):
+    """Preprocess a text the same way fuzzywuzzy.fuzz.token_set_ratio does."""
+    return full_process(text, force_ascii=True)
+
+
+def score_matrix(
+    queries, choices, scorer, processor=None, workers=SCORE_MATRIX_WORKERS
+):
+    """
+    Score all queries against all choices in one call.
+
+    Scores are rounded to integers like the fuzzywuzzy scorers so that thresholds behave the same.
+
+    :param queries: list of strings (rows of the matrix)
+    :param choices: list of strings (columns of the matrix)
+    :param scorer: rapidfuzz scorer
+    :param processor: function applied once to every string before scoring
+    :param workers: number of threads used to compute the matrix
+    :return: numpy array of shape (len(queries), len(choices))
+    """
+    if len(queries) == 0 or len(choices) == 0:
+        return np.zeros((len(queries), len(choices)))
+    scores = process.cdist(
+        queries,
+        choices,
+        scorer=scorer,
+        processor=processor,
+        dtype=np.float64,
+        workers=workers,
+    )
+    return np.rint(scores)
+
+
+def line_scores(cleaned_expected_texts, cleaned_lines):
+    """Return the token_set_ratio matrix of the expected texts (rows) against the lines (columns)."""
+    return score_matrix(
+        cleaned_expected_texts,
+        cleaned_lines,
+        scorer=fuzz.token_set_ratio,
+        processor=fuzzywuzzy_processor,
+    )
+
+
+def word_match_mask(cleaned_words, cleaned_single_items, fuzzymatch_word_thr):
+    """Return for every word whether any single item passes the word threshold (ratio)."""
+    scores = score_matrix(cleaned_words, cleaned_single_items, scorer=fuzz.ratio)
+    return (scores > fuzzymatch_word_thr).any(axis=1)
@@ -0,0 +1,70 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Bounded memo of fuzzy scores shared by all pages and documents handled by a (warm) process."""
+
+import os
+from collections import OrderedDict
+
+# maximum number of (scorer, text, text) scores kept, 0 disables the memo
+SCORE_MEMO_SIZE = int(os.environ.get("SCORE_MEMO_SIZE", 2**18))
+
+
+class ScoreMemo(object):
+    """Least recently used memo of the scores of pairs of texts with hit and miss counters."""
+
+    def __init__(self, maxsize=SCORE_MEMO_SIZE):
+        """
+        :param maxsize: maximum number of scores kept, the least recently used score is evicted first
+        """
+        self.maxsize = maxsize
+        self.scores = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def score(self, scorer, text_a, text_b):
+        """
+        Return scorer(text_a, text_b), computed only if the pair is not in the memo.
+
+        :param scorer: fuzzy scorer, e.g. fuzzywuzzy.fuzz.ratio
+        :param text_a: first (cleaned) text
+        :param text_b: second (cleaned) text
+        :return: score of the scorer
+        """
+        key = (scorer, text_a, text_b)
+        if key in self.scores:
+            self.hits += 1
+            self.scores.move_to_end(key)
+            return self.scores[key]
+        self.misses += 1
+        score = scorer(text_a, text_b)
+        if self.maxsize > 0:
+            self.scores[key] = score
+            if len(self.scores) > self.maxsize:
+                self.scores.popitem(last=False)
+        return score
+
+    def resize(self, maxsize):
+        """Change the maximum number of scores kept, evicting the least recently used ones."""
+        self.maxsize = maxsize
+        while len(self.scores) > max(maxsize, 0):
+            self.scores.popitem(last=False)
+
+    def clear(self):
+        """Drop all scores and reset the counters."""
+        self.scores.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Return the counters of the memo."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self.scores),
+            "maxsize": self.maxsize,
+        }
+
+
+# module level memo, it lives as long as the process (across invocations of a warm Lambda container)
+SCORE_MEMO = ScoreMemo()
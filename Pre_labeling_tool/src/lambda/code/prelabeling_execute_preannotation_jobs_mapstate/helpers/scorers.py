@@ -0,0 +1,182 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Registry of the scorers an object of an expected entities file can be matched with."""
+
+import re
+
+from fuzzywuzzy import fuzz
+from rapidfuzz.distance import JaroWinkler
+
+# scorer of the objects that do not name one, the line and word scorers the matching always used
+DEFAULT_SCORER = "token_set"
+
+# separators inside a number ("0038-8425 7406", "19,102.60"), removed before the digits are compared
+DIGIT_SEPARATORS = re.compile(r"(?<=\d)[\s.,'/-]+(?=\d)")
+DIGIT_RUN = re.compile(r"\d+")
+# digits a word needs to match a part of a number, a "0" or "20" of the page does not belong to every account number
+MIN_WORD_DIGITS = 3
+
+
+def digits(text):
+    """Return the digits of a text."""
+    return "".join(DIGIT_RUN.findall(text))
+
+
+def digit_runs(text):
+    """Return the numbers of a text as digit strings, the separators inside a number are dropped."""
+    return DIGIT_RUN.findall(DIGIT_SEPARATORS.sub("", text))
+
+
+def digits_line_ratio(expected_text, line_text):
+    """100 if the digits of the expected text form one of the numbers of the line, else 0."""
+    expected_digits = digits(expected_text)
+    if expected_digits and expected_digits in digit_runs(line_text):
+        return 100
+    return 0
+
+
+def digits_word_ratio(word_text, expected_item):
+    """
+    100 if the digits of a word are those of an expected item or a part of them aligned on its groups, else 0.
+
+    The groups are the digit runs between separators: "8425" and "0038-8425" are parts of "0038-8425-7406",
+    "842" is not. A part needs MIN_WORD_DIGITS digits.
+    """
+    word_groups = DIGIT_RUN.findall(word_text)
+    item_groups = DIGIT_RUN.findall(expected_item)
+    if not word_groups:
+        return 0
+    if word_groups == item_groups:
+        return 100
+    if len("".join(word_groups)) < MIN_WORD_DIGITS:
+        return 0
+    for start in range(len(item_groups) - len(word_groups) + 1):
+        if item_groups[start : start + len(word_groups)] == word_groups:
+            return 100
+    return 0
+
+
+def exact_line_ratio(expected_text, line_text):
+    """100 if the expected text appears verbatim in the line, else 0."""
+    return 100 if expected_text and expected_text in line_text else 0
+
+
+def exact_word_ratio(word_text, expected_item):
+    """100 if a word is equal to an expected item, else 0."""
+    return 100 if word_text == expected_item else 0
+
+
+def jaro_winkler_ratio(text_a, text_b):
+    """Jaro-Winkler similarity of two texts as an integer between 0 and 100, tolerant of OCR noise in names."""
+    return int(round(100 * JaroWinkler.normalized_similarity(text_a, text_b)))
+
+
+def token_subset_shortcut(expected_tokens, line_tokens, expected_text, line_text):
+    """token_set_ratio is 100 when all tokens of the expected text are in the line."""
+    if expected_tokens and expected_tokens <= line_tokens:
+        return 100
+    return None
+
+
+def substring_shortcut(expected_tokens, line_tokens, expected_text, line_text):
+    """partial_ratio is 100 when the expected text appears verbatim in the line."""
+    if expected_text and expected_text in line_text:
+        return 100
+    return None
+
+
+class Scorer(object):
+    """Line and word scorers of an object, with an optional cheap check run before the line scorer."""
+
+    def __init__(
+        self,
+        name,
+        line_scorer,
+        word_scorer,
+        cost,
+        line_shortcut=None,
+        token_set_lines=False,
+    ):
+        """
+        :param name: name the objects of an expected entities file refer to
+        :param line_scorer: function (cleaned expected text, cleaned line) -> integer score between 0 and 100, a
+                            line matches when its score is above the line threshold, so a scorer that only gives 0
+                            or 100 (exact, digits) never matches with a threshold of 100
+        :param word_scorer: function (cleaned word, cleaned single item) -> integer score between 0 and 100
+        :param cost: relative cost of the line scorer, the objects of the cheapest scorers are matched first
+        :param line_shortcut: function (expected tokens, line tokens, cleaned expected text, cleaned line) returning
+                              the line score when it can be decided without the line scorer, None otherwise
+        :param token_set_lines: whether the line score is fuzzywuzzy's token_set_ratio, only these scorers can use
+                                the candidate pruning, the matrix engine and the windows over several lines
+        """
+        self.name = name
+        self.line_scorer = line_scorer
+        self.word_scorer = word_scorer
+        self.cost = cost
+        self.line_shortcut = line_shortcut
+        self.token_set_lines = token_set_lines
+
+    def __reduce__(self):
+        # scorers are pickled (page pool, compiled entities) by name so that the registered instance is used
+        return get_scorer, (self.name,)
+
+
+SCORERS = {}
+
+
+def register_scorer(scorer):
+    """Add or replace a scorer of the registry."""
+    SCORERS[scorer.name] = scorer
+    return scorer
+
+
+def get_scorer(name):
+    """
+    Return a registered scorer.
+
+    :param name: name of the scorer, None for the DEFAULT_SCORER
+    :return: Scorer
+    """
+    if name is None:
+        name = DEFAULT_SCORER
+    if name not in SCORERS:
+        raise ValueError(
+            "Unknown scorer {}, use one of {}".format(name, sorted(SCORERS))
+        )
+    return SCORERS[name]
+
+
+register_scorer(Scorer("exact", exact_line_ratio, exact_word_ratio, cost=0))
+register_scorer(Scorer("digits", digits_line_ratio, digits_word_ratio, cost=0))
+register_scorer(
+    Scorer(
+        "token_set",
+        fuzz.token_set_ratio,
+        fuzz.ratio,
+        cost=2,
+        line_shortcut=token_subset_shortcut,
+        token_set_lines=True,
+    )
+)
+register_scorer(Scorer("token_sort", fuzz.token_sort_ratio, fuzz.ratio, cost=2))
+register_scorer(
+    Scorer(
+        "partial_ratio",
+        fuzz.partial_ratio,
+        fuzz.ratio,
+        cost=3,
+        line_shortcut=substring_shortcut,
+    )
+)
+# the lines are found with token_set_ratio, the OCR noise of the words is tolerated by Jaro-Winkler
+register_scorer(
+    Scorer(
+        "jaro_winkler",
+        fuzz.token_set_ratio,
+        jaro_winkler_ratio,
+        cost=2,
+        line_shortcut=token_subset_shortcut,
+        token_set_lines=True,
+    )
+)
@@ -0,0 +1,111 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Uniform grid index over the bounding boxes of the blocks of a page."""
+
+# number of cells along each side of the page (Textract coordinates are ratios of the page size)
+GRID_SIZE = 20
+# default search region around an anchor: key/value pairs sit next to each other on a row or on the next row
+ANCHOR_DISTANCE_X = 0.5
+ANCHOR_DISTANCE_Y = 0.02
+
+
+def bounding_box(block):
+    """Return the (left, top, right, bottom) box of a block or None if it has no geometry."""
+    box = (block.get("Geometry") or {}).get("BoundingBox")
+    if not box:
+        return None
+    return (
+        box["Left"],
+        box["Top"],
+        box["Left"] + box["Width"],
+        box["Top"] + box["Height"],
+    )
+
+
+def reading_order(blocks):
+    """
+    Return the positions of the blocks sorted top to bottom, then left to right.
+
+    Falls back to the order of the blocks on the page if a block has no geometry.
+    """
+    boxes = [bounding_box(block) for block in blocks]
+    if any(box is None for box in boxes):
+        return list(range(len(blocks)))
+    return sorted(
+        range(len(blocks)),
+        key=lambda position: (boxes[position][1], boxes[position][0]),
+    )
+
+
+def expand_box(box, distance_x, distance_y):
+    """Grow a (left, top, right, bottom) box by a distance on every side."""
+    left, top, right, bottom = box
+    return (
+        left - distance_x,
+        top - distance_y,
+        right + distance_x,
+        bottom + distance_y,
+    )
+
+
+def boxes_intersect(box_a, box_b):
+    """Return whether two (left, top, right, bottom) boxes overlap (touching counts)."""
+    return (
+        box_a[0] <= box_b[2]
+        and box_b[0] <= box_a[2]
+        and box_a[1] <= box_b[3]
+        and box_b[1] <= box_a[3]
+    )
+
+
+class SpatialGridIndex(object):
+    """Maps every cell of a uniform grid over the page to the blocks whose bounding box overlaps it."""
+
+    def __init__(self, blocks, grid_size=GRID_SIZE):
+        """
+        Insert the bounding box of every block in the cells it overlaps, blocks without geometry are skipped.
+
+        :param blocks: Textract blocks of one page, a block is identified by its position in the list
+        :param grid_size: number of cells along each side of the page
+        """
+        self.grid_size = grid_size
+        self.boxes = [bounding_box(block) for block in blocks]
+        self.cells = {}
+        for position, box in enumerate(self.boxes):
+            if box is None:
+                continue
+            for cell in self._cells(box):
+                self.cells.setdefault(cell, []).append(position)
+
+    def _cell_range(self, low, high):
+        # cells are clamped to the page, boxes slightly outside of it end up in the border cells
+        first = min(max(int(low * self.grid_size), 0), self.grid_size - 1)
+        last = min(max(int(high * self.grid_size), 0), self.grid_size - 1)
+        return range(first, last + 1)
+
+    def _cells(self, box):
+        left, top, right, bottom = box
+        return [
+            (column, row)
+            for column in self._cell_range(left, right)
+            for row in self._cell_range(top, bottom)
+        ]
+
+    def query(self, box):
+        """
+        Return the positions of the blocks whose bounding box overlaps a box.
+
+        Only the cells covered by the box are visited.
+
+        :param box: (left, top, right, bottom) box in page coordinates
+        :return: sorted list of block positions
+        """
+        positions = set()
+        for cell in self._cells(box):
+            for position in self.cells.get(cell, []):
+                if position not in positions and boxes_intersect(
+                    self.boxes[position], box
+                ):
+                    positions.add(position)
+        return sorted(positions)
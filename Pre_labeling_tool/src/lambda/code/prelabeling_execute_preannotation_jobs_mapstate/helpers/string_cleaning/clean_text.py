@@ -1,21 +1,58 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: MIT-0
 
-import string
-
-from .languages.german import clean_text_de
-
 """
 add specifics for other languages here follow the structure of the german clean_text_de and add the information to the dict of cleaners
+(or call register_text_cleaner), a cleaner compiles its tables once at import and should be a single pass over the text
 """
-# from shared_libraries.string_cleaning.languages.clean_customer_name_fr import clean_customer_name_fr
+
+from functools import lru_cache
+
+from .languages.english import clean_text_en
+from .languages.french import clean_text_fr
+from .languages.german import clean_text_de
+from .languages.italian import clean_text_it
+from .languages.spanish import clean_text_es
+
+# number of (language, text) pairs whose cleaned text is kept in memory, None keeps all of them
+CLEAN_TEXT_CACHE_SIZE = 2 ** 16
 
 dict_text_cleaners = {
     "de": clean_text_de,
-    # "fr":clean_text_fr
+    "fr": clean_text_fr,
+    "es": clean_text_es,
+    "it": clean_text_it,
+    "en": clean_text_en,
 }
 
-def clean_text(text, language="de"):
+
+def register_text_cleaner(language, cleaner):
+    """
+    Add or replace the cleaner of a language
+    :param language: language code, e.g. "de"
+    :param cleaner: function mapping a lower cased text to its cleaned text
+    """
+    dict_text_cleaners[language] = cleaner
+    _cached_clean_text.cache_clear()
+
+
+def _clean_text(language, text):
     text = text.lower()
     cleaned_text = dict_text_cleaners[language](text)
     return cleaned_text
+
+
+_cached_clean_text = lru_cache(maxsize=CLEAN_TEXT_CACHE_SIZE)(_clean_text)
+
+
+def clean_text(text, language="de", use_cache=True):
+    """
+    Lower case a text and apply the cleaner of its language
+    :param text: text to clean
+    :param language: language code of the cleaner
+    :param use_cache: look the cleaned text up in the LRU memo keyed by (language, text)
+    :return: cleaned text
+    """
+    if use_cache:
+        return _cached_clean_text(language, text)
+    return _clean_text(language, text)
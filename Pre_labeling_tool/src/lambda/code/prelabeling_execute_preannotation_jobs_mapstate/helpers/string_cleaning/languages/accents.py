@@ -0,0 +1,40 @@
+import unicodedata
+
+# letters that do not decompose into a base letter and combining marks
+LIGATURES = {
+    'æ': 'ae',
+    'œ': 'oe',
+    'ĳ': 'ij',
+    'ß': 'ss',
+    'ø': 'o',
+    'đ': 'd',
+    'ł': 'l',
+}
+
+
+def fold_accent(char):
+    """
+    Folds a single accented letter to its base letter(s), keeping its case
+    :param char: letter to fold
+    :return: folded letter(s)
+    """
+    lower_char = char.lower()
+    if lower_char in LIGATURES:
+        folded = LIGATURES[lower_char]
+        return folded.upper() if char != lower_char else folded
+    return ''.join(c for c in unicodedata.normalize('NFD', char) if not unicodedata.combining(c))
+
+
+def accent_folding_table(characters):
+    """
+    Compiles the translation table that folds the given accented letters in both cases
+    :param characters: lower case accented letters of a language
+    :return: table for str.translate
+    """
+    mapping = {}
+    for char in characters:
+        for variant in (char, char.upper()):
+            # upper casing can give several letters (e.g. 'ß' -> 'SS'), those are left alone
+            if len(variant) == 1:
+                mapping[variant] = fold_accent(variant)
+    return str.maketrans(mapping)
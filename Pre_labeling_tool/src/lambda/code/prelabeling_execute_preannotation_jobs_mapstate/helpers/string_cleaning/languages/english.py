@@ -0,0 +1,16 @@
+from .accents import accent_folding_table
+
+# compiled once, English texts borrow accented words from many languages (café, naïve, Zoë), so all lower case
+# letters of the Latin-1 Supplement and Latin Extended-A blocks are folded
+ACCENT_TABLE = accent_folding_table(
+    ''.join(chr(code) for code in range(0xC0, 0x180) if chr(code).isalpha() and chr(code).islower())
+)
+
+
+def clean_text_en(string):
+    """
+    Removes the accents of English texts
+    :param string: string to remove accents from
+    :return: string without accents
+    """
+    return string.translate(ACCENT_TABLE)
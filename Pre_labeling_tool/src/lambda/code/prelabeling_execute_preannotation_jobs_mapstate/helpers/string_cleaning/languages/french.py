@@ -0,0 +1,13 @@
+from .accents import accent_folding_table
+
+# compiled once, folds the accented letters of the French alphabet in a single pass over the string
+ACCENT_TABLE = accent_folding_table('àâæçéèêëîïôœùûüÿ')
+
+
+def clean_text_fr(string):
+    """
+    Removes the accents of French texts
+    :param string: string to remove accents from
+    :return: string without accents
+    """
+    return string.translate(ACCENT_TABLE)
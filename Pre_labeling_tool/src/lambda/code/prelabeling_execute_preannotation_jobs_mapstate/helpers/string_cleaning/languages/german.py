@@ -1,6 +1,14 @@
-import string
-
-
+# compiled once, maps the umlauts and the sharp s in both cases in a single pass over the string
+UMLAUT_TABLE = str.maketrans({
+    'ü': 'u',
+    'Ü': 'U',
+    'ä': 'a',
+    'Ä': 'A',
+    'ö': 'o',
+    'Ö': 'O',
+    'ß': 'ss',
+    'ẞ': 'SS',
+})
 
 
 def clean_text_de(string):
@@ -8,23 +16,8 @@ def clean_text_de(string):
 
 def remove_umlaut(string):
     """
-    Removes umlauts from strings and replaces them with the letter+e convention
+    Removes umlauts from strings and replaces them with the letter without the umlaut
     :param string: string to remove umlauts from
     :return: unumlauted string
     """
-    u = 'ü'.encode()
-    U = 'Ü'.encode()
-    a = 'ä'.encode()
-    A = 'Ä'.encode()
-    o = 'ö'.encode()
-    O = 'Ö'.encode()
-    ss = 'ß'.encode()
-
-    string = string.encode()
-    string = string.replace(u, b'u')
-    string = string.replace(a, b'a')
-    string = string.replace(o, b'o')
-    string = string.replace(ss, b'ss')
-
-    string = string.decode('utf-8')
-    return string
+    return string.translate(UMLAUT_TABLE)
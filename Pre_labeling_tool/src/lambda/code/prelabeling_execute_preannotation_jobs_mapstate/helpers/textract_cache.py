@@ -0,0 +1,278 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Textract blocks of the documents already processed, cached by the content hash of the document."""
+
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import Counter
+
+from botocore.exceptions import ClientError
+
+LOGGER = logging.getLogger("PreLabeling")
+
+# bump when the cached entries change, older entries are then missed
+TEXTRACT_CACHE_VERSION = 2
+# API and feature set of the Textract call of the tool, part of the key so that another call is never served
+TEXTRACT_API = "StartDocumentTextDetection"
+TEXTRACT_FEATURES = ()
+# entries older than this are dropped when read, Textract models get updated
+CACHE_TTL_SECONDS = 30 * 24 * 3600
+# blocks are mostly repeated JSON keys, a fast compression level is enough
+COMPRESSION_LEVEL = 1
+METRICS = ["hits", "misses", "expired", "writes", "errors"]
+
+
+def textract_cache_key(document, api=TEXTRACT_API, features=TEXTRACT_FEATURES):
+    """
+    Return the cache key of the Textract blocks of a document.
+
+    :param document: bytes of the document (e.g. the PDF file)
+    :param api: Textract API the blocks come from
+    :param features: Textract feature types of the call (e.g. ["TABLES", "FORMS"])
+    :return: hex sha256 digest
+    """
+    digest = hashlib.sha256(document)
+    digest.update(
+        "|{}|{}|{}".format(
+            api, ",".join(sorted(features)), TEXTRACT_CACHE_VERSION
+        ).encode("utf-8")
+    )
+    return digest.hexdigest()
+
+
+def entry_lines(content):
+    """
+    Decompress a cache entry one line at a time.
+
+    :param content: gzip compressed entry
+    :return: generator of the lines without their line break, the gzip checksum is checked after the last line
+    """
+    with gzip.GzipFile(fileobj=io.BytesIO(content), mode="rb") as lines:
+        for line in lines:
+            if not line.endswith(b"\n"):
+                raise ValueError("the last line of the entry is truncated")
+            yield line[:-1]
+
+
+def check_header(header):
+    """
+    Return the header of a cache entry.
+
+    :param header: decoded first line of the entry
+    :return: header
+    :raises ValueError: if the header is not the one of an entry of this version
+    """
+    if not isinstance(header, dict) or header.get("version") != TEXTRACT_CACHE_VERSION:
+        raise ValueError("not a version {} header".format(TEXTRACT_CACHE_VERSION))
+    if not isinstance(header.get("created"), (int, float)) or not isinstance(
+        header.get("pages"), int
+    ):
+        raise ValueError("header without creation time or number of pages")
+    return header
+
+
+class S3CacheBackend(object):
+    """Entries stored as objects under a prefix of a bucket."""
+
+    def __init__(self, s3_helper, bucket, prefix):
+        """
+        :param s3_helper: S3Helper used to read and write the entries
+        :param bucket: bucket of the cache, e.g. the output bucket of the tool
+        :param prefix: folder of the cache in the bucket, ending with "/"
+        """
+        self.s3_helper = s3_helper
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def uri(self, key):
+        return self.s3_helper.s3_uri_from_bucket_key(
+            self.bucket, self.prefix + key + ".json.gz"
+        )
+
+    def read(self, key):
+        """Return the content of an entry, None if there is none."""
+        try:
+            response = self.s3_helper.get_object_response_from_s3(self.uri(key))
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise
+        return response["Body"].read()
+
+    def write(self, key, content):
+        self.s3_helper.write_content(self.uri(key), content)
+
+    def delete(self, key):
+        self.s3_helper.delete_object(self.uri(key))
+
+
+class LocalCacheBackend(object):
+    """Entries stored as files of a local directory, e.g. for tests or a local run of the tool."""
+
+    def __init__(self, directory):
+        """
+        :param directory: directory of the cache, created when the first entry is written
+        """
+        self.directory = directory
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".json.gz")
+
+    def read(self, key):
+        try:
+            with open(self.path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, key, content):
+        # written to a temporary file first so that a concurrent reader never sees a partial entry
+        os.makedirs(self.directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.directory, delete=False) as f:
+            f.write(content)
+        os.replace(f.name, self.path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+
+class TextractCache(object):
+    """
+    Cache of Textract blocks with a time to live and hit/miss metrics.
+
+    An entry is a gzip-compressed JSON lines file: a header with the creation time and the number of pages,
+    then the blocks of one page per line, so that the pages can be written and decoded one at a time. A truncated
+    or corrupt entry fails the gzip checksum, an entry with fewer lines than pages fails the header count.
+
+    The cache never fails a run: an entry that can not be read or written is logged, counted as an error
+    and Textract is called as if the cache was empty.
+    """
+
+    def __init__(self, backend, ttl_seconds=CACHE_TTL_SECONDS, clock=time.time):
+        """
+        :param backend: S3CacheBackend or LocalCacheBackend (read, write and delete of compressed entries)
+        :param ttl_seconds: age after which an entry is dropped, None to keep the entries forever
+        :param clock: function returning the current time in seconds
+        """
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.metrics = Counter({name: 0 for name in METRICS})
+
+    def get(self, key):
+        """
+        Return the cached pages of a key, None on a miss.
+
+        An expired entry is deleted and counted as a miss, an unreadable entry is deleted and counted as an error
+        and a miss.
+
+        :return: (number of pages, generator of the blocks of every page) or None
+        """
+        try:
+            content = self.backend.read(key)
+        except Exception as e:
+            LOGGER.warning(f"Could not read Textract cache entry {key}: {e}")
+            self.metrics["errors"] += 1
+            content = None
+        header = None
+        if content:
+            try:
+                # first pass over the entry: its checksum and length are checked before a page is used,
+                # the lines are decompressed one at a time and dropped
+                lines = entry_lines(content)
+                header = check_header(json.loads(next(lines, b"")))
+                number_lines = sum(1 for _ in lines)
+                if number_lines != header["pages"]:
+                    raise ValueError(
+                        "{} of {} pages stored".format(number_lines, header["pages"])
+                    )
+            except Exception as e:
+                LOGGER.warning(f"Evicting unreadable Textract cache entry {key}: {e}")
+                self.metrics["errors"] += 1
+                self.evict(key)
+                header = None
+        if (
+            header is not None
+            and self.ttl_seconds is not None
+            and self.clock() - header["created"] > self.ttl_seconds
+        ):
+            self.metrics["expired"] += 1
+            self.evict(key)
+            header = None
+        if header is None:
+            self.metrics["misses"] += 1
+            return None
+        self.metrics["hits"] += 1
+        # second pass: the pages are decoded while they are consumed
+        page_lines = itertools.islice(entry_lines(content), 1, None)
+        return header["pages"], (json.loads(line) for line in page_lines)
+
+    def put(self, key, number_pages, pages):
+        """
+        Store the pages of a key while they are handed over.
+
+        :param number_pages: number of pages of the document
+        :param pages: iterable of the blocks of every page
+        :return: generator of the blocks of every page, the entry is written once the last page has been consumed
+        """
+        content = io.BytesIO()
+        with gzip.GzipFile(
+            fileobj=content, mode="wb", compresslevel=COMPRESSION_LEVEL
+        ) as lines:
+            header = {
+                "version": TEXTRACT_CACHE_VERSION,
+                "created": self.clock(),
+                "pages": number_pages,
+            }
+            lines.write(json.dumps(header).encode("utf-8") + b"\n")
+            for page_blocks in pages:
+                lines.write(
+                    json.dumps(page_blocks, separators=(",", ":")).encode("utf-8")
+                    + b"\n"
+                )
+                yield page_blocks
+        try:
+            self.backend.write(key, content.getvalue())
+            self.metrics["writes"] += 1
+        except Exception as e:
+            LOGGER.warning(f"Could not store Textract cache entry {key}: {e}")
+            self.metrics["errors"] += 1
+
+    def evict(self, key):
+        try:
+            self.backend.delete(key)
+        except Exception as e:
+            LOGGER.warning(f"Could not evict Textract cache entry {key}: {e}")
+            self.metrics["errors"] += 1
+
+    def fetch_pages(
+        self, document, detect_pages, api=TEXTRACT_API, features=TEXTRACT_FEATURES
+    ):
+        """
+        Return the pages of a document, from the cache or from detect_pages on a miss.
+
+        :param document: bytes of the document
+        :param detect_pages: function without arguments calling Textract and returning the number of pages and an
+                             iterable of the blocks of every page
+        :param api: Textract API called by detect_pages
+        :param features: Textract feature types of the call
+        :return: (number of pages, generator of the blocks of every page in page order)
+        """
+        key = textract_cache_key(document, api=api, features=features)
+        cached = self.get(key)
+        if cached is not None:
+            LOGGER.info(f"Textract blocks found in the cache ({key})")
+            return cached
+        number_pages, pages = detect_pages()
+        return number_pages, self.put(key, number_pages, pages)
@@ -0,0 +1,158 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Asynchronous Textract text detection read one result page at a time and handed over one PDF page at a time."""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from helpers.page_blocks import iter_page_blocks
+from helpers.s3_helper import S3Helper
+
+LOGGER = logging.getLogger("PreLabeling")
+
+# blocks per result page, the maximum of GetDocumentTextDetection
+MAX_RESULTS = 1000
+# seconds between two checks of the status of a job
+POLLING_INTERVAL = 1
+# seconds a job may stay in progress, below the 300 seconds timeout of the lambda so that the run fails with a reason
+JOB_TIMEOUT = 240
+# API of the synchronous detection of a single page, part of the Textract cache key of the page
+DETECT_PAGE_API = "DetectDocumentText"
+
+_END = object()
+
+
+def start_text_detection(document_s3_uri, textract_client):
+    """
+    Start an asynchronous text detection job.
+
+    :param document_s3_uri: uri of the PDF file
+    :param textract_client: boto3 Textract client
+    :return: JobId
+    """
+    bucket, key = S3Helper.bucket_key_from_s3_uri(document_s3_uri)
+    response = textract_client.start_document_text_detection(
+        DocumentLocation={"S3Object": {"Bucket": bucket, "Name": key}}
+    )
+    return response["JobId"]
+
+
+def wait_for_text_detection(
+    job_id, textract_client, polling_interval=POLLING_INTERVAL, timeout=JOB_TIMEOUT
+):
+    """
+    Wait for a text detection job to end.
+
+    :param job_id: JobId of the job
+    :param textract_client: boto3 Textract client
+    :param polling_interval: seconds between two checks of the status of the job
+    :param timeout: seconds after which a job still in progress is given up
+    :return: first result page of the job
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        response = textract_client.get_document_text_detection(
+            JobId=job_id, MaxResults=MAX_RESULTS
+        )
+        if response["JobStatus"] != "IN_PROGRESS":
+            break
+        if time.monotonic() >= deadline:
+            raise TimeoutError(
+                "Textract job {} still in progress after {} seconds".format(
+                    job_id, timeout
+                )
+            )
+        time.sleep(polling_interval)
+    if response["JobStatus"] == "FAILED":
+        raise ValueError(
+            "Textract job {} failed: {}".format(job_id, response.get("StatusMessage"))
+        )
+    for warning in response.get("Warnings", []):
+        LOGGER.warning(
+            f"Textract job {job_id}: {warning.get('ErrorCode')} on pages {warning.get('Pages')}"
+        )
+    return response
+
+
+def iter_result_blocks(first_response, job_id, textract_client):
+    """
+    Yield the blocks of every result page of a text detection job, the next result page is only requested
+    when the blocks of the previous one have been consumed.
+
+    :param first_response: first result page, as returned by wait_for_text_detection
+    :param job_id: JobId of the job
+    :param textract_client: boto3 Textract client
+    :return: generator of lists of blocks
+    """
+    response = first_response
+    while True:
+        yield response.get("Blocks", [])
+        next_token = response.get("NextToken")
+        if not next_token:
+            return
+        response = textract_client.get_document_text_detection(
+            JobId=job_id, MaxResults=MAX_RESULTS, NextToken=next_token
+        )
+
+
+def prefetch(iterable):
+    """
+    Yield the items of an iterable while the next item is computed in a background thread.
+
+    Used to request the next result page while the current page is matched and written.
+    """
+    iterator = iter(iterable)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(next, iterator, _END)
+        while True:
+            item = future.result()
+            if item is _END:
+                return
+            future = executor.submit(next, iterator, _END)
+            yield item
+
+
+def stream_document_pages(
+    document_s3_uri,
+    textract_client,
+    polling_interval=POLLING_INTERVAL,
+    prefetch_results=True,
+    timeout=JOB_TIMEOUT,
+):
+    """
+    Run the text detection of a document and hand over its pages one at a time.
+
+    Only the result pages holding the current PDF page (and the next result page when prefetch_results) are kept in
+    memory, the blocks of the whole document are never merged.
+
+    :param document_s3_uri: uri of the PDF file
+    :param textract_client: boto3 Textract client
+    :param polling_interval: seconds between two checks of the status of the job
+    :param prefetch_results: request the next result page in a background thread while a page is processed
+    :param timeout: seconds after which a job still in progress is given up
+    :return: (number of pages, generator of the blocks of every page in page order)
+    """
+    job_id = start_text_detection(document_s3_uri, textract_client)
+    LOGGER.info(f"Started Textract job {job_id}")
+    first_response = wait_for_text_detection(
+        job_id, textract_client, polling_interval=polling_interval, timeout=timeout
+    )
+    result_blocks = iter_result_blocks(first_response, job_id, textract_client)
+    if prefetch_results:
+        result_blocks = prefetch(result_blocks)
+    pages = (page_blocks for _, page_blocks in iter_page_blocks(result_blocks))
+    return first_response["DocumentMetadata"]["Pages"], pages
+
+
+def detect_page_text(page_bytes, textract_client):
+    """
+    Detect the text of a single page synchronously.
+
+    :param page_bytes: bytes of a single page PDF or of an image
+    :param textract_client: boto3 Textract client
+    :return: blocks of the page
+    """
+    response = textract_client.detect_document_text(Document={"Bytes": page_bytes})
+    return response["Blocks"]
@@ -2,13 +2,38 @@
 # SPDX-License-Identifier: MIT-0
 
 import copy
+import time
+from collections import deque
 
 import numpy as np
 from fuzzywuzzy import fuzz
+from helpers.exact_matcher import ExactTextMatcher
+from helpers.line_windows import coverage_ratio, matched_windows
+from helpers.prepared_page import (
+    PreparedEntity,
+    PreparedPage,
+    cumulative_word_spans,
+)
+from helpers.score_memo import SCORE_MEMO
+from helpers.score_matrix import line_scores, word_match_mask
+from helpers.scorers import DEFAULT_SCORER, get_scorer
+from helpers.spatial_index import bounding_box, expand_box
 from helpers.string_cleaning.clean_text import clean_text
 
 FUZZYMATCH_LINE_THR = 90
 FUZZYMATCH_WORD_THR = 60
+# "pairwise" scores one (expected text, block text) pair at a time with fuzzywuzzy
+# "matrix" scores all pairs of a page in one batched rapidfuzz call
+MATCHING_ENGINES = ["pairwise", "matrix"]
+MATCHING_ENGINE = "pairwise"
+# only score the lines that the token/q-gram index can not rule out for the line threshold
+PRUNE_CANDIDATES = True
+# look for verbatim occurrences of the expected texts first, only objects without any occurrence are fuzzy matched
+EXACT_MATCH_FIRST = False
+# only look for the objects with an anchor_label on the lines near a line matching their anchor
+SPATIAL_MATCHING = False
+# maximum number of consecutive lines (in reading order) an entity can span, 1 only matches single lines
+WINDOW_LINES = 1
 
 
 def find_text_Item_on_page(
@@ -19,116 +44,780 @@ def find_text_Item_on_page(
     fuzzymatch_word_thr=FUZZYMATCH_WORD_THR,
     ignore_list=[],
     language="de",
+    prepared_page=None,
+    prepared_entity=None,
+    engine=MATCHING_ENGINE,
+    prune_candidates=PRUNE_CANDIDATES,
+    trace=None,
 ):
+    # trace is a helpers.match_trace.MatchTrace collecting how every entity was found, None to not collect anything
+    if engine not in MATCHING_ENGINES:
+        raise ValueError(
+            "Unknown matching engine {}, use one of {}".format(engine, MATCHING_ENGINES)
+        )
+    # the prepared structures hold the cleaned texts so that they are not recomputed for every pairing
+    if prepared_page is None:
+        prepared_page = PreparedPage(blocks, language=language)
+    if prepared_entity is None:
+        prepared_entity = PreparedEntity(
+            expected_texts,
+            entity_type=entity_type,
+            ignore_list=ignore_list,
+            language=language,
+        )
     found_entities = []
-    single_items = (
-        []
-    )  # Separate the possible text into all words to later find all "WORD" blocks that belong to the entity
-    for word in expected_texts:
-        for item in word.split():
-            single_items.append(item)
+    matched_line_ids = get_matched_line_ids(
+        prepared_page,
+        prepared_entity,
+        fuzzymatch_line_thr,
+        engine=engine,
+        prune_candidates=prune_candidates,
+        trace=trace,
+    )
 
     for block in blocks:  # Go though all blocks and check if there is a match
         if block["BlockType"] == "LINE":  # first-find-parent-block --- which is a line
             # first try the fuzzy matching of the words
-            if any(
-                fuzz.token_set_ratio(
-                    clean_text(word, language=language),
-                    clean_text(block["Text"], language=language),
+            if block["Id"] in matched_line_ids:
+                entity = get_line_entity(
+                    block,
+                    prepared_page,
+                    prepared_entity,
+                    entity_type,
+                    fuzzymatch_word_thr=fuzzymatch_word_thr,
+                    language=language,
+                    engine=engine,
+                    trace=trace,
                 )
-                > fuzzymatch_line_thr
-                for word in expected_texts
+                if entity not in found_entities:
+                    if entity["Text"] not in ignore_list:
+                        found_entities.append(entity)
+                        if trace is not None:
+                            trace.record_entity(entity, prepared_entity, "line")
+
+    if trace is not None:
+        trace.finish()
+    return found_entities
+
+
+def get_line_entity(
+    block,
+    prepared_page,
+    prepared_entity,
+    entity_type,
+    fuzzymatch_word_thr=FUZZYMATCH_WORD_THR,
+    language="de",
+    engine=MATCHING_ENGINE,
+    trace=None,
+):
+    # builds the entity of a matched LINE block from its child blocks that belong to the entity
+    entity = {}
+    block_ref, total_text = get_line_block_reference(
+        block,
+        prepared_page,
+        prepared_entity,
+        fuzzymatch_word_thr=fuzzymatch_word_thr,
+        language=language,
+        engine=engine,
+        trace=trace,
+    )
+    entity["BlockReferences"] = [block_ref]
+    entity["Text"] = total_text
+    entity["Type"] = entity_type
+    entity["Score"] = 1
+    return entity
+
+
+def get_window_entity(
+    window_blocks,
+    prepared_page,
+    prepared_entity,
+    entity_type,
+    fuzzymatch_word_thr=FUZZYMATCH_WORD_THR,
+    language="de",
+    engine=MATCHING_ENGINE,
+    trace=None,
+):
+    # builds the entity spanning several LINE blocks, with one block reference per line holding a part of it
+    entity = {}
+    block_refs = []
+    texts = []
+    for block in window_blocks:
+        block_ref, total_text = get_line_block_reference(
+            block,
+            prepared_page,
+            prepared_entity,
+            fuzzymatch_word_thr=fuzzymatch_word_thr,
+            language=language,
+            engine=engine,
+            trace=trace,
+        )
+        if total_text:
+            block_refs.append(block_ref)
+            texts.append(total_text)
+    entity["BlockReferences"] = block_refs
+    entity["Text"] = " ".join(texts)
+    entity["Type"] = entity_type
+    entity["Score"] = 1
+    return entity
+
+
+def get_line_block_reference(
+    block,
+    prepared_page,
+    prepared_entity,
+    fuzzymatch_word_thr=FUZZYMATCH_WORD_THR,
+    language="de",
+    engine=MATCHING_ENGINE,
+    trace=None,
+):
+    # block reference to the child blocks of a LINE block that belong to the entity and their text
+    BeginOffset_line = 0
+
+    main_ID = block["Id"]
+    total_text = ""
+    child_block_part_of_entity = []
+    child_blocks = prepared_page.block_graph.children(block)
+    # spans of the child blocks in the LINE text, computed once when the page was prepared
+    child_spans = prepared_page.word_offsets.get(main_ID)
+    if child_spans is None:
+        child_spans = cumulative_word_spans(child_blocks)
+
+    (
+        child_block_part_of_entity,
+        total_text,
+        BeginOffset_line,
+    ) = check_which_child_blocks_are_in_entity(
+        prepared_entity.single_items,
+        child_blocks,
+        fuzzymatch_word_thr=fuzzymatch_word_thr,
+        language=language,
+        prepared_page=prepared_page,
+        prepared_entity=prepared_entity,
+        engine=engine,
+        child_spans=child_spans,
+        trace=trace,
+        line_id=main_ID,
+    )
+
+    block_ref = {"BlockId": main_ID}
+    block_ref["ChildBlocks"] = child_block_part_of_entity
+    block_ref["BeginOffset"] = BeginOffset_line
+
+    if child_block_part_of_entity:
+        # the entity ends with its last child block
+        last_child_id = child_block_part_of_entity[-1]["ChildBlockId"]
+        EndOffset_line = [
+            span[1]
+            for c_block, span in zip(child_blocks, child_spans)
+            if c_block["Id"] == last_child_id
+        ][-1]
+    else:
+        EndOffset_line = BeginOffset_line + len(total_text)
+    block_ref["EndOffset"] = int(np.minimum(EndOffset_line, len(block["Text"])))
+    return block_ref, total_text
+
+
+def get_exact_entity(block, begin, end, child_blocks, entity_type):
+    # builds the entity of a verbatim occurrence of an expected text in a LINE block
+    entity = {}
+    block_ref = {"BlockId": block["Id"]}
+    block_ref["ChildBlocks"] = [
+        {
+            "BeginOffset": 0,
+            "EndOffset": len(c_block["Text"]),
+            "ChildBlockId": c_block["Id"],
+        }
+        for c_block in child_blocks
+    ]
+    entity["BlockReferences"] = [block_ref]
+    block_ref["BeginOffset"] = begin
+    block_ref["EndOffset"] = end
+    entity["Text"] = block["Text"][begin:end]
+    entity["Type"] = entity_type
+    entity["Score"] = 1
+    return entity
+
+
+def entity_key(entity):
+    # hashable key of an entity, two entities are equal if and only if their keys are equal
+    return (
+        entity["Type"],
+        entity["Text"],
+        entity["Score"],
+        tuple(
+            (
+                block_ref["BlockId"],
+                block_ref["BeginOffset"],
+                block_ref["EndOffset"],
+                tuple(
+                    (
+                        child["ChildBlockId"],
+                        child["BeginOffset"],
+                        child["EndOffset"],
+                    )
+                    for child in block_ref["ChildBlocks"]
+                ),
+            )
+            for block_ref in entity["BlockReferences"]
+        ),
+    )
+
+
+def find_entities_on_page(
+    blocks,
+    prepared_entities,
+    fuzzymatch_line_thr=FUZZYMATCH_LINE_THR,
+    fuzzymatch_word_thr=FUZZYMATCH_WORD_THR,
+    language="de",
+    prepared_page=None,
+    engine=MATCHING_ENGINE,
+    prune_candidates=PRUNE_CANDIDATES,
+    exact_match_first=EXACT_MATCH_FIRST,
+    exact_matcher=None,
+    spatial_matching=SPATIAL_MATCHING,
+    window_lines=WINDOW_LINES,
+    trace=None,
+):
+    """
+    Find all objects of an expected entities file on a page with a single scan of its blocks.
+
+    Without exact_match_first, gives the same entities, in the same order, as calling
+    find_text_Item_on_page once per object and only keeping the entities that were not found before.
+    With exact_match_first, the verbatim occurrences of the cleaned expected texts are found first
+    in one pass of an Aho-Corasick automaton over the page and only the objects without any
+    occurrence go through the fuzzy matching.
+    With spatial_matching, an object with an anchor label is only looked for on the lines within its
+    anchor distance of a line matching the anchor label, and not at all on pages without its anchor.
+    With window_lines > 1, the fuzzy matched objects are also looked for on up to window_lines consecutive
+    lines in reading order (see helpers.line_windows.matched_windows). An entity found on such a window has
+    one block reference per line and replaces the entities of its parts found on the single lines.
+
+    :param blocks: Textract blocks of one page
+    :param prepared_entities: list of PreparedEntity (see helpers.prepared_page.prepare_entities)
+    :param exact_matcher: ExactTextMatcher built for prepared_entities, to reuse it across pages
+    :param trace: MatchTrace (see helpers.match_trace) receiving the explanation of every emitted entity and the
+                  counters of the page, None to not collect anything
+    :return: list of found entities tagged with the entity_type of their object
+    """
+    if engine not in MATCHING_ENGINES:
+        raise ValueError(
+            "Unknown matching engine {}, use one of {}".format(engine, MATCHING_ENGINES)
+        )
+    if prepared_page is None:
+        prepared_page = PreparedPage(blocks, language=language)
+
+    # positions of the lines each object is looked for on, None for the whole page
+    line_positions_per_object = [None for _ in prepared_entities]
+    if spatial_matching:
+        line_positions_per_object = [
+            get_anchor_line_positions(
+                prepared_page,
+                prepared_entity,
+                fuzzymatch_line_thr,
+                engine=engine,
+                prune_candidates=prune_candidates,
+                trace=trace,
+            )
+            for prepared_entity in prepared_entities
+        ]
+
+    found_entities_per_object = [[] for _ in prepared_entities]
+    found_keys_per_object = [set() for _ in prepared_entities]
+    # how every found entity was found ("exact", "window" or "line"), only kept for the trace
+    found_paths_per_object = [[] for _ in prepared_entities]
+
+    def add_entity(index, entity, path):
+        key = entity_key(entity)
+        if key not in found_keys_per_object[index]:
+            if entity["Text"] not in prepared_entities[index].ignore_list:
+                found_keys_per_object[index].add(key)
+                found_entities_per_object[index].append(entity)
+                if trace is not None:
+                    found_paths_per_object[index].append(path)
+
+    exact_matches = {}
+    if exact_match_first:
+        if exact_matcher is None:
+            exact_matcher = ExactTextMatcher(prepared_entities)
+        exact_matches = exact_matcher.find(prepared_page)
+        if trace is not None:
+            trace.count(
+                "exact_matches", sum(len(matches) for matches in exact_matches.values())
+            )
+        for index, line_positions in enumerate(line_positions_per_object):
+            if line_positions is not None and index in exact_matches:
+                line_positions = set(line_positions)
+                exact_matches[index] = [
+                    match
+                    for match in exact_matches[index]
+                    if match[0] in line_positions
+                ]
+                if not exact_matches[index]:
+                    del exact_matches[index]
+        for index, matches in exact_matches.items():
+            for line_position, begin, end, child_blocks in matches:
+                add_entity(
+                    index,
+                    get_exact_entity(
+                        prepared_page.line_blocks[line_position],
+                        begin,
+                        end,
+                        child_blocks,
+                        prepared_entities[index].entity_type,
+                    ),
+                    "exact",
+                )
+
+    # the objects resolved by the exact matching are not fuzzy matched
+    fuzzy_indices = [
+        index for index in range(len(prepared_entities)) if index not in exact_matches
+    ]
+    matched_line_ids = dict(
+        zip(
+            fuzzy_indices,
+            get_matched_line_ids_per_entity(
+                prepared_page,
+                [prepared_entities[index] for index in fuzzy_indices],
+                fuzzymatch_line_thr,
+                engine=engine,
+                prune_candidates=prune_candidates,
+                line_positions_per_entity=[
+                    line_positions_per_object[index] for index in fuzzy_indices
+                ],
+                trace=trace,
+            ),
+        )
+    )
+    # windows of consecutive lines holding an entity that wraps over several lines, the entity of a window
+    # is added at the first line of the window and replaces the parts of it matched on the single lines
+    windows_per_object = {index: {} for index in fuzzy_indices}
+    window_line_ids = {index: set() for index in fuzzy_indices}
+    if window_lines > 1:
+        for index in fuzzy_indices:
+            # the coverage of a window is a token measure, it does not apply to exact or digit scorers
+            if not prepared_entities[index].token_set_lines:
+                continue
+            line_positions = line_positions_per_object[index]
+            for window in matched_windows(
+                prepared_page.line_tokens,
+                prepared_page.reading_order,
+                prepared_entities[index].expected_tokens,
+                prepared_entities[index].line_threshold(fuzzymatch_line_thr),
+                window_lines,
+                allowed_positions=(
+                    None if line_positions is None else set(line_positions)
+                ),
             ):
-                entity = {}
-
-                BeginOffset_line = 0
-
-                main_ID = block["Id"]
-                total_text = ""
-                child_block_part_of_entity = []
-                child_blocks = []
-                for relatives in block["Relationships"]:
-                    if relatives["Type"] == "CHILD":
-                        child_blocks = [
-                            c_block
-                            for c_block in blocks
-                            if c_block["Id"] in relatives["Ids"]
-                        ]
+                first_line = prepared_page.line_blocks[min(window)]
+                windows_per_object[index].setdefault(first_line["Id"], []).append(
+                    window
+                )
+                window_line_ids[index].update(
+                    prepared_page.line_blocks[position]["Id"] for position in window
+                )
+                if trace is not None:
+                    trace.count("windows")
+                    tokens = frozenset().union(
+                        *[prepared_page.line_tokens[position] for position in window]
+                    )
+                    trace.record_window_score(
+                        prepared_entities[index],
+                        [
+                            prepared_page.line_blocks[position]["Id"]
+                            for position in window
+                        ],
+                        max(
+                            coverage_ratio(expected, tokens)
+                            for expected in prepared_entities[index].expected_tokens
+                        ),
+                    )
 
-                (
-                    child_block_part_of_entity,
-                    total_text,
-                    BeginOffset_line,
-                ) = check_which_child_blocks_are_in_entity(
-                    single_items,
-                    child_blocks,
+    for block in prepared_page.line_blocks:
+        for index in fuzzy_indices:
+            prepared_entity = prepared_entities[index]
+            for window in windows_per_object[index].get(block["Id"], []):
+                entity = get_window_entity(
+                    [prepared_page.line_blocks[position] for position in window],
+                    prepared_page,
+                    prepared_entity,
+                    prepared_entity.entity_type,
                     fuzzymatch_word_thr=fuzzymatch_word_thr,
                     language=language,
+                    engine=engine,
+                    trace=trace,
                 )
+                if entity["BlockReferences"]:
+                    add_entity(index, entity, "window")
+            if block["Id"] not in matched_line_ids[index]:
+                continue
+            if block["Id"] in window_line_ids[index]:
+                continue
+            entity = get_line_entity(
+                block,
+                prepared_page,
+                prepared_entity,
+                prepared_entity.entity_type,
+                fuzzymatch_word_thr=fuzzymatch_word_thr,
+                language=language,
+                engine=engine,
+                trace=trace,
+            )
+            add_entity(index, entity, "line")
+
+    # Only add new items to the list of found entities
+    all_found_entities = []
+    all_found_keys = set()
+    for index, found_entities in enumerate(found_entities_per_object):
+        for position, entity in enumerate(found_entities):
+            key = entity_key(entity)
+            if key not in all_found_keys:
+                all_found_keys.add(key)
+                all_found_entities.append(entity)
+                if trace is not None:
+                    trace.record_entity(
+                        entity,
+                        prepared_entities[index],
+                        found_paths_per_object[index][position],
+                    )
+    if trace is not None:
+        trace.finish()
+    return all_found_entities
 
-                block_ref = {"BlockId": main_ID}
-                block_ref["ChildBlocks"] = child_block_part_of_entity
-                entity["BlockReferences"] = [block_ref]
-                block_ref["BeginOffset"] = BeginOffset_line
 
-                block_ref["EndOffset"] = int(
-                    np.minimum(BeginOffset_line + len(total_text), len(block["Text"]))
+def get_anchor_line_positions(
+    prepared_page,
+    prepared_entity,
+    fuzzymatch_line_thr,
+    engine=MATCHING_ENGINE,
+    prune_candidates=PRUNE_CANDIDATES,
+    trace=None,
+):
+    # positions of the lines near the lines matching the anchor of an entity, None if the entity has no anchor
+    if prepared_entity.anchor is None:
+        return None
+    anchor_line_ids = get_matched_line_ids(
+        prepared_page,
+        prepared_entity.anchor,
+        fuzzymatch_line_thr,
+        engine=engine,
+        prune_candidates=prune_candidates,
+        trace=trace,
+    )
+    line_positions = set()
+    for block in prepared_page.line_blocks:
+        if block["Id"] not in anchor_line_ids:
+            continue
+        box = bounding_box(block)
+        if box is None:
+            continue
+        line_positions.update(
+            prepared_page.line_grid.query(
+                expand_box(
+                    box,
+                    prepared_entity.anchor_distance_x,
+                    prepared_entity.anchor_distance_y,
                 )
-                entity["Text"] = total_text
-                entity["Type"] = entity_type
-                entity["Score"] = 1
-                if entity not in found_entities:
-                    if entity["Text"] not in ignore_list:
-                        found_entities.append(entity)
+            )
+        )
+    return sorted(line_positions)
 
-            """# If you didn't find a matching child block through fuzzy matching check if the text is explicitly in the list of words
-            this part is not needed anymore because the fuzzy matching token_set_ratio will cover this
-            elif any(
-                clean_text(word, language=language)
-                in clean_text(block["Text"], language=language)
-                for word in expected_texts
+
+def get_matched_line_ids(
+    prepared_page,
+    prepared_entity,
+    fuzzymatch_line_thr,
+    engine=MATCHING_ENGINE,
+    prune_candidates=PRUNE_CANDIDATES,
+    line_positions=None,
+    trace=None,
+):
+    # Ids of the LINE blocks for which at least one expected text passes the line threshold with one of the scorers
+    # of the entity, tried from the cheapest one: a line accepted by a scorer is not scored by the next ones
+    # line_positions restricts the scored lines to these positions of prepared_page.line_blocks
+    line_blocks = prepared_page.line_blocks
+    cleaned_lines = prepared_page.cleaned_lines
+    fuzzymatch_line_thr = prepared_entity.line_threshold(fuzzymatch_line_thr)
+    allowed_positions = None if line_positions is None else set(line_positions)
+    if (
+        engine == "matrix"
+        and not prune_candidates
+        and line_positions is None
+        and prepared_entity.token_set_lines
+    ):
+        if trace is not None:
+            start = time.perf_counter()
+        scores = line_scores(prepared_entity.cleaned_expected_texts, cleaned_lines)
+        if trace is not None:
+            trace.count("scorer_seconds", time.perf_counter() - start)
+            for cleaned_word, text_scores in zip(
+                prepared_entity.cleaned_expected_texts, scores
             ):
-                entity = {}
-                BeginOffset_line = 0
-                main_ID = block["Id"]
-
-                total_text = ""
-                child_block_part_of_entity = []
-                child_blocks = []
-                for relatives in block["Relationships"]:
-                    if relatives["Type"] == "CHILD":
-                        child_blocks = [
-                            c_block
-                            for c_block in blocks
-                            if c_block["Id"] in relatives["Ids"]
-                        ]
+                record_line_scores(
+                    trace,
+                    prepared_page,
+                    prepared_entity,
+                    range(len(line_blocks)),
+                    text_scores,
+                    cleaned_word,
+                    prepared_entity.scorers[0].name,
+                )
+        line_matches = (scores > fuzzymatch_line_thr).any(axis=0)
+        return {
+            block["Id"]
+            for block, is_match in zip(line_blocks, line_matches)
+            if is_match
+        }
 
-                (
-                    child_block_part_of_entity,
-                    total_text,
-                    BeginOffset_line,
-                ) = check_which_child_blocks_are_in_entity(
-                    single_items,
-                    child_blocks,
-                    fuzzymatch_word_thr=fuzzymatch_word_thr,
-                    language=language,
+    matched_line_ids = set()
+    for cleaned_word, signature in zip(
+        prepared_entity.cleaned_expected_texts, prepared_entity.gram_signatures
+    ):
+        for scorer in prepared_entity.scorers:
+            # the q-gram bounds of the pruning only hold for token_set_ratio
+            if prune_candidates and scorer.token_set_lines:
+                positions = prepared_page.gram_index.candidate_positions(
+                    cleaned_word, fuzzymatch_line_thr, signature=signature
+                )
+                if trace is not None:
+                    trace.count(
+                        "line_pairs_pruned",
+                        (
+                            len(line_blocks)
+                            if allowed_positions is None
+                            else len(allowed_positions)
+                        )
+                        - sum(
+                            1
+                            for position in positions
+                            if allowed_positions is None
+                            or position in allowed_positions
+                        ),
+                    )
+            elif line_positions is not None:
+                positions = line_positions
+            else:
+                positions = range(len(line_blocks))
+            # lines matched by a previous expected text or scorer do not need to be scored again
+            positions = [
+                position
+                for position in positions
+                if line_blocks[position]["Id"] not in matched_line_ids
+                and (allowed_positions is None or position in allowed_positions)
+            ]
+            if trace is not None:
+                start = time.perf_counter()
+            if engine == "matrix" and scorer.token_set_lines:
+                scores = line_scores(
+                    [cleaned_word], [cleaned_lines[position] for position in positions]
+                )[0]
+            else:
+                scores = [
+                    line_score(
+                        scorer,
+                        cleaned_word,
+                        signature.tokens,
+                        prepared_page,
+                        position,
+                    )
+                    for position in positions
+                ]
+            if trace is not None:
+                trace.count("scorer_seconds", time.perf_counter() - start)
+                record_line_scores(
+                    trace,
+                    prepared_page,
+                    prepared_entity,
+                    positions,
+                    scores,
+                    cleaned_word,
+                    scorer.name,
                 )
+            matched_line_ids.update(
+                line_blocks[position]["Id"]
+                for position, score in zip(positions, scores)
+                if score > fuzzymatch_line_thr
+            )
+    return matched_line_ids
+
+
+def record_line_scores(
+    trace, prepared_page, prepared_entity, positions, scores, cleaned_word, scorer_name
+):
+    # adds the scores of an expected text against the lines at positions to a MatchTrace
+    trace.count("line_pairs_scored", len(positions))
+    for position, score in zip(positions, scores):
+        trace.record_line_score(
+            prepared_entity,
+            prepared_page.line_blocks[position]["Id"],
+            score,
+            cleaned_word,
+            scorer_name,
+        )
 
-                block_ref = {"BlockId": main_ID}
-                block_ref["ChildBlocks"] = child_block_part_of_entity
-                block_ref["BeginOffset"] = BeginOffset_line
-                block_ref["EndOffset"] = int(
-                    np.minimum(BeginOffset_line + len(total_text), len(block["Text"]))
+
+def line_score(scorer, cleaned_word, expected_tokens, prepared_page, position):
+    # score of an expected text against a line, the cheap shortcut of the scorer is tried before the scorer itself
+    cleaned_line = prepared_page.cleaned_lines[position]
+    if scorer.line_shortcut is not None:
+        score = scorer.line_shortcut(
+            expected_tokens,
+            prepared_page.line_tokens[position],
+            cleaned_word,
+            cleaned_line,
+        )
+        if score is not None:
+            return score
+    return SCORE_MEMO.score(scorer.line_scorer, cleaned_word, cleaned_line)
+
+
+def get_matched_line_ids_per_entity(
+    prepared_page,
+    prepared_entities,
+    fuzzymatch_line_thr,
+    engine=MATCHING_ENGINE,
+    prune_candidates=PRUNE_CANDIDATES,
+    line_positions_per_entity=None,
+    trace=None,
+):
+    # matched LINE Ids of every prepared entity
+    # line_positions_per_entity gives for every entity the line positions it is restricted to (None for all lines)
+    if line_positions_per_entity is None:
+        line_positions_per_entity = [None for _ in prepared_entities]
+    if engine == "matrix" and not prune_candidates:
+        # score the expected texts of all entities in one matrix and split its rows per entity,
+        # the entities with other scorers than token_set_ratio are matched one by one
+        cleaned_expected_texts = [
+            cleaned_word
+            for prepared_entity in prepared_entities
+            if prepared_entity.token_set_lines
+            for cleaned_word in prepared_entity.cleaned_expected_texts
+        ]
+        if trace is not None:
+            start = time.perf_counter()
+        scores = line_scores(cleaned_expected_texts, prepared_page.cleaned_lines)
+        if trace is not None:
+            trace.count("scorer_seconds", time.perf_counter() - start)
+        matched_line_ids = []
+        first_row = 0
+        for prepared_entity, line_positions in zip(
+            prepared_entities, line_positions_per_entity
+        ):
+            if not prepared_entity.token_set_lines:
+                matched_line_ids.append(
+                    get_matched_line_ids(
+                        prepared_page,
+                        prepared_entity,
+                        fuzzymatch_line_thr,
+                        engine=engine,
+                        prune_candidates=prune_candidates,
+                        line_positions=line_positions,
+                        trace=trace,
+                    )
                 )
-                entity["BlockReferences"] = [block_ref]
-                entity["Text"] = total_text
-                entity["Type"] = entity_type
-                entity["Score"] = 1
-                if entity not in found_entities:
-                    if entity["Text"] not in ignore_list:
-                        found_entities.append(entity)
-                """
-    return found_entities
+                continue
+            last_row = first_row + len(prepared_entity.cleaned_expected_texts)
+            if trace is not None:
+                for cleaned_word, text_scores in zip(
+                    prepared_entity.cleaned_expected_texts, scores[first_row:last_row]
+                ):
+                    record_line_scores(
+                        trace,
+                        prepared_page,
+                        prepared_entity,
+                        range(len(prepared_page.line_blocks)),
+                        text_scores,
+                        cleaned_word,
+                        prepared_entity.scorers[0].name,
+                    )
+            line_matches = (
+                scores[first_row:last_row]
+                > prepared_entity.line_threshold(fuzzymatch_line_thr)
+            ).any(axis=0)
+            if line_positions is not None:
+                allowed_matches = np.zeros(len(line_matches), dtype=bool)
+                allowed_matches[line_positions] = True
+                line_matches = line_matches & allowed_matches
+            matched_line_ids.append(
+                {
+                    block["Id"]
+                    for block, is_match in zip(prepared_page.line_blocks, line_matches)
+                    if is_match
+                }
+            )
+            first_row = last_row
+        return matched_line_ids
+    return [
+        get_matched_line_ids(
+            prepared_page,
+            prepared_entity,
+            fuzzymatch_line_thr,
+            engine=engine,
+            prune_candidates=prune_candidates,
+            line_positions=line_positions,
+            trace=trace,
+        )
+        for prepared_entity, line_positions in zip(
+            prepared_entities, line_positions_per_entity
+        )
+    ]
+
+
+def get_word_matches(
+    cleaned_words,
+    cleaned_single_items,
+    fuzzymatch_word_thr,
+    engine=MATCHING_ENGINE,
+    scorers=None,
+    trace=None,
+):
+    # for every word, whether at least one single item passes the word threshold with one of the scorers
+    # (see helpers.scorers), the scoring of a word stops at the first item and scorer accepting it
+    if scorers is None:
+        scorers = [get_scorer(DEFAULT_SCORER)]
+    if engine == "matrix" and all(
+        scorer.word_scorer is fuzz.ratio for scorer in scorers
+    ):
+        if trace is not None:
+            trace.count(
+                "word_pairs_scored", len(cleaned_words) * len(cleaned_single_items)
+            )
+        return list(
+            word_match_mask(cleaned_words, cleaned_single_items, fuzzymatch_word_thr)
+        )
+    word_matches = []
+    pairs_scored = 0
+    for cleaned_word in cleaned_words:
+        word_match = False
+        for scorer in scorers:
+            for cleaned_item in cleaned_single_items:
+                pairs_scored += 1
+                if (
+                    SCORE_MEMO.score(scorer.word_scorer, cleaned_word, cleaned_item)
+                    > fuzzymatch_word_thr
+                ):
+                    word_match = True
+                    break
+            if word_match:
+                break
+        word_matches.append(word_match)
+    if trace is not None:
+        trace.count("word_pairs_scored", pairs_scored)
+    return word_matches
+
+
+def get_word_score(cleaned_word, cleaned_single_items, scorers=None):
+    # best score of a word against the single items with the scorers of an entity, used by the trace
+    if scorers is None:
+        scorers = [get_scorer(DEFAULT_SCORER)]
+    return max(
+        [
+            SCORE_MEMO.score(scorer.word_scorer, cleaned_word, cleaned_item)
+            for scorer in scorers
+            for cleaned_item in cleaned_single_items
+        ],
+        default=0,
+    )
 
 
 def check_which_child_blocks_are_in_entity(
@@ -137,124 +826,159 @@ def check_which_child_blocks_are_in_entity(
     fuzzymatch_word_thr=FUZZYMATCH_WORD_THR,
     ignore_list=[],
     language="de",
+    prepared_page=None,
+    prepared_entity=None,
+    engine=MATCHING_ENGINE,
+    child_spans=None,
+    trace=None,
+    line_id=None,
 ):
-    total_text = ""
-    BeginOffset_line = 0
-    child_block_part_of_entity = []
-    looking_for_start_offset = True
-    for c_block in child_blocks:  # Check if the child block belongs to the entity
-        # first try the fuzzy matching of the words
+    # child_spans holds the character span of every child block in the text of the LINE (see
+    # PreparedPage.word_offsets), without it the child blocks are assumed to be separated by single spaces
+    if prepared_page is None:
+        prepared_page = PreparedPage(child_blocks, language=language)
+    scorers = None
+    if prepared_entity is None:
+        cleaned_single_items = [
+            clean_text(item, language=language) for item in single_items
+        ]
+    else:
+        cleaned_single_items = prepared_entity.cleaned_single_items
+        scorers = prepared_entity.scorers
+        fuzzymatch_word_thr = prepared_entity.word_threshold(fuzzymatch_word_thr)
+    if child_spans is None:
+        child_spans = cumulative_word_spans(child_blocks)
+    cleaned_words = [prepared_page.cleaned_text(c_block) for c_block in child_blocks]
+    # first try the fuzzy matching of the words
+    if trace is not None:
+        start = time.perf_counter()
+    word_matches = get_word_matches(
+        cleaned_words,
+        cleaned_single_items,
+        fuzzymatch_word_thr,
+        engine=engine,
+        scorers=scorers,
+        trace=trace,
+    )
+    if trace is not None:
+        trace.count("scorer_seconds", time.perf_counter() - start)
+    # Check if the child block belongs to the entity
+    in_entity = [
+        word_match and (c_block["Text"] not in ignore_list)
+        for c_block, word_match in zip(child_blocks, word_matches)
+    ]
+    substring_fallback = not any(in_entity)
+    # If you didn't find a matching child block through fuzzy matching check if the text is explicitly in the list of words
+    if substring_fallback:
+        in_entity = [
+            any(cleaned_item in cleaned_word for cleaned_item in cleaned_single_items)
+            and (c_block["Text"] not in ignore_list)
+            for c_block, cleaned_word in zip(child_blocks, cleaned_words)
+        ]
 
-        if any(
+    if trace is not None:
+        trace.record_words(
+            prepared_entity,
+            line_id,
             [
-                fuzz.ratio(
-                    clean_text(c_block["Text"], language=language),
-                    clean_text(item, language=language),
+                (
+                    c_block["Text"],
+                    get_word_score(cleaned_word, cleaned_single_items, scorers),
+                    is_in_entity,
                 )
-                > fuzzymatch_word_thr
-                for item in single_items
-            ]
-        ) and (c_block["Text"] not in ignore_list):
-            child_block_part_of_entity.append(
-                {
-                    "BeginOffset": 0,
-                    "EndOffset": len(c_block["Text"]),
-                    "ChildBlockId": c_block["Id"],
-                }
-            )
-            looking_for_start_offset = False
-            if total_text == "":
-                total_text = c_block["Text"]
-            else:
-                total_text = total_text + " " + c_block["Text"]
-        elif looking_for_start_offset:
-            BeginOffset_line += len(c_block["Text"])
-            BeginOffset_line += 1
-
-    if (
-        child_block_part_of_entity == []
-    ):  # If you didn't find a matching child block through fuzzy matching check if the text is explicitly in the list of words
-        BeginOffset_line = 0
-        for c_block in child_blocks:
-            if any(
-                clean_text(word, language=language)
-                in clean_text(c_block["Text"], language=language)
-                for word in single_items
-            ) and (c_block["Text"] not in ignore_list):
-                looking_for_start_offset = False
-                child_block_part_of_entity.append(
-                    {
-                        "BeginOffset": 0,
-                        "EndOffset": len(c_block["Text"]),
-                        "ChildBlockId": c_block["Id"],
-                    }
+                for c_block, cleaned_word, is_in_entity in zip(
+                    child_blocks, cleaned_words, in_entity
                 )
-                if total_text == "":
-                    total_text = c_block["Text"]
-                else:
-                    total_text = total_text + " " + c_block["Text"]
-            elif looking_for_start_offset:
-                BeginOffset_line += len(c_block["Text"])
-                BeginOffset_line += 1
+            ],
+            substring_fallback,
+        )
+
+    child_block_part_of_entity = [
+        {
+            "BeginOffset": 0,
+            "EndOffset": len(c_block["Text"]),
+            "ChildBlockId": c_block["Id"],
+        }
+        for c_block, is_in_entity in zip(child_blocks, in_entity)
+        if is_in_entity
+    ]
+    total_text = " ".join(
+        c_block["Text"]
+        for c_block, is_in_entity in zip(child_blocks, in_entity)
+        if is_in_entity
+    )
+    # the entity starts at its first child block, after the last child block if there is none
+    BeginOffset_line = child_spans[-1][1] + 1 if child_spans else 0
+    for span, is_in_entity in zip(child_spans, in_entity):
+        if is_in_entity:
+            BeginOffset_line = span[0]
+            break
     return child_block_part_of_entity, total_text, BeginOffset_line
 
 
 def consolidate_entities(all_found_entities, double_types=None, changefor=None):
     # this function consolidates the found entities such that entities that together make a new entity get that title
+    # entities are compared through their hashable keys (see entity_key), which keeps the consolidation linear
     # first remove all entities that are in ["", " ", "  "]
-    strange_entities = [
-        copy.copy(entity)
-        for entity in all_found_entities
-        if entity["Text"] in ["", " ", "  "]
+    all_found_entities[:] = [
+        entity for entity in all_found_entities if entity["Text"] not in ["", " ", "  "]
     ]
-    for entity in strange_entities:
-        all_found_entities.remove(entity)
-    all_found_entities_final = copy.deepcopy(all_found_entities)
+    all_found_entities_final = list(all_found_entities)
     # check if there are entities given for the consolidation
-    if (double_types is not None) and (changefor is not None):
-        if len(double_types) != len(changefor):
-            print(
-                "the number of pairs given to the consolidation does not match the new types"
+    if (double_types is None) or (changefor is None):
+        return all_found_entities_final
+    if len(double_types) != len(changefor):
+        print(
+            "the number of pairs given to the consolidation does not match the new types"
+        )
+        return all_found_entities
+
+    # keys of the entities without their type, the type is compared separately
+    untyped_keys = [entity_key(entity)[1:] for entity in all_found_entities]
+    # positions in all_found_entities_final of the entities still in the result, per (type, untyped key),
+    # in increasing order such that the first equal entity is dropped first
+    positions = {}
+    for position, (entity, key) in enumerate(zip(all_found_entities, untyped_keys)):
+        positions.setdefault((entity["Type"], key), deque()).append(position)
+    kept = [True] * len(all_found_entities_final)
+
+    def drop(entity_type, key):
+        remaining = positions.get((entity_type, key))
+        if not remaining:
+            raise ValueError("list.remove(x): x not in list")
+        kept[remaining.popleft()] = False
+
+    for pair, new_type in zip(double_types, changefor):
+        # Find all entities of the types that might be changed
+        keys_t1 = set()
+        keys_t2 = set()
+        for entity, key in zip(all_found_entities, untyped_keys):
+            if entity["Type"] == pair[0]:
+                keys_t1.add(key)
+            if entity["Type"] == pair[1]:
+                keys_t2.add(key)
+        # check which entities are in both lists
+        double_entities = []
+        for entity, key in zip(all_found_entities, untyped_keys):
+            if entity["Type"] == pair[0] and key in keys_t2:
+                double_entity = copy.copy(entity)
+                double_entity["Type"] = new_type
+                double_entities.append((double_entity, key))
+        # drop the objects (with old entity_type) from the full list
+        for entity, key in zip(all_found_entities, untyped_keys):
+            if entity["Type"] == pair[0] and key in keys_t2:
+                drop(pair[0], key)
+        for entity, key in zip(all_found_entities, untyped_keys):
+            if entity["Type"] == pair[1] and key in keys_t1:
+                drop(pair[1], key)
+        # add the objects with the new entity_type to the list
+        for double_entity, key in double_entities:
+            positions.setdefault((new_type, key), deque()).append(
+                len(all_found_entities_final)
             )
-            return all_found_entities
-
-        for ii in range(len(double_types)):
-            pair = double_types[ii]
-            new_type = changefor[ii]
-            # Find all entities of the type that might be changed
-            ents_t1 = [
-                copy.copy(entity)
-                for entity in all_found_entities
-                if entity["Type"] == pair[0]
-            ]
-            ents_t2 = [
-                copy.copy(entity)
-                for entity in all_found_entities
-                if entity["Type"] == pair[1]
-            ]
-            for jj, element in enumerate(ents_t1):
-                element["Type"] = new_type
-                ents_t1[jj] = element
-            for jj, element in enumerate(ents_t2):
-                element["Type"] = new_type
-                ents_t2[jj] = element
-            # check which  entities are in both lists
-            double_entities = [entity for entity in ents_t1 if entity in ents_t2]
-            # get list of entities to be dropped
-            ents_t1_drop = [
-                copy.copy(entity) for entity in ents_t1 if entity in double_entities
-            ]
-            ents_t2_drop = [
-                copy.copy(entity) for entity in ents_t2 if entity in double_entities
-            ]
-            # drop the objects (with old entity_type) from the full list
-            for entity in ents_t1_drop:
-                entity["Type"] = pair[0]
-                all_found_entities_final.remove(entity)
-            for entity in ents_t2_drop:
-                entity["Type"] = pair[1]
-                all_found_entities_final.remove(entity)
-            # add the objects with the new entity_type to the list
-            all_found_entities_final += double_entities
-
-    return all_found_entities_final
+            all_found_entities_final.append(double_entity)
+            kept.append(True)
+
+    return [
+        entity for entity, is_kept in zip(all_found_entities_final, kept) if is_kept
+    ]
@@ -6,14 +6,47 @@ import logging
 import os
 import sys
 from datetime import date
+from functools import partial
 
 import boto3
+from helpers.block_store import BLOCK_STORE_FOLDER
+from helpers.compact_blocks import compact_page
+from helpers.entity_dictionary import CompiledEntities
+from helpers.match_trace import MatchTrace
+from helpers.page_pool import imap_pages, worker_count
+from helpers.native_pdf import (
+    NATIVE_PDF,
+    SCANNED_PDF,
+    iter_pdf_pages,
+    pdf_file_reader,
+    pdf_page_bytes,
+    pdf_page_types,
+)
+from helpers.page_state import (
+    dump_page_state,
+    fetch_document_state,
+    page_state_file,
+    prepare_page_state,
+    store_page_states,
+)
+from helpers.prepared_page import PreparedPage
 from helpers.s3_helper import S3Helper
-from match_entities_to_block import consolidate_entities, find_text_Item_on_page
-from store_files import write_annotation_file, write_block_file
-from textractcaller.t_call import (
-    call_textract,  # python -m pip install amazon-textract-caller
+from helpers.s3_writer import S3Writer
+from helpers.textract_reader import (
+    DETECT_PAGE_API,
+    detect_page_text,
+    stream_document_pages,
 )
+from match_entities_to_block import (
+    EXACT_MATCH_FIRST,
+    MATCHING_ENGINE,
+    PRUNE_CANDIDATES,
+    SPATIAL_MATCHING,
+    WINDOW_LINES,
+    consolidate_entities,
+    find_entities_on_page,
+)
+from store_files import store_block_file, write_annotation_file
 
 LOGGER = logging.getLogger("PreLabeling")
 
@@ -28,6 +61,10 @@ FOLDER_DATA = "source-semi-structured-documents/"
 INDIVIDUAL_MANIFEST = "prelabeling/temp-individual-manifests"
 FUZZYMATCH_LINE_THR=90
 FUZZYMATCH_WORD_THR=60
+PARALLEL_PAGES=False # match the pages of a document in a process pool sized from the available CPUs
+TRACE=False # write next to every annotation file a _trace.jsonl explaining how its entities were found
+NATIVE_PDF_PAGES=True # read the blocks of the native pages from the text layer of the PDF, Textract is only called for the scanned pages
+INLINE_BLOCKS=False # also write the blocks in the annotation files, for annotation UIs that only read the Blocks of the file and not its BlocksS3Ref
 LOGGER.debug('Region: {}'.format(REGION))
 
 
@@ -39,6 +76,10 @@ each item is a dict with the following keys:
     entity_type::string the type of the entity if not defined, the item will be labeled with entity_type ="UNASSIGNED"
     
     ignore_list::array[string] list of words that should be ignored in the match
+    scorer::string or array[string] scorer(s) of helpers.scorers used for the entity, "token_set" if not defined
+    fuzzymatch_line_thr, fuzzymatch_word_thr::number thresholds of the entity, the thresholds of the call if not defined
+                                               a score must be above its threshold, the "exact" and "digits" scorers
+                                               only give 0 or 100 and never pass a threshold of 100
 '''
 
 
@@ -56,40 +97,105 @@ def generate_annotations_full_file(objects_to_find,
                                    double_types=None, # if given is array(Tuples(string)) e.g [["entity-1","entity-2"],["entity-1","entity-4"]]
                                    # what we exchange the the types for
                                    changefor=None, # if given is array[string]  e.g. ["combo-of-entities-1-2","combo-of-entities-1-4"]
+                                   matching_engine=MATCHING_ENGINE, # "pairwise" or "matrix" (batched scoring of all pairs of a page)
+                                   prune_candidates=PRUNE_CANDIDATES, # skip the lines that can not pass fuzzymatch_line_thr
+                                   exact_match_first=EXACT_MATCH_FIRST, # only fuzzy match the objects without a verbatim occurrence
+                                   spatial_matching=SPATIAL_MATCHING, # look for the objects with an anchor_label only near their anchor
+                                   window_lines=WINDOW_LINES, # maximum number of consecutive lines an entity can wrap over
+                                   parallel_pages=PARALLEL_PAGES, # match the pages in worker processes, the files are still written in page order
+                                   max_workers=None, # number of worker processes of the parallel mode, defaults to the number of available CPUs
+                                   compiled_entities=None, # CompiledEntities of objects_to_find (see helpers.entity_dictionary.load_compiled_entities)
+                                   state_Folder=None, # folder of ann_Bucket where the prepared pages are stored for a later rematch, None to not store them
+                                   rematch=False, # reload the prepared pages from state_Folder instead of calling Textract, only the matching and the files are redone
+                                   trace=TRACE, # write the match trace of every page (see helpers.match_trace) next to its annotation file
+                                   textract_cache=None, # TextractCache of the blocks of the documents already processed, None to always call Textract
+                                   s3_writer=None, # S3Writer the files are submitted to and flushed by the caller, None to write them concurrently and wait for them here
+                                   blocks_Folder=BLOCK_STORE_FOLDER, # folder of ann_Bucket where the block files are stored under the hash of their content
+                                   inline_blocks=INLINE_BLOCKS, # also write the blocks in the annotation files, they are otherwise only referenced by BlocksS3Ref
+                                   native_pdf_pages=NATIVE_PDF_PAGES, # read the blocks of the native pages from the text layer of the PDF, Textract is only called for the scanned pages
                                    ):
     # load the document
-        
+
     LOGGER.info(f'Generating annotations')
-    textract = boto3.client('textract',region_name=region)
-    response=call_textract(input_document="s3://{}/{}".format(Data_Bucket,document_key), force_async_api=True, boto3_textract_client=textract)
-    blocks = response["Blocks"]
-    pages = [block for block in blocks if block["BlockType"] == "PAGE"]
-    number_pages=len(pages)
     if ann_Bucket == None:
                 ann_Bucket = Data_Bucket
+    s3_helper=S3Helper(region=region)
+    # the files of a page are written while the next pages are matched
+    own_s3_writer = s3_writer is None
+    if own_s3_writer:
+        s3_writer = S3Writer(s3_helper)
+    # the same number of workers decides between the process pool and the prefetching of the Textract results
+    workers = worker_count(max_workers) if parallel_pages else 1
+    state_s3_uri = None
+    if state_Folder is not None:
+        state_s3_uri = s3_helper.s3_uri_from_bucket_folder_file(ann_Bucket, state_Folder, page_state_file(document_key))
+    if rematch:
+        if state_s3_uri is None:
+            raise ValueError("rematch needs the state_Folder of a previous run")
+        LOGGER.info(f'Reloading the prepared pages from {state_s3_uri}')
+        pages, document_types = fetch_document_state(state_s3_uri, s3_helper)
+        number_pages = len(pages)
+    else:
+        # the pages are handed over one at a time, the blocks of the whole document are never held together
+        number_pages, pages, document_types = detect_document_pages(s3_helper.s3_uri_from_bucket_key(Data_Bucket,document_key), region=region,
+                                                    s3_helper=s3_helper, textract_cache=textract_cache,
+                                                    # no fetching thread may run while the process pool forks its workers
+                                                    prefetch_results=workers <= 1,
+                                                    native_pdf_pages=native_pdf_pages)
+        # only the LINE and WORD blocks are kept, in compact form, the Textract dicts are rebuilt when the files are written
+        pages = map(compact_page, pages)
+    # DocumentType of every page in the annotation files, the pages are scanned if the text layer was not read
+    if document_types is None:
+        document_types = [SCANNED_PDF] * number_pages
+    # the prepared pages of a new document are stored for a later rematch, one compressed page at a time
+    prepare_state = state_s3_uri is not None and not rematch
+    page_states = []
+    # the expected texts are cleaned and indexed once for all pages
+    if compiled_entities is None:
+        compiled_entities = CompiledEntities(objects_to_find)
     all_found_entities=[]
     all_annotation_files=[]
     all_doc_meta_data=[]
-    for page_num in range(1,number_pages+1):
+    match_options = dict(objects_to_find=objects_to_find,
+                         fuzzymatch_line_thr=fuzzymatch_line_thr,
+                         fuzzymatch_word_thr=fuzzymatch_word_thr,
+                         do_entity_consolidation=do_entity_consolidation,
+                         double_types=double_types,
+                         changefor=changefor,
+                         matching_engine=matching_engine,
+                         prune_candidates=prune_candidates,
+                         exact_match_first=exact_match_first,
+                         spatial_matching=spatial_matching,
+                         window_lines=window_lines,
+                         compiled_entities=compiled_entities,
+                         prepare_state=prepare_state,
+                         trace=trace)
+    # only the matching runs in the workers (in this process with a single worker), the results come back in page order
+    matched_pages = imap_pages(partial(match_page, **match_options), pages, max_workers=workers)
+    for page_num, (page, (page_all_found_entities, page_trace, page_state)) in enumerate(matched_pages, start=1):
         document_meta_data={"Pages": str(number_pages), "PageNumber": str(page_num)}
-        page_blocks=[block for block in blocks if block["Page"] == page_num]
-        # Start the analysis
-        page_all_found_entities, page_annotation_file = generate_annotations_single_page(page_blocks,
-                                        objects_to_find,
-                                        document_key,
-                                        ann_Bucket,
-                                        document_meta_data=document_meta_data,
-                                        save_blocks=save_blocks,
-                                        do_entity_consolidation=do_entity_consolidation,
-                                        double_types=double_types,
-                                        changefor=changefor,
-                                        fuzzymatch_line_thr=fuzzymatch_line_thr,
-                                        fuzzymatch_word_thr=fuzzymatch_word_thr,
-                                        ann_Folder=ann_Folder,
-                                        region = region)
+        page_blocks = page.blocks if rematch else page
+        if page_state is not None:
+            page_states.append(page_state)
+        page_annotation_file = "didn't save the annotations"
+        if save_blocks:
+            page_annotation_file = store_page_annotations(page_blocks, page_all_found_entities, document_key, ann_Bucket,
+                                                          document_meta_data=document_meta_data,
+                                                          document_type=document_types[page_num-1],
+                                                          region=region,
+                                                          ann_Folder=ann_Folder,
+                                                          trace=page_trace,
+                                                          s3_helper=s3_writer,
+                                                          blocks_Folder=blocks_Folder,
+                                                          inline_blocks=inline_blocks)
         all_found_entities.append(page_all_found_entities)
         all_annotation_files.append(page_annotation_file)
         all_doc_meta_data.append(document_meta_data)
+
+    if prepare_state:
+        store_page_states(page_states, state_s3_uri, s3_writer, document_types=document_types)
+    if own_s3_writer:
+        s3_writer.close()
   
     LOGGER.info(f'Successfully generated annotations')
     return all_found_entities, all_annotation_files,all_doc_meta_data
@@ -98,6 +204,63 @@ def generate_annotations_full_file(objects_to_find,
 
 
 
+def detect_document_pages(document_s3_uri,
+                          region=REGION,
+                          s3_helper=None, # S3Helper used to read the document for its cache key and its text layer
+                          textract_cache=None, # TextractCache, None to always call Textract
+                          prefetch_results=True, # request the next Textract result page while a page is processed
+                          native_pdf_pages=NATIVE_PDF_PAGES, # read the blocks of the native pages from the text layer of the PDF
+                          ):
+    # returns the number of pages of a document, a generator of the blocks of every page and the DocumentType of every page (None if the PDF was not read)
+    # Textract is only called for the scanned pages and only if they are not cached
+    def detect_pages():
+        textract = boto3.client('textract',region_name=region)
+        return stream_document_pages(document_s3_uri, textract, prefetch_results=prefetch_results)
+
+    if textract_cache is None and not native_pdf_pages:
+        number_pages, pages = detect_pages()
+        return number_pages, pages, None
+    if s3_helper is None:
+        s3_helper=S3Helper(region=region)
+    # the cache is keyed by the content of the document, a copy of a document under another key is a hit
+    document = s3_helper.get_object_response_from_s3(document_s3_uri)['Body'].read()
+    document_types = None
+    if native_pdf_pages:
+        try:
+            document_types = pdf_page_types(document)
+        except Exception as e:
+            LOGGER.warning(f'Could not read the text layer of {document_s3_uri}, detecting its text with Textract: {e}')
+    if document_types is not None and NATIVE_PDF in document_types:
+        LOGGER.info(f'{document_types.count(SCANNED_PDF)} of the {len(document_types)} pages are scanned')
+        # the document is parsed and the client is created once for all its scanned pages
+        pdf_reader = None
+        textract = None
+        if SCANNED_PDF in document_types:
+            pdf_reader = pdf_file_reader(document)
+            textract = boto3.client('textract',region_name=region)
+
+        def detect_scanned_page(page_number):
+            # the text of a scanned page is detected on the PDF of the page alone
+            page = pdf_page_bytes(pdf_reader, page_number)
+
+            def detect_page():
+                return 1, [detect_page_text(page, textract)]
+
+            if textract_cache is None:
+                _, page_blocks = detect_page()
+            else:
+                _, page_blocks = textract_cache.fetch_pages(page, detect_page, api=DETECT_PAGE_API)
+            return list(page_blocks)[0]
+
+        return len(document_types), iter_pdf_pages(document, document_types, detect_scanned_page), document_types
+    # the text of a document without native pages is detected in a single job
+    if textract_cache is None:
+        number_pages, pages = detect_pages()
+    else:
+        number_pages, pages = textract_cache.fetch_pages(document, detect_pages)
+    return number_pages, pages, document_types
+
+
 def generate_annotations_single_page(blocks,
                                     objects_to_find,
                                     document_key,
@@ -114,6 +277,18 @@ def generate_annotations_single_page(blocks,
                                    double_types=None, # if given is array(Tuples(string)) e.g [["entity-1","entity-2"],["entity-1","entity-4"]]
                                    # what we exchange the the types for
                                    changefor=None, # if given is array[string]  e.g. ["combo-of-entities-1-2","combo-of-entities-1-4"]
+                                   matching_engine=MATCHING_ENGINE, # "pairwise" or "matrix" (batched scoring of all pairs of a page)
+                                   prune_candidates=PRUNE_CANDIDATES, # skip the lines that can not pass fuzzymatch_line_thr
+                                   exact_match_first=EXACT_MATCH_FIRST, # only fuzzy match the objects without a verbatim occurrence
+                                   spatial_matching=SPATIAL_MATCHING, # look for the objects with an anchor_label only near their anchor
+                                   window_lines=WINDOW_LINES, # maximum number of consecutive lines an entity can wrap over
+                                   compiled_entities=None, # CompiledEntities of objects_to_find, compiled here if not given
+                                   prepared_page=None, # PreparedPage of the blocks, built here if not given
+                                   trace=None, # MatchTrace filled while matching and written next to the annotation file, None to not trace
+                                   s3_helper=None, # S3Helper (or S3Writer) the files are written with, created here if not given
+                                   blocks_Folder=BLOCK_STORE_FOLDER, # folder of ann_Bucket where the block file is stored under the hash of its content
+                                   inline_blocks=INLINE_BLOCKS, # also write the blocks in the annotation file, they are otherwise only referenced by BlocksS3Ref
+                                   document_type=SCANNED_PDF, # DocumentType of the annotation file, NativePDF if the blocks were read from the text layer of the PDF
                                    ):
 
   
@@ -127,52 +302,133 @@ def generate_annotations_single_page(blocks,
         return -1
 
     # Start the analysis
-    all_found_entities = []
-    for object in objects_to_find:
-        expected_texts = object["expected_texts"]
-        if "entity_type" in object:
-            entity_type = object["entity_type"]
-        else:
-            entity_type = "UNASSIGNED"
-        if "ignore_list" in object:
-            ignore_list = object["ignore_list"]
-        else:
-            ignore_list = []
-
-        objects_found_local = find_text_Item_on_page(
-            blocks, expected_texts, entity_type, ignore_list=ignore_list, fuzzymatch_line_thr=fuzzymatch_line_thr, fuzzymatch_word_thr=fuzzymatch_word_thr)
-        # Only add new items to the list of found entities
-        for entity_local in objects_found_local:
-            if entity_local not in all_found_entities:
-                all_found_entities += [entity_local]
+    # the texts of the page and of the expected entities are cleaned only once
+    if prepared_page is None:
+        prepared_page = PreparedPage(blocks)
+    all_found_entities = match_page_entities(blocks, objects_to_find,
+                                             fuzzymatch_line_thr=fuzzymatch_line_thr,
+                                             fuzzymatch_word_thr=fuzzymatch_word_thr,
+                                             do_entity_consolidation=do_entity_consolidation,
+                                             double_types=double_types,
+                                             changefor=changefor,
+                                             matching_engine=matching_engine,
+                                             prune_candidates=prune_candidates,
+                                             exact_match_first=exact_match_first,
+                                             spatial_matching=spatial_matching,
+                                             window_lines=window_lines,
+                                             prepared_page=prepared_page,
+                                             compiled_entities=compiled_entities,
+                                             trace=trace)
+
+    annotation_file = "didn't save the annotations"
+    
+    if save_blocks:
+        annotation_file = store_page_annotations(blocks, all_found_entities, document_key, ann_Bucket,
+                                                 document_meta_data=document_meta_data,
+                                                 region=region,
+                                                 ann_Folder=ann_Folder,
+                                                 block_graph=prepared_page.block_graph,
+                                                 trace=trace,
+                                                 s3_helper=s3_helper,
+                                                 blocks_Folder=blocks_Folder,
+                                                 inline_blocks=inline_blocks,
+                                                 document_type=document_type)
+
+
+    return all_found_entities, annotation_file
+
+
+def match_page_entities(blocks,
+                        objects_to_find,
+                        fuzzymatch_line_thr=FUZZYMATCH_LINE_THR,
+                        fuzzymatch_word_thr=FUZZYMATCH_WORD_THR,
+                        do_entity_consolidation=True,
+                        double_types=None,
+                        changefor=None,
+                        matching_engine=MATCHING_ENGINE,
+                        prune_candidates=PRUNE_CANDIDATES,
+                        exact_match_first=EXACT_MATCH_FIRST,
+                        spatial_matching=SPATIAL_MATCHING,
+                        window_lines=WINDOW_LINES,
+                        prepared_page=None, # PreparedPage of the blocks, built here if not given
+                        compiled_entities=None, # CompiledEntities of objects_to_find, compiled here if not given
+                        trace=None, # MatchTrace explaining the entities found before their consolidation, None to not trace
+                        ):
+    # finds (and consolidates) the entities of a single page without any I/O, so that it can run in a worker process
+    if prepared_page is None:
+        prepared_page = PreparedPage(blocks)
+    if compiled_entities is None:
+        compiled_entities = CompiledEntities(objects_to_find)
+    # all objects are matched in a single scan of the page, entities already found for a previous object are dropped
+    all_found_entities = find_entities_on_page(
+        blocks, compiled_entities.prepared_entities, fuzzymatch_line_thr=fuzzymatch_line_thr, fuzzymatch_word_thr=fuzzymatch_word_thr,
+        prepared_page=prepared_page, engine=matching_engine, prune_candidates=prune_candidates,
+        exact_match_first=exact_match_first, exact_matcher=compiled_entities.exact_matcher,
+        spatial_matching=spatial_matching, window_lines=window_lines, trace=trace)
 
     if do_entity_consolidation:
         all_found_entities = consolidate_entities(
             all_found_entities, double_types=double_types, changefor=changefor)
+    return all_found_entities
 
-    annotation_file = "didn't save the annotations"
-    
-    if save_blocks:
 
+def match_page(page,
+               objects_to_find,
+               prepare_state=False, # also return the dumped state of the page (see helpers.page_state) for a later rematch
+               trace=False, # also return the MatchTrace of the page
+               **kwargs):
+    # matches a page given by its blocks or its PreparedPage and returns (entities, trace, state), used as the function of imap_pages
+    if isinstance(page, PreparedPage):
+        prepared_page = page
+    elif prepare_state:
+        prepared_page = prepare_page_state(page)
+    else:
+        prepared_page = PreparedPage(page)
+    page_trace = MatchTrace() if trace else None
+    all_found_entities = match_page_entities(prepared_page.blocks, objects_to_find, prepared_page=prepared_page,
+                                             trace=page_trace, **kwargs)
+    page_state = dump_page_state(prepared_page) if prepare_state else None
+    return all_found_entities, page_trace, page_state
+
+
+def store_page_annotations(blocks,
+                           all_found_entities,
+                           document_key,
+                           ann_Bucket,
+                           document_meta_data={
+                               "Pages": 1, "PageNumber": 1},
+                           region=REGION,
+                           ann_Folder=FOLDER_ANNOTATIONS,
+                           block_graph=None, # BlockGraph of the blocks, built when formatting the annotation file if not given
+                           trace=None, # MatchTrace of the page, written as a _trace.jsonl next to the annotation file if given
+                           s3_helper=None, # S3Helper (or S3Writer) the files are written with, created here if not given
+                           blocks_Folder=BLOCK_STORE_FOLDER, # folder of ann_Bucket where the block file is stored under the hash of its content
+                           inline_blocks=INLINE_BLOCKS, # also write the blocks in the annotation file, they are otherwise only referenced by BlocksS3Ref
+                           document_type=SCANNED_PDF, # DocumentType of the annotation file, NativePDF if the blocks were read from the text layer of the PDF
+                           ):
+    # writes the block file and the annotation file of a page to S3 and returns the uri of the annotation file
+    if s3_helper is None:
         s3_helper=S3Helper(region=region)
-        page_number=document_meta_data["PageNumber"]
-        #ann_file = document_key.split("/")[-1][:-4]+"-{}-{}".format(page_number,get_random_string(8)) + "-ann.json"
-        ann_file = document_key.split("/")[-1][:-4]+"_page_{}".format(page_number) + "_ann.json"
-
-       # Store the blocks and save to S3
-        LOGGER.debug(f'Saving Textract blocks to s3')
-        block_file_key = ann_Folder+"bocks/" + \
-            ann_file[:-9]+ "_blocks.json"
-        block_file_s3_uri=s3_helper.s3_uri_from_bucket_key(ann_Bucket,block_file_key)
-        write_block_file(blocks,block_file_s3_uri,s3_helper=s3_helper)
-
-        # save the annotations to S3
-        LOGGER.debug(f'Saving annotations to s3')
-        annotation_file=write_annotation_file(blocks, all_found_entities, block_file_s3_uri, ann_file,
-                          doc_metadata=document_meta_data,
-                          Bucket=ann_Bucket,
-                          folder=ann_Folder,
-                          s3_helper = s3_helper)
+    page_number=document_meta_data["PageNumber"]
+    #ann_file = document_key.split("/")[-1][:-4]+"-{}-{}".format(page_number,get_random_string(8)) + "-ann.json"
+    ann_file = document_key.split("/")[-1][:-4]+"_page_{}".format(page_number) + "_ann.json"
 
+   # Store the blocks and save to S3, named by their content: the same page processed again gets the same block file
+    LOGGER.debug(f'Saving Textract blocks to s3')
+    block_file_s3_uri=store_block_file(blocks,Bucket=ann_Bucket,folder=blocks_Folder,s3_helper=s3_helper)
 
-    return all_found_entities, annotation_file
+    if trace is not None:
+        LOGGER.debug(f'Saving the match trace to s3')
+        trace_s3_uri=s3_helper.s3_uri_from_bucket_key(ann_Bucket,ann_Folder+ann_file[:-9]+"_trace.jsonl")
+        s3_helper.write_content(trace_s3_uri,trace.to_jsonl(document_meta_data))
+
+    # save the annotations to S3
+    LOGGER.debug(f'Saving annotations to s3')
+    return write_annotation_file(blocks, all_found_entities, block_file_s3_uri, ann_file,
+                      doc_metadata=document_meta_data,
+                      Bucket=ann_Bucket,
+                      folder=ann_Folder,
+                      s3_helper = s3_helper,
+                      block_graph=block_graph,
+                      inline_blocks=inline_blocks,
+                      document_type=document_type)
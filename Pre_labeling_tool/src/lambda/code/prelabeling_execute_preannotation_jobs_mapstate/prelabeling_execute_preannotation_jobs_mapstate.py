@@ -15,8 +15,13 @@ HANDLER.setFormatter(logging.Formatter("%(levelname)s | %(name)s | %(message)s")
 LOGGER.addHandler(HANDLER)
 
 LOGGER.info(f'Import Python custom modules')
+from helpers.entity_dictionary import load_compiled_entities
+from helpers.page_state import check_execution_id
 from helpers.prepare_ui_items import merge_dictionary_expected_entities
 from helpers.s3_helper import S3Helper
+from helpers.s3_writer import S3Writer
+from helpers.score_memo import SCORE_MEMO
+from helpers.textract_cache import S3CacheBackend, TextractCache
 from pre_label_tool_kit import generate_annotations_full_file
 from store_files import generate_individual_manifest, save_individual_manifest
 
@@ -32,11 +37,24 @@ OUTPUT_BUCKET = 'comprehend-semi-structured-docs-{}-{}'.format(REGION, AWS_ID) #
 PRELABELING_FOLDER = 'prelabeling'
 ANNOTATIONS_SUBFOLDER = 'textract-annotations'
 INDIVIDUAL_MANIFEST_SUBFOLDER = 'temp_individual_manifests'
+PAGE_STATE_SUBFOLDER = 'page-state' # prepared pages of every document, reused by a rematch
+TEXTRACT_CACHE_FOLDER = 'prelabeling/textract-cache/' # Textract blocks of the documents already processed, shared by all executions
+TEXTRACT_CACHE_TTL_DAYS = 30 # cached blocks older than this are dropped and the document is sent to Textract again
 
 FUZZYMATCH_LINE_THR=90
 FUZZYMATCH_WORD_THR=60
+MATCHING_ENGINE='pairwise' # 'pairwise' or 'matrix'
+EXACT_MATCH_FIRST=False # only fuzzy match the expected entities that do not appear verbatim on the page
+SPATIAL_MATCHING=False # objects with an anchor_label are only looked for near their anchor, the others are not affected
+WINDOW_LINES=1 # up to 3 to match entities (e.g. addresses) wrapped over consecutive lines, single column pages only: the windows follow the (Top, Left) reading order
+PARALLEL_PAGES=False # match the pages in a process pool sized from the CPUs, Lambda has no /dev/shm for it and prefetches the Textract results instead
+TRACE=False # write a _trace.jsonl explaining the found entities next to every annotation file
+INLINE_BLOCKS=False # also write the blocks in every annotation file, for an annotation UI deployed before the UI read them from BlocksS3Ref
+NATIVE_PDF_PAGES=True # read the native pages of the PDFs from their text layer, Textract only detects the text of the scanned pages
+SAVE_PAGE_STATE=False # store the prepared pages of every document under page-state/ so that a later execution can rematch them
 
 s3=S3Helper(region=REGION)
+textract_cache=TextractCache(S3CacheBackend(s3, OUTPUT_BUCKET, TEXTRACT_CACHE_FOLDER), ttl_seconds=TEXTRACT_CACHE_TTL_DAYS*24*3600)
 
 def lambda_handler(event, context):
     LOGGER.info(f'Starting Run_FuzzyPrelabelingJobs handler execution')
@@ -54,13 +72,27 @@ def lambda_handler(event, context):
     
     LOGGER.info('Filename: {}'.format(document_s3uri.split('/')[-1]))
 
-    objects_to_find = json.loads(s3.get_object_content_from_s3(expected_entities_s3uri))
+    expected_entities_content = s3.get_object_content_from_s3(expected_entities_s3uri)
+    objects_to_find = json.loads(expected_entities_content)
+    # documents sharing the same expected entities file reuse its compiled form (kept in memory and in /tmp)
+    compiled_entities = load_compiled_entities(expected_entities_content)
 
     # Extract s3 bucket and key for the document
     document_bucket, document_key = s3.bucket_key_from_s3_uri(document_s3uri)
 
     ann_folder = '{}/{}/{}/'.format(PRELABELING_FOLDER,prelabeling_id,ANNOTATIONS_SUBFOLDER)
 
+    # a premanifest item can name a previous execution whose prepared pages are re-matched instead of calling Textract again
+    rematch_execution_id = event['premanifest_keys'].get('rematch_execution_id')
+    state_folder = None
+    if rematch_execution_id is not None:
+        state_folder = '{}/{}/{}/'.format(PRELABELING_FOLDER,check_execution_id(rematch_execution_id),PAGE_STATE_SUBFOLDER)
+    elif SAVE_PAGE_STATE:
+        state_folder = '{}/{}/{}/'.format(PRELABELING_FOLDER,prelabeling_id,PAGE_STATE_SUBFOLDER)
+
+    # the files of all pages are written concurrently, they are flushed before the handler returns
+    s3_writer = S3Writer(s3)
+
     #get all the annotations for the file
     _,all_annotation_files,all_doc_meta_data = generate_annotations_full_file(
                 objects_to_find, document_key,
@@ -72,7 +104,20 @@ def lambda_handler(event, context):
                 ann_Folder=ann_folder,
                 do_entity_consolidation=True,
                 double_types=None,
-                changefor=None)
+                changefor=None,
+                matching_engine=MATCHING_ENGINE,
+                exact_match_first=EXACT_MATCH_FIRST,
+                spatial_matching=SPATIAL_MATCHING,
+                window_lines=WINDOW_LINES,
+                parallel_pages=PARALLEL_PAGES,
+                compiled_entities=compiled_entities,
+                state_Folder=state_folder,
+                rematch=rematch_execution_id is not None,
+                trace=TRACE,
+                textract_cache=textract_cache,
+                s3_writer=s3_writer,
+                inline_blocks=INLINE_BLOCKS,
+                native_pdf_pages=NATIVE_PDF_PAGES)
 
     # Create a dictionary with the expected entities to display on the UI
     expected_entities_annotator_metadata = merge_dictionary_expected_entities(objects_to_find)
@@ -83,10 +128,18 @@ def lambda_handler(event, context):
         labeling_manifest_item = generate_individual_manifest(index_page, all_annotation_files, all_doc_meta_data, expected_entities_annotator_metadata, document_s3uri)
         # save individual manifest file to s3
         individual_manifest_key_path = '{}/{}/{}'.format(PRELABELING_FOLDER,prelabeling_id,INDIVIDUAL_MANIFEST_SUBFOLDER)
-        manifest_filename = save_individual_manifest(labeling_manifest_item, output_bucket, individual_manifest_key_path, document_key, index_page, s3)
+        manifest_filename = save_individual_manifest(labeling_manifest_item, output_bucket, individual_manifest_key_path, document_key, index_page, s3_writer)
         
         LOGGER.info('Successfully processed {}'.format(manifest_filename))
+
+    # raises if a file could not be written, naming every file that failed
+    s3_writer.close()
+    LOGGER.info('Written {} files to s3'.format(s3_writer.written))
         
+    # the memo and the cache are kept by warm containers, their counters cover all invocations of the container
+    LOGGER.info('Fuzzy score memo: {}'.format(SCORE_MEMO.stats()))
+    LOGGER.info('Textract cache: {}'.format(dict(textract_cache.metrics)))
+
     return {
         'statusCode': 200,
         'body': json.dumps('Pre-Annotation job done.')
@@ -1,12 +1,14 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: MIT-0
 
+import json
 import logging
 import os
 from datetime import date
 
 import boto3
 from file_formatting import get_blocks_for_annotation_file, get_blocks_for_block_file
+from helpers.block_store import BLOCK_STORE_FOLDER, store_block_content
 from helpers.s3_helper import S3Helper
 from helpers.text_processing import get_random_string
 
@@ -31,14 +33,23 @@ def write_annotation_file(
     Bucket=ANNOTATION_BUCKET,
     folder=FOLDER_ANNOTATIONS,
     s3_helper=S3Helper(region=REGION),
+    block_graph=None,
+    # also write the blocks in the file, for annotation UIs that do not read them from BlocksS3Ref
+    inline_blocks=True,
+    # NativePDF if the blocks were read from the text layer of the PDF
+    document_type="ScannedPDF",
 ):
     final_dict = {
-        "Blocks": get_blocks_for_annotation_file(blocks),
+        "Blocks": (
+            get_blocks_for_annotation_file(blocks, block_graph=block_graph)
+            if inline_blocks
+            else []
+        ),
         "BlocksS3Ref": blocks_s3Ref,
     }
     final_dict["DocumentMetadata"] = doc_metadata
     final_dict["Version"] = str(date.today())
-    final_dict["DocumentType"] = "ScannedPDF"
+    final_dict["DocumentType"] = document_type
     final_dict["Entities"] = all_found_entities
 
     final_dict["File"] = file_name
@@ -53,6 +64,18 @@ def write_block_file(blocks, file_s3_ui, s3_helper=S3Helper(region=REGION)):
     s3_helper.write_json_dict(file_s3_ui, get_blocks_for_block_file(blocks))
 
 
+def store_block_file(
+    blocks,
+    Bucket=ANNOTATION_BUCKET,
+    folder=BLOCK_STORE_FOLDER,
+    s3_helper=S3Helper(region=REGION),
+):
+    """Writes the block file of a page to the block store and returns its uri, named by the hash of its content"""
+    return store_block_content(
+        json.dumps(get_blocks_for_block_file(blocks)), s3_helper, Bucket, folder
+    )
+
+
 def generate_individual_manifest(
     index_page,
     all_annotation_files,
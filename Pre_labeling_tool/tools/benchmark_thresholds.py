@@ -0,0 +1,424 @@
+#!/usr/bin/env python
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""
+Offline benchmark of the fuzzy matching thresholds against human-consolidated annotations.
+
+The matcher is run over the pages of annotation files (e.g. the files of the consolidation-response folder of a
+Ground Truth labeling job, downloaded locally) for every pair of line and word thresholds. Every sweep point reports
+the precision, recall and F1 of every entity type, the pages per second and the time spent in every stage.
+
+The matching options default to the constants of the handler of the Map state, so that the default sweep measures
+the deployed configuration. The script runs outside of the lambda, it is not packaged with the function.
+
+Example:
+    python tools/benchmark_thresholds.py consolidation-response/ --line-thresholds 80,85,90,95 --word-thresholds 50,60,70
+"""
+
+import argparse
+import ast
+import glob
+import json
+import os
+import sys
+import time
+from collections import Counter, namedtuple
+from functools import partial
+from itertools import product
+
+# code of the fuzzy matching lambda, the matcher benchmarked here
+LAMBDA_CODE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..",
+    "src",
+    "lambda",
+    "code",
+    "prelabeling_execute_preannotation_jobs_mapstate",
+)
+HANDLER_FILE = os.path.join(
+    LAMBDA_CODE_DIR, "prelabeling_execute_preannotation_jobs_mapstate.py"
+)
+sys.path.insert(0, LAMBDA_CODE_DIR)
+
+from helpers.page_pool import map_pages
+from helpers.prepared_page import PreparedPage, prepare_entities
+from helpers.score_memo import SCORE_MEMO
+from match_entities_to_block import (
+    EXACT_MATCH_FIRST,
+    MATCHING_ENGINE,
+    PRUNE_CANDIDATES,
+    SPATIAL_MATCHING,
+    WINDOW_LINES,
+    consolidate_entities,
+    find_entities_on_page,
+)
+
+
+def handler_settings(handler_file=HANDLER_FILE):
+    """
+    Return the constants of the handler of the Map state whose value is a literal.
+
+    The handler is parsed rather than imported, importing it calls AWS.
+
+    :param handler_file: path of the handler
+    :return: dict of the constant names and values, e.g. {"WINDOW_LINES": 3, ...}
+    """
+    with open(handler_file, "r") as f:
+        tree = ast.parse(f.read())
+    settings = {}
+    for node in tree.body:
+        if (
+            isinstance(node, ast.Assign)
+            and len(node.targets) == 1
+            and isinstance(node.targets[0], ast.Name)
+        ):
+            try:
+                settings[node.targets[0].id] = ast.literal_eval(node.value)
+            except ValueError:
+                pass
+    return settings
+
+
+DEPLOYED_SETTINGS = handler_settings()
+LINE_THRESHOLDS = [80, 85, 90, 95]
+WORD_THRESHOLDS = [50, 60, 70]
+STAGES = ["prepare", "match", "consolidate"]
+
+# blocks, consolidated entities and objects to find of one annotated page
+BenchmarkPage = namedtuple(
+    "BenchmarkPage", ["name", "blocks", "entities", "objects_to_find"]
+)
+
+
+def expected_entities_from_annotations(entities):
+    """
+    Build the objects to find of a page from its consolidated entities, one object per entity type.
+
+    :param entities: Entities of an annotation file
+    :return: objects_to_find holding the texts of the entities of every type
+    """
+    texts_per_type = {}
+    for entity in entities:
+        texts = texts_per_type.setdefault(entity["Type"], [])
+        if entity["Text"] not in texts:
+            texts.append(entity["Text"])
+    return [
+        {"expected_texts": texts, "entity_type": entity_type, "ignore_list": []}
+        for entity_type, texts in texts_per_type.items()
+    ]
+
+
+def load_benchmark_pages(annotations_dir, blocks_dir=None, objects_to_find=None):
+    """
+    Read the annotated pages of a directory (searched recursively for *.json files).
+
+    The blocks of a page are the Blocks of its annotation file, or the block file named like its BlocksS3Ref in
+    blocks_dir when the annotation file has no blocks.
+
+    :param annotations_dir: directory of the consolidated annotation files
+    :param blocks_dir: directory of the Textract block files, only needed for annotation files without blocks
+    :param objects_to_find: content of an expected entities file used for all pages, None to look for the
+                            consolidated entities of every page
+    :return: list of BenchmarkPage sorted by file name
+    """
+    pages = []
+    paths = glob.glob(os.path.join(annotations_dir, "**", "*.json"), recursive=True)
+    for path in sorted(paths):
+        with open(path, "r") as f:
+            annotation = json.load(f)
+        if not isinstance(annotation, dict) or "Entities" not in annotation:
+            continue
+        blocks = annotation.get("Blocks")
+        if not blocks:
+            if blocks_dir is None or not annotation.get("BlocksS3Ref"):
+                raise ValueError("{} has no blocks, give the blocks_dir".format(path))
+            with open(
+                os.path.join(blocks_dir, annotation["BlocksS3Ref"].split("/")[-1]), "r"
+            ) as f:
+                blocks = json.load(f)
+        pages.append(
+            BenchmarkPage(
+                os.path.relpath(path, annotations_dir),
+                blocks,
+                annotation["Entities"],
+                objects_to_find
+                or expected_entities_from_annotations(annotation["Entities"]),
+            )
+        )
+    return pages
+
+
+def entity_key(entity):
+    """Return the type and WORD blocks of an entity, two entities are the same if their keys are equal."""
+    word_ids = [
+        child["ChildBlockId"]
+        for reference in entity["BlockReferences"]
+        for child in reference.get("ChildBlocks", [])
+    ]
+    return entity["Type"], frozenset(word_ids)
+
+
+def score_page(found_entities, consolidated_entities):
+    """
+    Compare the entities found on a page with its consolidated entities.
+
+    :param found_entities: entities found by the matcher
+    :param consolidated_entities: entities of the annotation file
+    :return: dict entity type -> Counter of true positives (tp), false positives (fp) and false negatives (fn)
+    """
+    found = {entity_key(entity) for entity in found_entities}
+    consolidated = {entity_key(entity) for entity in consolidated_entities}
+    counts = {}
+    for key in found | consolidated:
+        outcome = (
+            "tp"
+            if key in found and key in consolidated
+            else "fp" if key in found else "fn"
+        )
+        counts.setdefault(key[0], Counter())[outcome] += 1
+    return counts
+
+
+def precision_recall_f1(counts):
+    """Return the precision, recall and F1 of a Counter of tp, fp and fn (0 when undefined)."""
+    precision = (
+        counts["tp"] / (counts["tp"] + counts["fp"])
+        if counts["tp"] + counts["fp"]
+        else 0.0
+    )
+    recall = (
+        counts["tp"] / (counts["tp"] + counts["fn"])
+        if counts["tp"] + counts["fn"]
+        else 0.0
+    )
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1}
+
+
+def run_sweep_point(thresholds, pages, **matching_options):
+    """
+    Match all pages with a pair of thresholds.
+
+    :param thresholds: (fuzzymatch_line_thr, fuzzymatch_word_thr)
+    :param pages: list of BenchmarkPage
+    :param matching_options: other options of find_entities_on_page (engine, window_lines, ...)
+    :return: dict with the thresholds, the scores per entity type and overall, pages per second and stage timings
+    """
+    fuzzymatch_line_thr, fuzzymatch_word_thr = thresholds
+    # every point starts with a cold memo so that its timings do not depend on the points run before it
+    SCORE_MEMO.clear()
+    timings = Counter({stage: 0.0 for stage in STAGES})
+    counts = {}
+    for page in pages:
+        start = time.perf_counter()
+        prepared_page = PreparedPage(page.blocks)
+        prepared_entities = prepare_entities(page.objects_to_find)
+        timings["prepare"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        found_entities = find_entities_on_page(
+            page.blocks,
+            prepared_entities,
+            fuzzymatch_line_thr=fuzzymatch_line_thr,
+            fuzzymatch_word_thr=fuzzymatch_word_thr,
+            prepared_page=prepared_page,
+            **matching_options
+        )
+        timings["match"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        found_entities = consolidate_entities(found_entities)
+        timings["consolidate"] += time.perf_counter() - start
+
+        for entity_type, page_counts in score_page(
+            found_entities, page.entities
+        ).items():
+            counts.setdefault(entity_type, Counter()).update(page_counts)
+
+    total_counts = sum(counts.values(), Counter())
+    total_time = sum(timings.values())
+    return {
+        "fuzzymatch_line_thr": fuzzymatch_line_thr,
+        "fuzzymatch_word_thr": fuzzymatch_word_thr,
+        "overall": precision_recall_f1(total_counts),
+        "entity_types": {
+            entity_type: dict(precision_recall_f1(type_counts), **type_counts)
+            for entity_type, type_counts in sorted(counts.items())
+        },
+        "pages_per_second": len(pages) / total_time if total_time else 0.0,
+        "timings": dict(timings),
+    }
+
+
+def sweep_thresholds(
+    pages,
+    line_thresholds=LINE_THRESHOLDS,
+    word_thresholds=WORD_THRESHOLDS,
+    max_workers=None,
+    **matching_options
+):
+    """
+    Run every pair of line and word thresholds, the pairs are spread over worker processes.
+
+    :param pages: list of BenchmarkPage
+    :param line_thresholds: values of fuzzymatch_line_thr
+    :param word_thresholds: values of fuzzymatch_word_thr
+    :param max_workers: number of worker processes, defaults to the number of available CPUs
+    :param matching_options: other options of find_entities_on_page (engine, window_lines, ...)
+    :return: list of the results of run_sweep_point, sorted by decreasing overall F1
+    """
+    results = map_pages(
+        partial(run_sweep_point, pages=pages, **matching_options),
+        list(product(line_thresholds, word_thresholds)),
+        max_workers=max_workers,
+    )
+    return sorted(results, key=lambda result: -result["overall"]["f1"])
+
+
+def format_report(results):
+    """Return a text table of the sweep results, one row per sweep point and one per entity type."""
+    lines = [
+        "{:>5} {:>5} {:<24} {:>9} {:>9} {:>9} {:>9}   {}".format(
+            "line",
+            "word",
+            "entity type",
+            "precision",
+            "recall",
+            "f1",
+            "pages/s",
+            "prepare/match/consolidate (s)",
+        )
+    ]
+    for result in results:
+        rows = [("ALL", result["overall"])] + list(result["entity_types"].items())
+        for entity_type, scores in rows:
+            lines.append(
+                "{:>5} {:>5} {:<24} {:>9.3f} {:>9.3f} {:>9.3f} {:>9}   {}".format(
+                    result["fuzzymatch_line_thr"],
+                    result["fuzzymatch_word_thr"],
+                    entity_type[:24],
+                    scores["precision"],
+                    scores["recall"],
+                    scores["f1"],
+                    (
+                        "{:.1f}".format(result["pages_per_second"])
+                        if entity_type == "ALL"
+                        else ""
+                    ),
+                    (
+                        "/".join(
+                            "{:.3f}".format(result["timings"][stage])
+                            for stage in STAGES
+                        )
+                        if entity_type == "ALL"
+                        else ""
+                    ),
+                )
+            )
+    return "\n".join(lines)
+
+
+def parse_thresholds(value):
+    """Parse a comma separated list of thresholds."""
+    return [int(threshold) for threshold in value.split(",") if threshold.strip()]
+
+
+def add_switch(parser, name, default):
+    """Add the --<name> and --no-<name> flags turning a boolean option on and off."""
+    dest = name.replace("-", "_")
+    parser.add_argument(
+        "--" + name,
+        dest=dest,
+        action="store_true",
+        help="on by default" if default else "off by default",
+    )
+    parser.add_argument("--no-" + name, dest=dest, action="store_false")
+    parser.set_defaults(**{dest: default})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument(
+        "annotations_dir", help="directory of the consolidated annotation files"
+    )
+    parser.add_argument(
+        "--blocks-dir",
+        help="directory of the block files of annotation files without blocks",
+    )
+    parser.add_argument(
+        "--expected-entities",
+        help="expected entities file used for all pages, by default the consolidated entities of every page are looked for",
+    )
+    parser.add_argument(
+        "--line-thresholds", type=parse_thresholds, default=LINE_THRESHOLDS
+    )
+    parser.add_argument(
+        "--word-thresholds", type=parse_thresholds, default=WORD_THRESHOLDS
+    )
+    parser.add_argument(
+        "--matching-engine",
+        default=DEPLOYED_SETTINGS.get("MATCHING_ENGINE", MATCHING_ENGINE),
+        choices=["pairwise", "matrix"],
+    )
+    parser.add_argument(
+        "--window-lines",
+        type=int,
+        default=DEPLOYED_SETTINGS.get("WINDOW_LINES", WINDOW_LINES),
+    )
+    add_switch(
+        parser,
+        "prune-candidates",
+        DEPLOYED_SETTINGS.get("PRUNE_CANDIDATES", PRUNE_CANDIDATES),
+    )
+    add_switch(
+        parser,
+        "exact-match-first",
+        DEPLOYED_SETTINGS.get("EXACT_MATCH_FIRST", EXACT_MATCH_FIRST),
+    )
+    add_switch(
+        parser,
+        "spatial-matching",
+        DEPLOYED_SETTINGS.get("SPATIAL_MATCHING", SPATIAL_MATCHING),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="number of worker processes, defaults to the number of CPUs",
+    )
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    objects_to_find = None
+    if args.expected_entities:
+        with open(args.expected_entities, "r") as f:
+            objects_to_find = json.load(f)
+    pages = load_benchmark_pages(
+        args.annotations_dir,
+        blocks_dir=args.blocks_dir,
+        objects_to_find=objects_to_find,
+    )
+    if not pages:
+        parser.error("no annotation files found in {}".format(args.annotations_dir))
+
+    results = sweep_thresholds(
+        pages,
+        line_thresholds=args.line_thresholds,
+        word_thresholds=args.word_thresholds,
+        max_workers=args.workers,
+        engine=args.matching_engine,
+        window_lines=args.window_lines,
+        prune_candidates=args.prune_candidates,
+        exact_match_first=args.exact_match_first,
+        spatial_matching=args.spatial_matching,
+    )
+    print("{} pages".format(len(pages)))
+    print(format_report(results))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
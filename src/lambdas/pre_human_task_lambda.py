@@ -13,7 +13,7 @@ import traceback
 import pdfplumber
 
 from utils.s3_helper import S3Client
-from utils.block_helper import JSONHandler, Geometry, Block, Relationship
+from utils.block_helper import JSONHandler, Geometry, Block, Relationship, get_annotation_blocks
 from constants import general
 from type.semi_structured_annotation import SemiStructuredAnnotation, SemiStructuredDocumentType
 from utils.textract_helper import TextractClient
@@ -376,6 +376,9 @@ def lambda_handler(event, context):
 
         annotation_dict = json.loads(annotation_bytes.decode('utf-8'))
         annotation_obj = SemiStructuredAnnotation(**annotation_dict)
+        if not annotation_obj.Blocks and annotation_obj.BlocksS3Ref:
+            # the annotation files of the pre-labeling tool only reference the block file of their page
+            annotation_obj.Blocks = get_annotation_blocks(json.loads(s3_client.get_object_content_from_s3(annotation_obj.BlocksS3Ref)))
 
         if annotation_obj.Blocks:
             pdf_blocks = annotation_obj.Blocks
@@ -117,3 +117,24 @@ class Block(DictionaryClass):
             self.Geometry = copy.deepcopy(geometry)
         else:
             self.Geometry.extend_geometry(geometry)
+
+
+def get_annotation_blocks(blocks: List[dict]) -> List[dict]:
+    """Return the blocks of a block file as an annotation file inlines them, every LINE followed by its WORD blocks."""
+    blocks_by_id = {block['Id']: position for position, block in enumerate(blocks)}
+    annotation_blocks = []
+    for block in blocks:
+        if block['BlockType'] != 'LINE':
+            continue
+        annotation_blocks.append({key: value for key, value in block.items() if key not in ('parentBlockIndex', 'blockIndex')})
+        child_ids = []
+        for relationship in block.get('Relationships') or []:
+            if relationship['Type'] == 'CHILD':
+                child_ids = relationship['Ids']
+        for position in sorted({blocks_by_id[child_id] for child_id in child_ids if child_id in blocks_by_id}):
+            child = blocks[position]
+            if child['BlockType'] == 'WORD':
+                child = {key: value for key, value in child.items() if key not in ('parentBlockIndex', 'blockIndex')}
+                child['Relationships'] = []
+                annotation_blocks.append(child)
+    return annotation_blocks
@@ -0,0 +1,10 @@
+"""Setup unit test environment for the pre-labeling tool."""
+
+import sys
+import os
+
+# make sure tests can import the code of the fuzzy matching lambda
+my_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, my_path + '/../../../Pre_labeling_tool/src/lambda/code/prelabeling_execute_preannotation_jobs_mapstate/')
+# and the offline tools of the pre-labeling tool
+sys.path.insert(0, my_path + '/../../../Pre_labeling_tool/tools/')
@@ -0,0 +1,46 @@
+"""Sample data and fakes shared by the unit tests of the pre-labeling tool."""
+
+import io
+import json
+
+from botocore.exceptions import ClientError
+from helpers.s3_helper import S3Helper
+
+
+def load_blocks(filename):
+    with open(f'test/unit/resources/sample_blocks/{filename}', 'r') as f:
+        blocks = json.loads(f.read())
+    return blocks["Blocks"] if isinstance(blocks, dict) else blocks
+
+
+def load_expected_entities(filename):
+    with open(f'test/unit/resources/sample_expected_entities/{filename}', 'r') as f:
+        return json.loads(f.read())
+
+
+class FakeS3Helper(object):
+    """S3Helper keeping the objects in memory."""
+
+    bucket_key_from_s3_uri = staticmethod(S3Helper.bucket_key_from_s3_uri)
+    s3_uri_from_bucket_key = staticmethod(S3Helper.s3_uri_from_bucket_key)
+    s3_uri_from_bucket_folder_file = staticmethod(S3Helper.s3_uri_from_bucket_folder_file)
+
+    def __init__(self):
+        self.objects = {}
+        self.writes = 0
+
+    def write_content(self, s3_path, content):
+        self.objects[s3_path] = content
+        self.writes += 1
+
+    def write_json_dict(self, s3_path, dict):
+        self.write_content(s3_path, json.dumps(dict))
+
+    def get_object_response_from_s3(self, s3_url):
+        if s3_url not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        content = self.objects[s3_url]
+        return {"Body": io.BytesIO(content if isinstance(content, bytes) else content.encode("utf-8"))}
+
+    def delete_object(self, s3_path):
+        self.objects.pop(s3_path, None)
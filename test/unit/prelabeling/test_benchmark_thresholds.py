@@ -0,0 +1,80 @@
+import json
+import os
+import tempfile
+from collections import Counter
+from unittest import TestCase
+from unittest.mock import patch
+
+import benchmark_thresholds
+from benchmark_thresholds import (
+    expected_entities_from_annotations,
+    handler_settings,
+    load_benchmark_pages,
+    main,
+    precision_recall_f1,
+    score_page,
+    sweep_thresholds,
+)
+
+ANNOTATIONS_DIR = 'test/unit/resources/sample_annotations'
+
+
+def entity(entity_type, word_ids, text="text"):
+    return {"Type": entity_type, "Text": text,
+            "BlockReferences": [{"BlockId": "l", "ChildBlocks": [{"ChildBlockId": word_id} for word_id in word_ids]}]}
+
+
+class BenchmarkThresholdsTest(TestCase):
+
+    def test_score_page(self):
+        found = [entity("name", ["w1", "w2"]), entity("name", ["w5"]), entity("date", ["w3"])]
+        consolidated = [entity("name", ["w2", "w1"]), entity("date", ["w3", "w4"]), entity("amount", ["w6"])]
+        self.assertEqual(score_page(found, consolidated), {
+            "name": Counter(tp=1, fp=1),
+            "date": Counter(fp=1, fn=1),
+            "amount": Counter(fn=1),
+        })
+        self.assertEqual(precision_recall_f1(Counter(tp=1, fp=1)), {"precision": 0.5, "recall": 1.0, "f1": 2 / 3})
+        self.assertEqual(precision_recall_f1(Counter()), {"precision": 0.0, "recall": 0.0, "f1": 0.0})
+
+    def test_expected_entities_from_annotations(self):
+        entities = [entity("name", ["w1"], "JANE DOE"), entity("name", ["w2"], "JANE DOE"), entity("date", ["w3"], "May 1")]
+        self.assertEqual(expected_entities_from_annotations(entities), [
+            {"expected_texts": ["JANE DOE"], "entity_type": "name", "ignore_list": []},
+            {"expected_texts": ["May 1"], "entity_type": "date", "ignore_list": []},
+        ])
+
+    def test_sweep_thresholds(self):
+        pages = load_benchmark_pages(ANNOTATIONS_DIR)
+        self.assertEqual([page.name for page in pages], ['sample_file1-1-570408b2-ann.json', 'sample_file1-1-bad5a1bc-ann.json'])
+        results = sweep_thresholds(pages, line_thresholds=[90, 101], word_thresholds=[60], max_workers=1)
+        self.assertEqual([(result["fuzzymatch_line_thr"], result["fuzzymatch_word_thr"]) for result in results], [(90, 60), (101, 60)])
+        # nothing can pass a line threshold above 100
+        self.assertEqual(results[1]["overall"], {"precision": 0.0, "recall": 0.0, "f1": 0.0})
+        self.assertEqual(results[0]["entity_types"]["EntityTypeC"]["tp"], 1)
+        self.assertGreater(results[0]["overall"]["f1"], 0)
+        self.assertEqual(set(results[0]["timings"]), {"prepare", "match", "consolidate"})
+        self.assertGreater(results[0]["pages_per_second"], 0)
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            output = os.path.join(output_dir, "sweep.json")
+            results = main([ANNOTATIONS_DIR, "--line-thresholds", "85,90", "--word-thresholds", "50,60", "--workers", "2",
+                            "--output", output])
+            with open(output, "r") as f:
+                self.assertEqual(len(json.load(f)), 4)
+        self.assertEqual(len(results), 4)
+
+    def test_defaults_of_the_deployed_handler(self):
+        settings = handler_settings()
+        self.assertEqual(settings["WINDOW_LINES"], 1)
+        self.assertFalse(settings["SPATIAL_MATCHING"])
+        with patch.object(benchmark_thresholds, "sweep_thresholds", return_value=[]) as sweep:
+            main([ANNOTATIONS_DIR])
+            self.assertEqual(sweep.call_args.kwargs["window_lines"], settings["WINDOW_LINES"])
+            self.assertEqual(sweep.call_args.kwargs["spatial_matching"], settings["SPATIAL_MATCHING"])
+            self.assertTrue(sweep.call_args.kwargs["prune_candidates"])
+            main([ANNOTATIONS_DIR, "--no-prune-candidates", "--spatial-matching", "--window-lines", "3"])
+            self.assertFalse(sweep.call_args.kwargs["prune_candidates"])
+            self.assertTrue(sweep.call_args.kwargs["spatial_matching"])
+            self.assertEqual(sweep.call_args.kwargs["window_lines"], 3)
@@ -0,0 +1,50 @@
+import copy
+from unittest import TestCase
+
+from file_formatting import get_blocks_for_annotation_file
+from helpers.block_graph import BlockGraph
+from prelabeling_fixtures import load_blocks
+
+
+def scan_children(block, blocks):
+    child_blocks = []
+    for relatives in block["Relationships"]:
+        if relatives["Type"] == "CHILD":
+            child_blocks = [c_block for c_block in blocks if c_block["Id"] in relatives["Ids"]]
+    return child_blocks
+
+
+class BlockGraphTest(TestCase):
+
+    def test_children_match_page_scan(self):
+        for filename in ['sample_file1_1_blocks.json', 'file2_1_blocks.json', 'scanned_1_blocks.json']:
+            blocks = load_blocks(filename)
+            block_graph = BlockGraph(blocks)
+            for block in blocks:
+                if block["BlockType"] == "LINE":
+                    self.assertEqual(block_graph.children(block), scan_children(block, blocks))
+            self.assertEqual(len(block_graph.blocks_by_id), len(blocks))
+
+    def test_children_without_relationships(self):
+        blocks = [
+            {"BlockType": "LINE", "Id": "l", "Text": "a"},
+            {"BlockType": "PAGE", "Id": "p", "Relationships": [{"Type": "CHILD", "Ids": ["l", "unknown"]}]},
+        ]
+        block_graph = BlockGraph(blocks)
+        self.assertEqual(block_graph.children(blocks[0]), [])
+        self.assertEqual(block_graph.children(blocks[1]), [blocks[0]])
+
+    def test_annotation_file_blocks(self):
+        blocks = load_blocks('scanned_1_blocks.json')
+        expected_blocks = []
+        for block in copy.deepcopy(blocks):
+            if block["BlockType"] == "LINE":
+                block["Page"] = 1
+                expected_blocks.append(block)
+                for child in scan_children(block, blocks):
+                    if child["BlockType"] == "WORD":
+                        child = copy.copy(child)
+                        child["Relationships"] = []
+                        child["Page"] = 1
+                        expected_blocks.append(child)
+        self.assertEqual(get_blocks_for_annotation_file(blocks, block_graph=BlockGraph(blocks)), expected_blocks)
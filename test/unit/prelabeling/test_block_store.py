@@ -0,0 +1,38 @@
+import json
+from unittest import TestCase
+
+from file_formatting import get_blocks_for_annotation_file, get_blocks_for_block_file
+from helpers.block_store import BLOCK_STORE_FOLDER, block_store_key, store_block_content
+from helpers.compact_blocks import compact_page
+from utils.block_helper import get_annotation_blocks
+from prelabeling_fixtures import FakeS3Helper, load_blocks
+
+
+class BlockStoreTest(TestCase):
+
+    def setUp(self):
+        self.pages = [load_blocks('bank_stmt_0_1_blocks.json'), load_blocks('scanned_1_blocks.json')]
+
+    def test_key(self):
+        content = json.dumps(get_blocks_for_block_file(self.pages[0]))
+        self.assertEqual(block_store_key(content), block_store_key(content.encode("utf-8")))
+        self.assertNotEqual(block_store_key(content), block_store_key(json.dumps(get_blocks_for_block_file(self.pages[1]))))
+        self.assertTrue(block_store_key(content).endswith(".json"))
+
+    def test_page_stored_once(self):
+        s3_helper = FakeS3Helper()
+        uris = [store_block_content(json.dumps(get_blocks_for_block_file(blocks)), s3_helper, "bucket")
+                for blocks in self.pages + self.pages]
+        self.assertEqual(uris[:2], uris[2:])
+        self.assertNotEqual(uris[0], uris[1])
+        self.assertTrue(uris[0].startswith("s3://bucket/" + BLOCK_STORE_FOLDER))
+        self.assertEqual(len(s3_helper.objects), 2)
+        # the compact blocks of a page give the same block file
+        self.assertEqual(store_block_content(json.dumps(get_blocks_for_block_file(compact_page(self.pages[0]))),
+                                             s3_helper, "bucket"), uris[0])
+
+    def test_annotation_blocks_rebuilt_from_the_block_file(self):
+        # the pre human task lambda rebuilds the blocks of annotation files that only reference their block file
+        for blocks in self.pages:
+            block_file = json.loads(json.dumps(get_blocks_for_block_file(blocks)))
+            self.assertEqual(get_annotation_blocks(block_file), get_blocks_for_annotation_file(blocks))
@@ -0,0 +1,40 @@
+from unittest import TestCase
+
+from helpers.string_cleaning.clean_text import clean_text, dict_text_cleaners, register_text_cleaner
+from helpers.string_cleaning.languages.german import remove_umlaut
+
+
+def bytes_remove_umlaut(string):
+    # reference: the bytes based implementation remove_umlaut replaced
+    string = string.encode()
+    for umlaut, replacement in [('ü', b'u'), ('ä', b'a'), ('ö', b'o'), ('ß', b'ss')]:
+        string = string.replace(umlaut.encode(), replacement)
+    return string.decode('utf-8')
+
+
+class CleanTextTest(TestCase):
+
+    def test_german_same_as_bytes_implementation(self):
+        for text in ['Grüße aus München', 'ÄRZTEKAMMER ÖSTERREICH ÜBER', 'Straße ẞ', 'café 12,50 €', '']:
+            self.assertEqual(clean_text(text), bytes_remove_umlaut(text.lower()))
+            self.assertEqual(clean_text(text, use_cache=False), clean_text(text))
+
+    def test_remove_umlaut_keeps_case(self):
+        self.assertEqual(remove_umlaut('Über Öl Äpfel Fuß'), 'Uber Ol Apfel Fuss')
+
+    def test_accent_folding(self):
+        self.assertEqual(clean_text('Œuvre Ça Déjà', language='fr'), 'oeuvre ca deja')
+        self.assertEqual(clean_text('Año Niño Túnel', language='es'), 'ano nino tunel')
+        self.assertEqual(clean_text('Perché Città', language='it'), 'perche citta')
+        self.assertEqual(clean_text('Naïve Café Zoë Łódź', language='en'), 'naive cafe zoe lodz')
+
+    def test_register_text_cleaner(self):
+        register_text_cleaner('xx', lambda text: text.replace('x', ''))
+        try:
+            self.assertEqual(clean_text('XaX', language='xx'), 'a')
+        finally:
+            del dict_text_cleaners['xx']
+
+    def test_unknown_language(self):
+        with self.assertRaises(KeyError):
+            clean_text('text', language='unknown')
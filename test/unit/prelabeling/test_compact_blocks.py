@@ -0,0 +1,73 @@
+import json
+import pickle
+import tracemalloc
+from unittest import TestCase
+
+from file_formatting import get_blocks_for_annotation_file, get_blocks_for_block_file
+from helpers.block_graph import BlockGraph
+from helpers.compact_blocks import CompactBlock, compact_page
+from helpers.prepared_page import PreparedPage
+from prelabeling_fixtures import load_blocks
+
+
+def read_blocks(filename):
+    with open(f'test/unit/resources/sample_blocks/{filename}', 'r') as f:
+        return f.read()
+
+
+class CompactBlocksTest(TestCase):
+
+    def setUp(self):
+        self.filenames = ['bank_stmt_0_1_blocks.json', 'file2_1_blocks.json', 'scanned_1_blocks.json']
+
+    def test_round_trip(self):
+        for filename in self.filenames:
+            blocks = load_blocks(filename)
+            compact_blocks = compact_page(blocks)
+            self.assertEqual([block.to_dict() for block in compact_blocks],
+                             [block for block in blocks if block["BlockType"] in ("LINE", "WORD")])
+            self.assertEqual([block.to_dict() for block in pickle.loads(pickle.dumps(compact_blocks))],
+                             [block.to_dict() for block in compact_blocks])
+
+    def test_files_unchanged(self):
+        for filename in self.filenames:
+            blocks = load_blocks(filename)
+            compact_blocks = compact_page(blocks)
+            self.assertEqual(get_blocks_for_block_file(compact_blocks), get_blocks_for_block_file(blocks))
+            self.assertEqual(get_blocks_for_annotation_file(compact_blocks), get_blocks_for_annotation_file(blocks))
+
+    def test_read_like_a_dict(self):
+        blocks = load_blocks('scanned_1_blocks.json')
+        compact_blocks = compact_page(blocks)
+        line = next(block for block in blocks if block["BlockType"] == "LINE")
+        compact_line = compact_blocks[0]
+        self.assertEqual(compact_line["Text"], line["Text"])
+        self.assertEqual(compact_line.get("Geometry"), line["Geometry"])
+        self.assertEqual(compact_line["Relationships"], line["Relationships"])
+        self.assertIsNone(compact_line.get("Page"))
+        self.assertNotIn("Page", compact_line)
+        with self.assertRaises(KeyError):
+            compact_line["Page"]
+        self.assertEqual([child.Id for child in BlockGraph(compact_blocks).children(compact_line)],
+                         [child["Id"] for child in BlockGraph(blocks).children(line)])
+        self.assertEqual(PreparedPage(compact_blocks).cleaned_lines, PreparedPage(blocks).cleaned_lines)
+
+    def test_blocks_without_optional_fields(self):
+        block = {"BlockType": "WORD", "Id": "w", "Text": "EUR"}
+        self.assertEqual(CompactBlock.from_dict(block).to_dict(), block)
+        self.assertEqual(CompactBlock.from_dict(dict(block, Relationships=[])).to_dict(Page=1),
+                         dict(block, Relationships=[], Page=1))
+
+    def test_memory(self):
+        text = read_blocks('file2_1_blocks.json')
+        tracemalloc.start()
+        blocks = json.loads(text)["Blocks"]
+        dict_size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del blocks
+        tracemalloc.start()
+        compact_blocks = compact_page(json.loads(text)["Blocks"])
+        compact_size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        self.assertGreater(len(compact_blocks), 0)
+        self.assertLess(compact_size, dict_size / 3)
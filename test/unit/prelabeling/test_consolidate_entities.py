@@ -0,0 +1,94 @@
+import copy
+import random
+from unittest import TestCase
+
+from match_entities_to_block import consolidate_entities
+
+TYPES = ["NAME", "IBAN", "ADDRESS", "BANK"]
+TEXTS = ["JANE DOE", "DE89 3704", "Main Street 1", "", " ", "  "]
+
+
+def quadratic_consolidate_entities(all_found_entities, double_types=None, changefor=None):
+    # reference: the list based implementation consolidate_entities replaced
+    strange_entities = [copy.copy(entity) for entity in all_found_entities if entity["Text"] in ["", " ", "  "]]
+    for entity in strange_entities:
+        all_found_entities.remove(entity)
+    all_found_entities_final = copy.deepcopy(all_found_entities)
+    if (double_types is not None) and (changefor is not None):
+        if len(double_types) != len(changefor):
+            return all_found_entities
+        for ii in range(len(double_types)):
+            pair = double_types[ii]
+            new_type = changefor[ii]
+            ents_t1 = [copy.copy(entity) for entity in all_found_entities if entity["Type"] == pair[0]]
+            ents_t2 = [copy.copy(entity) for entity in all_found_entities if entity["Type"] == pair[1]]
+            for jj, element in enumerate(ents_t1):
+                element["Type"] = new_type
+                ents_t1[jj] = element
+            for jj, element in enumerate(ents_t2):
+                element["Type"] = new_type
+                ents_t2[jj] = element
+            double_entities = [entity for entity in ents_t1 if entity in ents_t2]
+            ents_t1_drop = [copy.copy(entity) for entity in ents_t1 if entity in double_entities]
+            ents_t2_drop = [copy.copy(entity) for entity in ents_t2 if entity in double_entities]
+            for entity in ents_t1_drop:
+                entity["Type"] = pair[0]
+                all_found_entities_final.remove(entity)
+            for entity in ents_t2_drop:
+                entity["Type"] = pair[1]
+                all_found_entities_final.remove(entity)
+            all_found_entities_final += double_entities
+    return all_found_entities_final
+
+
+def random_entity(rng):
+    return {
+        "Type": rng.choice(TYPES),
+        "Text": rng.choice(TEXTS),
+        "Score": 1,
+        "BlockReferences": [
+            {
+                "BlockId": rng.choice(["line-1", "line-2"]),
+                "BeginOffset": rng.choice([0, 5]),
+                "EndOffset": 12,
+                "ChildBlocks": [{"ChildBlockId": "word-1", "BeginOffset": 0, "EndOffset": rng.choice([4, 8])}],
+            }
+        ],
+    }
+
+
+def run(consolidate, entities, double_types, changefor):
+    entities = copy.deepcopy(entities)
+    try:
+        return consolidate(entities, double_types, changefor), entities
+    except ValueError:
+        return ValueError, entities
+
+
+class ConsolidateEntitiesTest(TestCase):
+
+    def test_same_output_as_quadratic_implementation(self):
+        rng = random.Random(7)
+        for _ in range(500):
+            entities = [random_entity(rng) for _ in range(rng.randint(0, 20))]
+            # duplicates are common on real pages (several objects with the same texts)
+            entities += [copy.deepcopy(rng.choice(entities)) for _ in range(rng.randint(0, 3)) if entities]
+            rng.shuffle(entities)
+            number_pairs = rng.randint(0, 3)
+            double_types = [[rng.choice(TYPES), rng.choice(TYPES)] for _ in range(number_pairs)]
+            changefor = [rng.choice(TYPES + ["NAME_IBAN"]) for _ in range(number_pairs)]
+            if rng.random() < 0.1:
+                double_types, changefor = None, None
+            expected = run(quadratic_consolidate_entities, entities, double_types, changefor)
+            self.assertEqual(run(consolidate_entities, entities, double_types, changefor), expected)
+
+    def test_consolidates_pair(self):
+        name = random_entity(random.Random(1))
+        name["Type"], name["Text"] = "NAME", "JANE DOE"
+        holder = dict(name, Type="HOLDER")
+        other = dict(name, Type="IBAN", Text="DE89 3704")
+        empty = dict(name, Text=" ")
+        entities = [name, other, holder, empty]
+        consolidated = consolidate_entities(entities, [["NAME", "HOLDER"]], ["ACCOUNT_HOLDER"])
+        self.assertEqual(consolidated, [other, dict(name, Type="ACCOUNT_HOLDER")])
+        self.assertNotIn(empty, entities)
@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from helpers import entity_dictionary
+from helpers.entity_dictionary import clear_memory_cache, content_hash, load_compiled_entities
+from helpers.prepared_page import prepare_entities
+from match_entities_to_block import find_entities_on_page
+from prelabeling_fixtures import load_blocks
+
+
+def load_content(filename):
+    with open(f'test/unit/resources/sample_expected_entities/{filename}', 'r') as f:
+        return f.read()
+
+
+class EntityDictionaryTest(TestCase):
+
+    def setUp(self):
+        clear_memory_cache()
+        self.cache_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        clear_memory_cache()
+        self.cache_dir.cleanup()
+
+    def test_compiled_entities_give_same_entities(self):
+        content = load_content('bank_stmt_0.json')
+        compiled_entities = load_compiled_entities(content, cache_dir=self.cache_dir.name)
+        blocks = load_blocks('bank_stmt_0_1_blocks.json')
+        for exact_match_first in [False, True]:
+            self.assertEqual(
+                find_entities_on_page(blocks, compiled_entities.prepared_entities, exact_match_first=exact_match_first,
+                                      exact_matcher=compiled_entities.exact_matcher),
+                find_entities_on_page(blocks, prepare_entities(json.loads(content)), exact_match_first=exact_match_first),
+            )
+
+    def test_cached_in_memory_and_on_disk(self):
+        content = load_content('bank_stmt_0.json')
+        compiled_entities = load_compiled_entities(content, cache_dir=self.cache_dir.name)
+        self.assertIs(load_compiled_entities(content, cache_dir=self.cache_dir.name), compiled_entities)
+        path = os.path.join(self.cache_dir.name, content_hash(content) + ".pkl")
+        self.assertTrue(os.path.exists(path))
+
+        # a new container only finds the artifact in /tmp
+        clear_memory_cache()
+        original_init = entity_dictionary.CompiledEntities.__init__
+        entity_dictionary.CompiledEntities.__init__ = None  # compiling would fail
+        try:
+            reloaded = load_compiled_entities(content, cache_dir=self.cache_dir.name)
+        finally:
+            entity_dictionary.CompiledEntities.__init__ = original_init
+        self.assertIsNot(reloaded, compiled_entities)
+        self.assertEqual(reloaded.objects_to_find, compiled_entities.objects_to_find)
+        self.assertEqual(reloaded.exact_matcher.automaton.patterns, compiled_entities.exact_matcher.automaton.patterns)
+
+    def test_key_depends_on_content_and_language(self):
+        content = load_content('bank_stmt_0.json')
+        self.assertEqual(content_hash(content), content_hash(content.encode("utf-8")))
+        self.assertNotEqual(content_hash(content), content_hash(content + " "))
+        self.assertNotEqual(content_hash(content), content_hash(content, language="fr"))
+
+    def test_unreadable_artifact_is_rebuilt(self):
+        content = load_content('bank_stmt_0.json')
+        with open(os.path.join(self.cache_dir.name, content_hash(content) + ".pkl"), "wb") as f:
+            f.write(b"not a pickle")
+        compiled_entities = load_compiled_entities(content, cache_dir=self.cache_dir.name)
+        self.assertEqual(len(compiled_entities.prepared_entities), 6)
@@ -0,0 +1,56 @@
+from unittest import TestCase
+
+from helpers.exact_matcher import AhoCorasickAutomaton, ExactTextMatcher, original_offsets
+from helpers.prepared_page import PreparedPage, prepare_entities, word_spans
+from match_entities_to_block import find_entities_on_page
+from prelabeling_fixtures import load_blocks, load_expected_entities
+
+
+class ExactMatcherTest(TestCase):
+
+    def test_automaton_finds_overlapping_patterns(self):
+        automaton = AhoCorasickAutomaton(["he", "she", "his", "hers", ""])
+        self.assertEqual(
+            sorted(automaton.iter_matches("ushers")),
+            [(1, 4, 1), (2, 4, 0), (2, 6, 3)],
+        )
+
+    def test_original_offsets(self):
+        self.assertEqual(original_offsets("Bank", "bank"), [0, 1, 2, 3, 4])
+        self.assertEqual(original_offsets("Größe 1", "grosse 1"), [0, 1, 2, 3, 3, 4, 5, 6, 7])
+        self.assertIsNone(original_offsets("ab", "xyz"))
+
+    def test_word_spans(self):
+        words = [{"Text": "Savings"}, {"Text": "balance"}]
+        self.assertEqual(word_spans("Savings  balance", words), [(0, 7), (9, 16)])
+        self.assertIsNone(word_spans("Savings", words))
+
+    def test_exact_matches_on_bank_statement(self):
+        blocks = load_blocks('bank_stmt_0_1_blocks.json')
+        prepared_page = PreparedPage(blocks)
+        prepared_entities = prepare_entities(load_expected_entities('bank_stmt_0.json') + [
+            {"expected_texts": ["GRÖSSERE BETRÄGE"], "entity_type": "german"},
+            {"expected_texts": ["9,762"], "entity_type": "partial_amount"},
+        ])
+        matches = ExactTextMatcher(prepared_entities).find(prepared_page)
+        # "9,762" is only part of the words "9,762.71" and "9,762.17"
+        self.assertEqual(sorted(matches), [0, 1, 2, 3, 4, 5, 6])
+        lines = prepared_page.line_blocks
+        self.assertEqual([lines[line_position]["Text"][begin:end] for line_position, begin, end, _ in matches[0]], ["AnyCompany Bank"] * 3)
+        line_position, begin, end, child_blocks = matches[6][0]
+        self.assertEqual(lines[line_position]["Text"][begin:end], "Größere Beträge")
+        self.assertEqual([c_block["Text"] for c_block in child_blocks], ["Größere", "Beträge"])
+
+    def test_exact_match_first(self):
+        blocks = load_blocks('bank_stmt_0_1_blocks.json')
+        objects_to_find = load_expected_entities('bank_stmt_0.json') + [
+            {"expected_texts": ["JANE DOE payroll"], "entity_type": "fuzzy_only"},
+        ]
+        found_entities = find_entities_on_page(blocks, prepare_entities(objects_to_find), exact_match_first=True)
+        bank_names = [entity for entity in found_entities if entity["Type"] == "bank_name"]
+        self.assertEqual(len(bank_names), 3)
+        block_ref = bank_names[1]["BlockReferences"][0]
+        self.assertEqual((block_ref["BeginOffset"], block_ref["EndOffset"]), (16, 31))
+        self.assertEqual(len(block_ref["ChildBlocks"]), 2)
+        # objects without a verbatim occurrence still go through the fuzzy matching
+        self.assertEqual([entity["Text"] for entity in found_entities if entity["Type"] == "fuzzy_only"], ["JANE DOE"])
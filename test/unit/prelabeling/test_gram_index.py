@@ -0,0 +1,52 @@
+import random
+from unittest import TestCase
+
+from fuzzywuzzy import fuzz
+from helpers.gram_index import LineGramIndex, count_grams
+
+ALPHABET = "abcdefghij0123456789 .,-"
+
+
+def mutate(text, rng, number_edits):
+    for _ in range(number_edits):
+        position = rng.randrange(len(text) + 1)
+        operation = rng.choice(["insert", "delete", "substitute"])
+        if operation == "insert" or not text:
+            text = text[:position] + rng.choice(ALPHABET) + text[position:]
+        elif operation == "delete":
+            text = text[:position] + text[position + 1:]
+        else:
+            text = text[:position] + rng.choice(ALPHABET) + text[position + 1:]
+    return text
+
+
+class LineGramIndexTest(TestCase):
+
+    def test_count_grams(self):
+        self.assertEqual(count_grams("aaaa"), {"aaa": 2})
+        self.assertEqual(count_grams("ab"), {})
+
+    def test_token_sharing_lines_are_candidates(self):
+        index = LineGramIndex(["anycompany bank", "jane doe", "statement of account"])
+        self.assertEqual(list(index.candidate_positions("anycompany credit union", 90)), [0])
+        self.assertEqual(list(index.candidate_positions("", 90)), [])
+        self.assertEqual(list(index.candidate_positions("zzz", -1)), [0, 1, 2])
+
+    def test_numbers_without_common_token_are_candidates(self):
+        index = LineGramIndex(["003884257408", "388425740636", "checking balance"])
+        candidates = list(index.candidate_positions("003884257406", 90))
+        self.assertIn(0, candidates)
+        self.assertNotIn(2, candidates)
+
+    def test_pruning_never_drops_a_match(self):
+        rng = random.Random(42)
+        for _ in range(200):
+            expected_text = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 25))).strip()
+            lines = [mutate(expected_text, rng, rng.randint(0, 6)) for _ in range(15)]
+            lines += ["".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 40))) for _ in range(5)]
+            index = LineGramIndex(lines)
+            for threshold in [0, 50, 60, 75, 85, 90, 95, 99, 100]:
+                candidates = set(index.candidate_positions(expected_text, threshold))
+                for position, line in enumerate(lines):
+                    if fuzz.token_set_ratio(expected_text, line) > threshold:
+                        self.assertIn(position, candidates, (expected_text, line, threshold))
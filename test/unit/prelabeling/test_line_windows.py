@@ -0,0 +1,35 @@
+from unittest import TestCase
+
+from fuzzywuzzy import fuzz
+from helpers.line_windows import coverage_ratio, matched_windows
+from helpers.score_matrix import fuzzywuzzy_processor
+
+
+def tokens(text):
+    return frozenset(fuzzywuzzy_processor(text).split())
+
+
+class LineWindowsTest(TestCase):
+
+    def test_coverage_ratio(self):
+        expected = "123 Any Street, Apartment 4B Anytown, WA 98101"
+        line = "123 Any Street, Apartment 4B"
+        # a part of the expected text passes token_set_ratio but not the coverage ratio
+        self.assertEqual(fuzz.token_set_ratio(expected, line), 100)
+        self.assertLess(coverage_ratio(tokens(expected), tokens(line)), 90)
+        self.assertEqual(coverage_ratio(tokens(expected), tokens(line + " Anytown, WA 98101 USA")), 100)
+        self.assertEqual(coverage_ratio(tokens(expected), tokens("Statement of Account")), 0)
+
+    def test_minimal_windows(self):
+        lines = ["AnyCompany Bank", "123 Any Street,", "Apartment 4B", "Anytown, WA 98101", "Page 1 of 1"]
+        line_tokens = [tokens(line) for line in lines]
+        expected_tokens = [tokens("123 Any Street, Apartment 4B Anytown, WA 98101")]
+        reading_order = [0, 1, 2, 3, 4]
+        self.assertEqual(matched_windows(line_tokens, reading_order, expected_tokens, 90, 2), [])
+        self.assertEqual(matched_windows(line_tokens, reading_order, expected_tokens, 90, 4), [[1, 2, 3]])
+        # windows follow the reading order and stay within the allowed lines
+        self.assertEqual(matched_windows(line_tokens, [3, 2, 1, 0, 4], expected_tokens, 90, 3), [[3, 2, 1]])
+        self.assertEqual(matched_windows(line_tokens, reading_order, expected_tokens, 90, 3, allowed_positions={0, 1, 2}), [])
+        # a line holding the whole expected text is never part of a window
+        line_tokens[2] = tokens("Apartment 4B 123 Any Street Anytown WA 98101")
+        self.assertEqual(matched_windows(line_tokens, reading_order, expected_tokens, 90, 3), [])
@@ -0,0 +1,137 @@
+from unittest import TestCase
+
+from helpers.prepared_page import PreparedPage, prepare_entities
+from match_entities_to_block import entity_key, find_entities_on_page, find_text_Item_on_page
+from prelabeling_fixtures import load_blocks, load_expected_entities
+
+
+def find_all_entities(blocks, objects_to_find, **kwargs):
+    prepared_page = PreparedPage(blocks)
+    return [
+        find_text_Item_on_page(
+            blocks, prepared_entity.expected_texts, prepared_entity.entity_type, ignore_list=prepared_entity.ignore_list,
+            prepared_page=prepared_page, prepared_entity=prepared_entity, **kwargs)
+        for prepared_entity in prepare_entities(objects_to_find)
+    ]
+
+
+def find_entities_per_object(blocks, objects_to_find, **kwargs):
+    all_found_entities = []
+    for entities in find_all_entities(blocks, objects_to_find, **kwargs):
+        for entity in entities:
+            if entity not in all_found_entities:
+                all_found_entities.append(entity)
+    return all_found_entities
+
+
+OBJECTS_TO_FIND = [
+    {"expected_texts": ["Arena Pharmaceuticals, Inc."], "entity_type": "company"},
+    {"expected_texts": ["March 8, 2012", "November 8, 2011"], "entity_type": "date"},
+    {"expected_texts": ["$1.73"], "entity_type": "price", "ignore_list": ["per"]},
+    {"expected_texts": ["Missouri Department of Health"], "entity_type": "organization"},
+    {"expected_texts": ["573-751-6400", "1-800-735-2966"], "entity_type": "phone"},
+    {"expected_texts": ["Residential Density"], "entity_type": "term"},
+    {"expected_texts": ["Größere Beträge"], "entity_type": "german"},
+    {"expected_texts": ["AnyCompany Bank - Member FDIC"], "entity_type": "bank_name"},
+]
+SAMPLE_PAGES = ['bank_stmt_0_1_blocks.json', 'sample_file1_1_blocks.json', 'file2_1_blocks.json', 'scanned_1_blocks.json']
+
+
+class MatchEntitiesToBlockTest(TestCase):
+
+    def test_bank_statement_entities(self):
+        blocks = load_blocks('bank_stmt_0_1_blocks.json')
+        found_entities = find_all_entities(blocks, load_expected_entities('bank_stmt_0.json'))
+        bank_names = found_entities[0]
+        self.assertEqual([entity["Text"] for entity in bank_names], ["AnyCompany Bank"] * 3)
+        self.assertEqual(bank_names[0]["Type"], "bank_name")
+        self.assertEqual(bank_names[1]["BlockReferences"][0]["BeginOffset"], len("Questions? Call "))
+        self.assertEqual(bank_names[1]["BlockReferences"][0]["EndOffset"], len("Questions? Call AnyCompany Bank"))
+        self.assertEqual(
+            [[entity["Text"] for entity in entities] for entities in found_entities[1:]],
+            [["JANE DOE"], ["003884257406"], ["19,102.60"], ["388425740636"], ["9,762.71"]],
+        )
+
+    def test_matrix_engine_parity(self):
+        objects_to_find = load_expected_entities('bank_stmt_0.json') + OBJECTS_TO_FIND
+        for filename in SAMPLE_PAGES:
+            blocks = load_blocks(filename)
+            self.assertEqual(
+                find_all_entities(blocks, objects_to_find, engine="matrix"),
+                find_all_entities(blocks, objects_to_find, engine="pairwise"),
+            )
+
+    def test_find_entities_on_page(self):
+        objects_to_find = load_expected_entities('bank_stmt_0.json') + OBJECTS_TO_FIND
+        for filename in SAMPLE_PAGES:
+            blocks = load_blocks(filename)
+            expected_entities = find_entities_per_object(blocks, objects_to_find)
+            for kwargs in [{}, {"engine": "matrix"}, {"engine": "matrix", "prune_candidates": False}]:
+                self.assertEqual(
+                    find_entities_on_page(blocks, prepare_entities(objects_to_find), **kwargs), expected_entities
+                )
+
+    def test_find_entities_on_page_drops_duplicates(self):
+        blocks = load_blocks('bank_stmt_0_1_blocks.json')
+        objects_to_find = load_expected_entities('bank_stmt_0.json')
+        found_entities = find_entities_on_page(blocks, prepare_entities(objects_to_find + objects_to_find[:1]))
+        self.assertEqual(len(found_entities), 8)
+        self.assertEqual(len({entity_key(entity) for entity in found_entities}), 8)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            find_text_Item_on_page(load_blocks('bank_stmt_0_1_blocks.json'), ["JANE DOE"], "customer_name", engine="unknown")
+
+    def test_spatial_matching_keeps_entities_near_anchor(self):
+        blocks = load_blocks('bank_stmt_0_1_blocks.json')
+        objects_to_find = [
+            {"expected_texts": ["9,762.71"], "entity_type": "savings_amount", "anchor_label": "Savings balance"},
+            {"expected_texts": ["JANE DOE"], "entity_type": "customer_name"},
+        ]
+        without_anchor = find_entities_on_page(blocks, prepare_entities(objects_to_find), fuzzymatch_line_thr=75)
+        self.assertEqual(
+            [entity["Text"] for entity in without_anchor],
+            ["9,762.71", "9,762.17", "JANE DOE"],
+        )
+        for kwargs in [{}, {"engine": "matrix"}, {"engine": "matrix", "prune_candidates": False},
+                       {"exact_match_first": True}]:
+            found_entities = find_entities_on_page(
+                blocks, prepare_entities(objects_to_find), fuzzymatch_line_thr=75, spatial_matching=True, **kwargs)
+            self.assertEqual([entity["Text"] for entity in found_entities], ["9,762.71", "JANE DOE"])
+
+    def test_spatial_matching_without_anchor_on_page(self):
+        blocks = load_blocks('bank_stmt_0_1_blocks.json')
+        objects_to_find = [{"expected_texts": ["9,762.71"], "entity_type": "savings_amount", "anchor_label": "IBAN"}]
+        self.assertEqual(find_entities_on_page(blocks, prepare_entities(objects_to_find), spatial_matching=True), [])
+
+    def test_entity_wrapped_over_lines(self):
+        blocks = load_blocks('bank_stmt_0_1_blocks.json')
+        objects_to_find = [{"expected_texts": ["123 Any Street, Apartment 4B Anytown, WA 98101"], "entity_type": "address"}]
+        self.assertEqual([entity["Text"] for entity in find_entities_on_page(blocks, prepare_entities(objects_to_find))],
+                         ["123 Any Street, Apartment 4B", "Anytown, WA 98101"])
+        for kwargs in [{}, {"engine": "matrix", "prune_candidates": False}]:
+            found_entities = find_entities_on_page(blocks, prepare_entities(objects_to_find), window_lines=3, **kwargs)
+            self.assertEqual([entity["Text"] for entity in found_entities], ["123 Any Street, Apartment 4B Anytown, WA 98101"])
+            block_refs = found_entities[0]["BlockReferences"]
+            self.assertEqual([(block_ref["BeginOffset"], block_ref["EndOffset"]) for block_ref in block_refs],
+                             [(0, len("123 Any Street, Apartment 4B")), (0, len("Anytown, WA 98101"))])
+            self.assertEqual([len(block_ref["ChildBlocks"]) for block_ref in block_refs], [5, 3])
+        # single line entities are not affected
+        objects_to_find = load_expected_entities('bank_stmt_0.json')
+        self.assertEqual(find_entities_on_page(blocks, prepare_entities(objects_to_find), window_lines=3),
+                         find_entities_on_page(blocks, prepare_entities(objects_to_find)))
+
+    def test_offsets_follow_line_text(self):
+        words = ["Savings", "balance", "EUR", "9,762.71"]
+        line_text = "Savings  balance   EUR 9,762.71"
+        blocks = [{"BlockType": "LINE", "Id": "line", "Text": line_text,
+                   "Relationships": [{"Type": "CHILD", "Ids": [f"word-{i}" for i in range(len(words))]}]}]
+        blocks += [{"BlockType": "WORD", "Id": f"word-{i}", "Text": word} for i, word in enumerate(words)]
+        entity = find_entities_on_page(blocks, prepare_entities([{"expected_texts": ["9,762.71"]}]))[0]
+        block_ref = entity["BlockReferences"][0]
+        self.assertEqual(line_text[block_ref["BeginOffset"]:block_ref["EndOffset"]], "9,762.71")
+        # the entity spans from its first to its last word
+        entity = find_entities_on_page(blocks, prepare_entities([{"expected_texts": ["Savings 9,762.71"]}]))[0]
+        self.assertEqual(entity["Text"], "Savings 9,762.71")
+        block_ref = entity["BlockReferences"][0]
+        self.assertEqual((block_ref["BeginOffset"], block_ref["EndOffset"]), (0, len(line_text)))
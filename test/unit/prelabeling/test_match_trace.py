@@ -0,0 +1,94 @@
+import json
+from unittest import TestCase
+
+from helpers.match_trace import MatchTrace
+from helpers.prepared_page import PreparedPage, prepare_entities
+from match_entities_to_block import find_entities_on_page, get_word_matches
+from prelabeling_fixtures import load_blocks
+
+
+class MatchTraceTest(TestCase):
+
+    def setUp(self):
+        self.blocks = load_blocks('bank_stmt_0_1_blocks.json')
+        self.objects_to_find = [{"expected_texts": ["JANE DOE"], "entity_type": "customer_name"},
+                                {"expected_texts": ["AnyCompany Bank"], "entity_type": "bank_name"}]
+
+    def find(self, objects_to_find, **kwargs):
+        return find_entities_on_page(self.blocks, prepare_entities(objects_to_find),
+                                     prepared_page=PreparedPage(self.blocks), **kwargs)
+
+    def test_trace_does_not_change_the_entities(self):
+        for options in [{}, {"prune_candidates": False}, {"engine": "matrix"}, {"exact_match_first": True}]:
+            trace = MatchTrace()
+            self.assertEqual(self.find(self.objects_to_find, trace=trace, **options),
+                             self.find(self.objects_to_find, **options))
+            self.assertTrue(trace.entities)
+            # the scratch dicts are dropped once the page is matched
+            self.assertEqual(trace.line_scores, {})
+
+    def test_entity_record(self):
+        trace = MatchTrace()
+        entities = self.find(self.objects_to_find, trace=trace)
+        self.assertEqual([(record["Type"], record["Text"]) for record in trace.entities],
+                         [(entity["Type"], entity["Text"]) for entity in entities])
+        record = trace.entities[0]
+        self.assertEqual(record["path"], "line")
+        line = record["lines"][0]
+        self.assertEqual(line["BlockId"], entities[0]["BlockReferences"][0]["BlockId"])
+        self.assertEqual(line["line_score"], {"score": 100, "expected_text": "jane doe", "scorer": "token_set"})
+        self.assertEqual(line["words"], [{"Text": "JANE", "score": 100, "in_entity": True},
+                                         {"Text": "DOE", "score": 100, "in_entity": True}])
+        self.assertFalse(line["substring_fallback"])
+
+    def test_substring_fallback(self):
+        trace = MatchTrace()
+        # no word can pass the word threshold, the words are kept because they contain the expected text
+        entities = self.find([{"expected_texts": ["JANE"], "entity_type": "customer_name", "fuzzymatch_word_thr": 101}],
+                             trace=trace)
+        self.assertTrue(entities)
+        self.assertTrue(all(line["substring_fallback"] for record in trace.entities for line in record["lines"]))
+
+    def test_counters(self):
+        pruned, unpruned = MatchTrace(), MatchTrace()
+        self.find(self.objects_to_find, trace=pruned)
+        self.find(self.objects_to_find, trace=unpruned, prune_candidates=False)
+        self.assertGreater(pruned.counters["line_pairs_pruned"], 0)
+        self.assertEqual(unpruned.counters["line_pairs_pruned"], 0)
+        self.assertEqual(pruned.counters["line_pairs_scored"] + pruned.counters["line_pairs_pruned"],
+                         unpruned.counters["line_pairs_scored"])
+        self.assertGreater(pruned.counters["word_pairs_scored"], 0)
+        self.assertGreater(unpruned.counters["scorer_seconds"], 0)
+
+        exact = MatchTrace()
+        self.find(self.objects_to_find, trace=exact, exact_match_first=True)
+        self.assertEqual(exact.counters["exact_matches"], len(exact.entities))
+        self.assertEqual({record["path"] for record in exact.entities}, {"exact"})
+
+    def test_word_pairs_counted_when_scored(self):
+        for engine, pairs_scored in [("pairwise", 1 + 2 + 2), ("matrix", 3 * 2)]:
+            trace = MatchTrace()
+            self.assertEqual(get_word_matches(["jane", "doe", "statement"], ["jane", "doe"], 80, engine=engine,
+                                              trace=trace), [True, True, False])
+            # the pairwise scoring of a word stops at the first item it matches
+            self.assertEqual(trace.counters["word_pairs_scored"], pairs_scored)
+
+    def test_to_jsonl(self):
+        trace = MatchTrace()
+        self.find(self.objects_to_find, trace=trace)
+        lines = [json.loads(line) for line in trace.to_jsonl({"Pages": "1", "PageNumber": "1"}).splitlines()]
+        self.assertEqual(lines[0]["DocumentMetadata"], {"Pages": "1", "PageNumber": "1"})
+        self.assertEqual(set(lines[0]["counters"]), {"line_pairs_scored", "line_pairs_pruned", "word_pairs_scored",
+                                                     "exact_matches", "windows", "scorer_seconds"})
+        self.assertEqual(lines[1:], trace.entities)
+
+    def test_window_record(self):
+        lines = [block for block in self.blocks if block["BlockType"] == "LINE"]
+        trace = MatchTrace()
+        self.find([{"expected_texts": [lines[0]["Text"] + " " + lines[1]["Text"]], "entity_type": "header"}],
+                  trace=trace, window_lines=3)
+        windows = [record for record in trace.entities if record["path"] == "window"]
+        self.assertTrue(windows)
+        self.assertEqual(trace.counters["windows"], len(windows))
+        self.assertEqual(windows[0]["window_score"], 100)
+        self.assertEqual([line["BlockId"] for line in windows[0]["lines"]], [lines[0]["Id"], lines[1]["Id"]])
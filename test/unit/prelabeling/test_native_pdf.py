@@ -0,0 +1,134 @@
+import io
+from unittest import TestCase
+
+from PyPDF2 import PdfFileReader
+from helpers.native_pdf import (
+    NATIVE_PDF,
+    SCANNED_PDF,
+    blocks_from_native_pdf,
+    iter_pdf_pages,
+    pdf_file_reader,
+    pdf_page_bytes,
+    pdf_page_types,
+)
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+
+
+def text_page(lines):
+    # content stream writing every line with Helvetica, 20 points below the previous one
+    operations = []
+    for line_number, line in enumerate(lines):
+        operations.append(f"BT /F1 12 Tf 72 {700 - 20 * line_number} Td ({line}) Tj ET")
+    return "\n".join(operations)
+
+
+def scanned_page():
+    # content stream drawing an image over the whole page
+    return f"q {PAGE_WIDTH} 0 0 {PAGE_HEIGHT} 0 0 cm /Im1 Do Q"
+
+
+def build_pdf(contents):
+    """Return the bytes of a PDF with a page for every content stream."""
+    number_pages = len(contents)
+    font_id = 3 + 2 * number_pages
+    image_id = font_id + 1
+    objects = {
+        1: "<< /Type /Catalog /Pages 2 0 R >>",
+        2: "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join(f"{3 + 2 * page_index} 0 R" for page_index in range(number_pages)), number_pages),
+        font_id: "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        image_id: "<< /Type /XObject /Subtype /Image /Width 1 /Height 1 /ColorSpace /DeviceGray "
+                  "/BitsPerComponent 8 /Length 1 >>\nstream\n\x80\nendstream",
+    }
+    for page_index, content in enumerate(contents):
+        page_id = 3 + 2 * page_index
+        objects[page_id] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                            f"/Resources << /Font << /F1 {font_id} 0 R >> /XObject << /Im1 {image_id} 0 R >> >> "
+                            f"/Contents {page_id + 1} 0 R >>")
+        objects[page_id + 1] = f"<< /Length {len(content)} >>\nstream\n{content}\nendstream"
+    pdf = io.BytesIO()
+    pdf.write(b"%PDF-1.4\n")
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = pdf.tell()
+        pdf.write(f"{object_id} 0 obj\n{objects[object_id]}\nendobj\n".encode("latin-1"))
+    xref_offset = pdf.tell()
+    pdf.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1"))
+    for object_id in sorted(objects):
+        pdf.write(f"{offsets[object_id]:010d} 00000 n \n".encode("latin-1"))
+    pdf.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n"
+              .encode("latin-1"))
+    return pdf.getvalue()
+
+
+class FakePdfPage(object):
+    """pdfplumber page with a text layer made of whitespace only."""
+
+    def extract_text(self):
+        return " \n "
+
+    def extract_words(self):
+        return []
+
+
+class NativePdfTest(TestCase):
+
+    def setUp(self):
+        self.lines = ["AnyCompany Bank", "Statement of JANE DOE"]
+        self.document = build_pdf([text_page(self.lines), scanned_page(), text_page(["Total 42.00"]), ""])
+
+    def test_page_types(self):
+        # a page without text layer is detected like a scanned page
+        self.assertEqual(pdf_page_types(self.document), [NATIVE_PDF, SCANNED_PDF, NATIVE_PDF, SCANNED_PDF])
+
+    def test_blocks_from_text_layer(self):
+        blocks = list(iter_pdf_pages(build_pdf([text_page(self.lines)]), [NATIVE_PDF], None))[0]
+        lines = [block for block in blocks if block["BlockType"] == "LINE"]
+        self.assertEqual([line["Text"] for line in lines], self.lines)
+        blocks_by_id = {block["Id"]: block for block in blocks}
+        self.assertEqual(len(blocks_by_id), len(blocks))
+        for line in lines:
+            words = [blocks_by_id[child_id] for child_id in line["Relationships"][0]["Ids"]]
+            self.assertEqual(" ".join(word["Text"] for word in words), line["Text"])
+            self.assertTrue(all(word["BlockType"] == "WORD" and word["Page"] == 1 for word in words))
+            # the line covers its words
+            line_box = line["Geometry"]["BoundingBox"]
+            for word in words:
+                box = word["Geometry"]["BoundingBox"]
+                self.assertLessEqual(line_box["Left"], box["Left"])
+                self.assertLessEqual(box["Left"] + box["Width"], line_box["Left"] + line_box["Width"] + 1e-9)
+                self.assertTrue(all(0 <= value <= 1 for value in box.values()))
+        # the first line is above the second one, Top is measured from the top of the page
+        self.assertLess(lines[0]["Geometry"]["BoundingBox"]["Top"], lines[1]["Geometry"]["BoundingBox"]["Top"])
+
+    def test_ids_are_deterministic(self):
+        document = build_pdf([text_page(self.lines)])
+        self.assertEqual(list(iter_pdf_pages(document, [NATIVE_PDF], None)),
+                         list(iter_pdf_pages(document, [NATIVE_PDF], None)))
+
+    def test_textract_only_for_scanned_pages(self):
+        detected = []
+
+        def detect_scanned_page(page_number):
+            detected.append(page_number)
+            return [{"BlockType": "LINE", "Id": f"textract-{page_number}", "Text": "scanned"}]
+
+        pages = list(iter_pdf_pages(self.document, pdf_page_types(self.document), detect_scanned_page))
+        self.assertEqual(detected, [2, 4])
+        self.assertEqual(len(pages), 4)
+        self.assertEqual(pages[1], [{"BlockType": "LINE", "Id": "textract-2", "Text": "scanned"}])
+        self.assertEqual(pages[2][0]["Text"], "Total 42.00")
+
+    def test_page_bytes(self):
+        pdf_reader = pdf_file_reader(self.document)
+        page = pdf_page_bytes(pdf_reader, 3)
+        self.assertEqual(pdf_page_bytes(pdf_reader, 2), pdf_page_bytes(pdf_file_reader(self.document), 2))
+        self.assertEqual(PdfFileReader(io.BytesIO(page)).getNumPages(), 1)
+        self.assertEqual(pdf_page_types(page), [NATIVE_PDF])
+        self.assertEqual(list(iter_pdf_pages(page, [NATIVE_PDF], None))[0][0]["Text"], "Total 42.00")
+
+    def test_page_without_text(self):
+        self.assertEqual(blocks_from_native_pdf(FakePdfPage(), 1, PAGE_WIDTH, PAGE_HEIGHT), [])
+
@@ -0,0 +1,36 @@
+from unittest import TestCase
+
+from helpers.page_blocks import iter_page_blocks
+from prelabeling_fixtures import load_blocks
+
+
+class PageBlocksTest(TestCase):
+
+    def setUp(self):
+        # a three pages document made of the sample pages
+        self.blocks = []
+        for page_number, filename in enumerate(['bank_stmt_0_1_blocks.json', 'file2_1_blocks.json',
+                                                'scanned_1_blocks.json'], start=1):
+            self.blocks += [dict(block, Page=page_number) for block in load_blocks(filename)]
+        self.expected_pages = [[block for block in self.blocks if block["Page"] == page_num] for page_num in (1, 2, 3)]
+
+    def test_iter_page_blocks(self):
+        # result pages of an asynchronous job hold up to 1000 blocks and can end in the middle of a page
+        batches = [self.blocks[start:start + 1000] for start in range(0, len(self.blocks), 1000)]
+        self.assertEqual(list(iter_page_blocks(batches)), list(enumerate(self.expected_pages, start=1)))
+        self.assertEqual(list(iter_page_blocks([])), [])
+
+    def test_pages_are_yielded_when_complete(self):
+        first_page = self.expected_pages[0]
+
+        def batches():
+            yield first_page
+            yield self.expected_pages[1][:1]
+            raise AssertionError("the first page should be yielded before the third result page is read")
+
+        pages = iter_page_blocks(batches())
+        self.assertEqual(next(pages), (1, first_page))
+
+    def test_blocks_out_of_page_order(self):
+        with self.assertRaisesRegex(ValueError, "not in page order"):
+            list(iter_page_blocks([self.expected_pages[1], self.expected_pages[0]]))
@@ -0,0 +1,55 @@
+import os
+from functools import partial
+from unittest import TestCase
+from unittest.mock import patch
+
+from helpers import page_pool
+from helpers.page_pool import available_cpus, imap_pages, map_pages
+
+
+def page_signature(blocks, prefix=""):
+    return [prefix + block["Id"] for block in blocks], os.getpid()
+
+
+class PagePoolTest(TestCase):
+
+    def setUp(self):
+        self.pages = [[{"Id": f"{page}-{block}"} for block in range(page % 3)] for page in range(12)]
+
+    def test_results_in_page_order(self):
+        results = map_pages(partial(page_signature, prefix="p"), self.pages, max_workers=3)
+        self.assertEqual([ids for ids, _ in results], [["p" + block["Id"] for block in page] for page in self.pages])
+        if page_pool.shared_memory_available():
+            self.assertNotIn(os.getpid(), {pid for _, pid in results})
+
+    def test_single_process_without_shared_memory(self):
+        with patch.object(page_pool, "SHARED_MEMORY_PATH", "/nonexistent/shm"):
+            results = map_pages(page_signature, self.pages, max_workers=4)
+        self.assertEqual({pid for _, pid in results}, {os.getpid()})
+        self.assertEqual([ids for ids, _ in results], [[block["Id"] for block in page] for page in self.pages])
+
+    def test_single_worker(self):
+        results = map_pages(page_signature, self.pages, max_workers=1)
+        self.assertEqual({pid for _, pid in results}, {os.getpid()})
+        self.assertEqual(map_pages(page_signature, [], max_workers=4), [])
+        self.assertGreaterEqual(available_cpus(), 1)
+
+    def test_pages_read_lazily(self):
+        read = []
+
+        def pages():
+            for page in self.pages:
+                read.append(len(read))
+                yield page
+
+        results = imap_pages(page_signature, pages(), max_workers=2, max_pending=3)
+        page, (ids, _) = next(results)
+        self.assertEqual((page, ids), (self.pages[0], []))
+        # only the pages submitted ahead have been read
+        self.assertEqual(len(read), 3 if page_pool.shared_memory_available() else 1)
+        self.assertEqual([page for page, _ in results], self.pages[1:])
+        self.assertEqual(len(read), len(self.pages))
+
+        sequential = imap_pages(page_signature, pages(), max_workers=1)
+        next(sequential)
+        self.assertEqual(len(read), len(self.pages) + 1)
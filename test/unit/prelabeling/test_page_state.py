@@ -0,0 +1,91 @@
+import pickle
+import zlib
+from unittest import TestCase
+
+from helpers.page_state import (
+    PAGE_STATE_VERSION,
+    check_execution_id,
+    dump_page_state,
+    fetch_document_state,
+    join_page_states,
+    load_document_state,
+    page_state_file,
+    prepare_page_state,
+    store_page_states,
+)
+from helpers.prepared_page import prepare_entities
+from match_entities_to_block import find_entities_on_page
+from prelabeling_fixtures import FakeS3Helper, load_blocks
+
+
+class PageStateTest(TestCase):
+
+    def setUp(self):
+        self.pages = [load_blocks('sample_file1_1_blocks.json'), load_blocks('bank_stmt_0_1_blocks.json')]
+        self.prepared_entities = prepare_entities([
+            {"expected_texts": ["Arena Pharmaceuticals, Inc."], "entity_type": "company"},
+            {"expected_texts": ["AnyCompany Bank"], "entity_type": "bank_name"},
+            {"expected_texts": ["JANE DOE"], "entity_type": "customer_name"},
+        ])
+
+    def test_rematch_from_stored_state(self):
+        s3_helper = FakeS3Helper()
+        s3_uri = "s3://bucket/prelabeling/id/page-state/" + page_state_file("pdf/bank_stmt_0.pdf")
+        self.assertTrue(s3_uri.endswith("/bank_stmt_0_state.pkl"))
+        store_page_states([dump_page_state(prepare_page_state(blocks)) for blocks in self.pages], s3_uri, s3_helper)
+
+        prepared_pages = fetch_document_state(s3_uri, s3_helper)[0]
+        self.assertEqual([prepared_page.blocks for prepared_page in prepared_pages], self.pages)
+        # the indexes come with the state, the matching does not rebuild them
+        self.assertIsNotNone(prepared_pages[0]._gram_index)
+        self.assertIsNotNone(prepared_pages[0]._line_grid)
+        for fuzzymatch_line_thr, fuzzymatch_word_thr in [(90, 60), (75, 50)]:
+            for blocks, prepared_page in zip(self.pages, prepared_pages):
+                self.assertEqual(
+                    find_entities_on_page(prepared_page.blocks, self.prepared_entities, prepared_page=prepared_page,
+                                          fuzzymatch_line_thr=fuzzymatch_line_thr, fuzzymatch_word_thr=fuzzymatch_word_thr,
+                                          prune_candidates=True, window_lines=3),
+                    find_entities_on_page(blocks, self.prepared_entities,
+                                          fuzzymatch_line_thr=fuzzymatch_line_thr, fuzzymatch_word_thr=fuzzymatch_word_thr,
+                                          prune_candidates=True, window_lines=3),
+                )
+
+    def test_document_types_stored_with_the_pages(self):
+        s3_helper = FakeS3Helper()
+        s3_uri = "s3://bucket/prelabeling/id/page-state/" + page_state_file("pdf/mixed.pdf")
+        page_states = [dump_page_state(prepare_page_state(blocks)) for blocks in self.pages]
+        store_page_states(page_states, s3_uri, s3_helper, document_types=["NativePDF", "ScannedPDF"])
+        prepared_pages, document_types = fetch_document_state(s3_uri, s3_helper)
+        self.assertEqual(document_types, ["NativePDF", "ScannedPDF"])
+        self.assertEqual([prepared_page.blocks for prepared_page in prepared_pages], self.pages)
+        # states written without the types are still read, their pages are then taken as scanned
+        store_page_states(page_states, s3_uri, s3_helper)
+        self.assertIsNone(fetch_document_state(s3_uri, s3_helper)[1])
+
+    def test_execution_id(self):
+        self.assertEqual(check_execution_id("invoices-2024-03-01-09-30-a1b2"), "invoices-2024-03-01-09-30-a1b2")
+        # the id names the prefix the states are unpickled from
+        for execution_id in ["../other-2024-03-01-09-30-a1b2", "invoices-2024-03-01-09-30-a1b2/../x", "invoices",
+                             "", None, 42]:
+            with self.assertRaisesRegex(ValueError, "Invalid rematch_execution_id"):
+                check_execution_id(execution_id)
+
+    def test_missing_state(self):
+        with self.assertRaisesRegex(ValueError, "without rematch"):
+            fetch_document_state("s3://bucket/prelabeling/id/page-state/missing_state.pkl", FakeS3Helper())
+
+    def test_state_of_other_version(self):
+        content = join_page_states([dump_page_state(prepare_page_state(self.pages[0]))])
+        self.assertEqual(len(load_document_state(content)[0]), 1)
+        header = pickle.loads(content)
+        self.assertEqual(header, {"version": PAGE_STATE_VERSION, "pages": 1, "document_types": None})
+        header["version"] = 0
+        with self.assertRaisesRegex(ValueError, "version 0"):
+            load_document_state(pickle.dumps(header))
+
+    def test_pages_dumped_one_at_a_time(self):
+        page_states = [dump_page_state(prepare_page_state(blocks)) for blocks in self.pages]
+        prepared_pages = load_document_state(join_page_states(page_states))[0]
+        self.assertEqual([prepared_page.blocks for prepared_page in prepared_pages], self.pages)
+        # every page is compressed on its own
+        self.assertEqual(pickle.loads(zlib.decompress(page_states[1])).blocks, self.pages[1])
@@ -0,0 +1,69 @@
+import json
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import boto3
+from helpers.compact_blocks import CompactBlock
+from helpers.page_state import dump_page_state, fetch_document_state, prepare_page_state, store_page_states
+from prelabeling_fixtures import FakeS3Helper, load_blocks
+from test_native_pdf import build_pdf, text_page
+
+# the tool kit reads the account id with STS when it is imported
+with patch.object(boto3.Session, "client", return_value=MagicMock()):
+    import pre_label_tool_kit
+
+
+class GenerateAnnotationsFullFileTest(TestCase):
+
+    def setUp(self):
+        self.s3_helper = FakeS3Helper()
+        self.objects_to_find = [{"expected_texts": ["AnyCompany Bank"], "entity_type": "bank_name"},
+                                {"expected_texts": ["JANE DOE"], "entity_type": "customer_name"}]
+        self.state_uri = "s3://out/state/doc_state.pkl"
+        patcher = patch.object(pre_label_tool_kit, "S3Helper", return_value=self.s3_helper)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def generate(self, rematch, parallel_pages=False):
+        return pre_label_tool_kit.generate_annotations_full_file(
+            self.objects_to_find, "pdf/doc.pdf", Data_Bucket="data", ann_Bucket="out", ann_Folder="ann/",
+            state_Folder="state/", rematch=rematch, parallel_pages=parallel_pages, max_workers=2, trace=False)
+
+    def annotation_file(self, page_number):
+        return json.loads(self.s3_helper.objects[f"s3://out/ann/doc_page_{page_number}_ann.json"])
+
+    def test_native_document_then_rematch(self):
+        self.s3_helper.objects["s3://data/pdf/doc.pdf"] = build_pdf([text_page(["AnyCompany Bank",
+                                                                                "Statement of JANE DOE"])])
+        found_entities = self.generate(rematch=False)[0]
+        self.assertEqual(sorted(entity["Text"] for entity in found_entities[0]), ["AnyCompany Bank", "JANE DOE"])
+        self.assertEqual(self.annotation_file(1)["DocumentType"], "NativePDF")
+        # the pages are matched and stored in compact form
+        prepared_pages, document_types = fetch_document_state(self.state_uri, self.s3_helper)
+        self.assertEqual(document_types, ["NativePDF"])
+        self.assertTrue(all(isinstance(block, CompactBlock) for block in prepared_pages[0].blocks))
+
+        del self.s3_helper.objects["s3://out/ann/doc_page_1_ann.json"]
+        self.assertEqual(self.generate(rematch=True)[0], found_entities)
+        self.assertEqual(self.annotation_file(1)["DocumentType"], "NativePDF")
+
+    def test_rematch_of_a_state_without_document_types(self):
+        pages = [load_blocks('bank_stmt_0_1_blocks.json'), load_blocks('scanned_1_blocks.json')]
+        store_page_states([dump_page_state(prepare_page_state(blocks)) for blocks in pages], self.state_uri,
+                          self.s3_helper)
+        found_entities = self.generate(rematch=True)[0]
+        self.assertEqual(len(found_entities), 2)
+        self.assertIn("AnyCompany Bank", [entity["Text"] for entity in found_entities[0]])
+        self.assertEqual([self.annotation_file(page_number)["DocumentType"] for page_number in (1, 2)],
+                         ["ScannedPDF", "ScannedPDF"])
+
+    def test_parallel_pages_like_sequential(self):
+        self.s3_helper.objects["s3://data/pdf/doc.pdf"] = build_pdf([text_page(["AnyCompany Bank"]),
+                                                                    text_page(["Statement of JANE DOE"]),
+                                                                    text_page(["AnyCompany Bank", "JANE DOE"])])
+        document = dict(self.s3_helper.objects)
+        sequential = self.generate(rematch=False)
+        sequential_files = self.s3_helper.objects
+        self.s3_helper.objects = document
+        self.assertEqual(self.generate(rematch=False, parallel_pages=True), sequential)
+        self.assertEqual(self.s3_helper.objects, sequential_files)
@@ -0,0 +1,52 @@
+from unittest import TestCase
+
+from helpers.prepared_page import PreparedEntity, PreparedPage, prepare_entities
+from match_entities_to_block import find_text_Item_on_page
+from prelabeling_fixtures import load_blocks
+
+
+class PreparedPageTest(TestCase):
+
+    def test_prepared_page_cleans_lines_and_words(self):
+        blocks = [
+            {"BlockType": "PAGE", "Id": "p"},
+            {"BlockType": "LINE", "Id": "l", "Text": "Größe Übersicht"},
+            {"BlockType": "WORD", "Id": "w", "Text": "Größe"},
+        ]
+        prepared_page = PreparedPage(blocks)
+        self.assertEqual(prepared_page.cleaned_texts, {"l": "grosse ubersicht", "w": "grosse"})
+        self.assertEqual(prepared_page.cleaned_text({"Id": "x", "Text": "Öl"}), "ol")
+
+    def test_word_offsets(self):
+        blocks = [
+            {"BlockType": "LINE", "Id": "l1", "Text": "Savings  balance", "Relationships": [{"Type": "CHILD", "Ids": ["w1", "w2"]}]},
+            {"BlockType": "LINE", "Id": "l2", "Text": "9,762.71", "Relationships": [{"Type": "CHILD", "Ids": ["w3"]}]},
+            {"BlockType": "WORD", "Id": "w1", "Text": "Savings"},
+            {"BlockType": "WORD", "Id": "w2", "Text": "balance"},
+            {"BlockType": "WORD", "Id": "w3", "Text": "9.762,71"},
+        ]
+        prepared_page = PreparedPage(blocks)
+        self.assertEqual(prepared_page.word_offsets, {"l1": [(0, 7), (9, 16)], "l2": None})
+
+    def test_prepare_entities(self):
+        prepared_entities = prepare_entities([
+            {"expected_texts": ["AnyCompany Bank"], "entity_type": "bank_name"},
+            {"expected_texts": ["JANE DOE", "J. DOE"], "ignore_list": ["J."]},
+        ])
+        self.assertEqual(prepared_entities[0].entity_type, "bank_name")
+        self.assertEqual(prepared_entities[0].cleaned_expected_texts, ["anycompany bank"])
+        self.assertEqual(prepared_entities[1].entity_type, "UNASSIGNED")
+        self.assertEqual(prepared_entities[1].ignore_list, ["J."])
+        self.assertEqual(prepared_entities[1].single_items, ["JANE", "DOE", "J.", "DOE"])
+        self.assertEqual(prepared_entities[1].cleaned_single_items, ["jane", "doe", "j.", "doe"])
+
+    def test_shared_prepared_page_gives_same_entities(self):
+        blocks = load_blocks('sample_file1_1_blocks.json')
+        prepared_page = PreparedPage(blocks)
+        for expected_texts in [["Arena Pharmaceuticals, Inc."], ["March 8, 2012", "November 8, 2011"], ["Common Stock"]]:
+            prepared_entity = PreparedEntity(expected_texts, entity_type="test")
+            self.assertEqual(
+                find_text_Item_on_page(blocks, expected_texts, "test", prepared_page=prepared_page, prepared_entity=prepared_entity),
+                find_text_Item_on_page(blocks, expected_texts, "test"),
+            )
+            self.assertNotEqual(find_text_Item_on_page(blocks, expected_texts, "test"), [])
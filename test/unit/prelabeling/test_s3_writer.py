@@ -0,0 +1,79 @@
+import json
+import threading
+import time
+from unittest import TestCase
+
+from helpers.s3_writer import S3Writer
+
+
+class SlowS3Helper(object):
+
+    def __init__(self, failing_paths=()):
+        self.objects = {}
+        self.failing_paths = set(failing_paths)
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def write_content(self, s3_path, content):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.01)
+        with self.lock:
+            self.running -= 1
+        if s3_path in self.failing_paths:
+            raise RuntimeError("Access Denied")
+        self.objects[s3_path] = content
+
+    @staticmethod
+    def s3_uri_from_bucket_key(Bucket, key):
+        return "s3://{}/{}".format(Bucket, key)
+
+
+class S3WriterTest(TestCase):
+
+    def setUp(self):
+        self.paths = ["s3://bucket/ann/doc_page_{}_ann.json".format(page) for page in range(1, 31)]
+
+    def test_concurrent_writes(self):
+        s3_helper = SlowS3Helper()
+        with S3Writer(s3_helper, max_workers=4) as s3_writer:
+            uris = [s3_writer.write_json_dict(path, {"Page": page}) for page, path in enumerate(self.paths, start=1)]
+            # the uri helpers of the wrapped S3Helper are available
+            self.assertEqual(s3_writer.s3_uri_from_bucket_key("bucket", "key"), "s3://bucket/key")
+        self.assertEqual(uris, self.paths)
+        self.assertEqual(s3_writer.written, len(self.paths))
+        self.assertEqual(s3_helper.objects[self.paths[2]], json.dumps({"Page": 3}))
+        self.assertGreater(s3_helper.max_running, 1)
+        self.assertLessEqual(s3_helper.max_running, 4)
+
+    def test_pending_writes_are_bounded(self):
+        s3_helper = SlowS3Helper()
+        s3_writer = S3Writer(s3_helper, max_workers=2, max_pending=3)
+        for path in self.paths[:10]:
+            s3_writer.write_content(path, b"{}")
+            self.assertLessEqual(len(s3_writer.pending), 3)
+        s3_writer.close()
+        self.assertEqual(len(s3_helper.objects), 10)
+
+    def test_errors_per_key(self):
+        s3_helper = SlowS3Helper(failing_paths=self.paths[3:5])
+        s3_writer = S3Writer(s3_helper, max_workers=4)
+        for path in self.paths:
+            s3_writer.write_content(path, b"{}")
+        with self.assertRaisesRegex(ValueError, "2 S3 writes failed: .*page_4_ann.json, .*page_5_ann.json"):
+            s3_writer.close()
+        self.assertEqual(set(s3_writer.errors), set(self.paths[3:5]))
+        self.assertIsInstance(s3_writer.errors[self.paths[3]], RuntimeError)
+        self.assertEqual(s3_writer.written, len(self.paths) - 2)
+
+    def test_exception_is_not_hidden(self):
+        s3_helper = SlowS3Helper(failing_paths=self.paths[:1])
+        with self.assertRaisesRegex(KeyError, "matching failed"):
+            with S3Writer(s3_helper) as s3_writer:
+                s3_writer.write_content(self.paths[0], b"{}")
+                s3_writer.write_content(self.paths[1], b"{}")
+                raise KeyError("matching failed")
+        # the writes already submitted are done
+        self.assertEqual(list(s3_helper.objects), self.paths[1:2])
@@ -0,0 +1,54 @@
+from unittest import TestCase
+
+from fuzzywuzzy import fuzz
+from helpers.score_memo import ScoreMemo
+
+
+class CountingScorer(object):
+
+    def __init__(self, scorer):
+        self.scorer = scorer
+        self.calls = 0
+
+    def __call__(self, text_a, text_b):
+        self.calls += 1
+        return self.scorer(text_a, text_b)
+
+
+class ScoreMemoTest(TestCase):
+
+    def test_hits_and_misses(self):
+        memo = ScoreMemo(maxsize=10)
+        scorer = CountingScorer(fuzz.token_set_ratio)
+        for _ in range(3):
+            self.assertEqual(memo.score(scorer, "anycompany bank", "anycompany bank ag"),
+                             fuzz.token_set_ratio("anycompany bank", "anycompany bank ag"))
+        self.assertEqual(scorer.calls, 1)
+        self.assertEqual(memo.stats(), {"hits": 2, "misses": 1, "size": 1, "maxsize": 10})
+        # the key contains the scorer and the order of the texts
+        memo.score(fuzz.ratio, "anycompany bank", "anycompany bank ag")
+        memo.score(scorer, "anycompany bank ag", "anycompany bank")
+        self.assertEqual(memo.misses, 3)
+
+    def test_least_recently_used_eviction(self):
+        memo = ScoreMemo(maxsize=2)
+        scorer = CountingScorer(fuzz.ratio)
+        memo.score(scorer, "a", "b")
+        memo.score(scorer, "c", "d")
+        memo.score(scorer, "a", "b")
+        memo.score(scorer, "e", "f")  # evicts ("c", "d")
+        self.assertEqual(scorer.calls, 3)
+        memo.score(scorer, "a", "b")
+        memo.score(scorer, "c", "d")
+        self.assertEqual(scorer.calls, 4)
+        memo.resize(1)
+        self.assertEqual(list(memo.scores), [(scorer, "c", "d")])
+        memo.clear()
+        self.assertEqual(memo.stats(), {"hits": 0, "misses": 0, "size": 0, "maxsize": 1})
+
+    def test_disabled(self):
+        memo = ScoreMemo(maxsize=0)
+        scorer = CountingScorer(fuzz.ratio)
+        memo.score(scorer, "a", "b")
+        memo.score(scorer, "a", "b")
+        self.assertEqual((scorer.calls, len(memo.scores)), (2, 0))
@@ -0,0 +1,67 @@
+import pickle
+from unittest import TestCase
+
+from helpers.prepared_page import PreparedPage, prepare_entities
+from helpers.scorers import digit_runs, digits_line_ratio, digits_word_ratio, get_scorer
+from match_entities_to_block import find_entities_on_page
+from prelabeling_fixtures import load_blocks
+
+
+class ScorersTest(TestCase):
+
+    def setUp(self):
+        self.blocks = load_blocks('bank_stmt_0_1_blocks.json')
+        self.prepared_page = PreparedPage(self.blocks)
+
+    def find(self, objects_to_find, **kwargs):
+        return find_entities_on_page(self.blocks, prepare_entities(objects_to_find), prepared_page=self.prepared_page,
+                                     **kwargs)
+
+    def test_digit_scorers(self):
+        self.assertEqual(digit_runs("ref 0038-8425 7406, $19,102.60"), ["003884257406", "1910260"])
+        self.assertEqual(digits_line_ratio("0038 8425 7406", "003884257406"), 100)
+        self.assertEqual(digits_line_ratio("0038 8425 7406", "reference 003884257408"), 0)
+        self.assertEqual(digits_line_ratio("no digits", "no digits"), 0)
+        self.assertEqual(digits_word_ratio("8425", "0038 8425 7406"), 100)
+        self.assertEqual(digits_word_ratio("account", "0038 8425 7406"), 0)
+        self.assertEqual(digits_word_ratio("0038-8425", "0038-8425-7406"), 100)
+        self.assertEqual(digits_word_ratio("19,102.60", "19,102.60"), 100)
+        # short numbers of the page and parts of a group do not match a long number
+        for word in ["0", "20", "842", "38-84"]:
+            self.assertEqual(digits_word_ratio(word, "0038-8425-7406"), 0)
+        self.assertEqual(digits_word_ratio("7", "7"), 100)
+
+    def test_numbers_matched_by_their_digits(self):
+        entities = self.find([
+            {"expected_texts": ["0038 8425 7406"], "entity_type": "checking_number", "scorer": "digits"},
+            {"expected_texts": ["9.762,71"], "entity_type": "savings_amount", "scorer": "digits"},
+        ])
+        self.assertEqual([(entity["Type"], entity["Text"]) for entity in entities],
+                         [("checking_number", "003884257406"), ("savings_amount", "9,762.71")])
+        # the formatted account number is too far from the line for the default scorer
+        self.assertEqual(self.find([{"expected_texts": ["0038 8425 7406"], "entity_type": "checking_number"}]), [])
+
+    def test_thresholds_per_object(self):
+        objects_to_find = [{"expected_texts": ["JANE DOE"], "entity_type": "customer_name"},
+                           {"expected_texts": ["AnyCompany Bank"], "entity_type": "bank_name"}]
+        default_entities = self.find(objects_to_find)
+        self.assertIn("customer_name", [entity["Type"] for entity in default_entities])
+        objects_to_find[0]["fuzzymatch_line_thr"] = 100
+        objects_to_find[0]["fuzzymatch_word_thr"] = 100
+        for engine in ["pairwise", "matrix"]:
+            for prune_candidates in [True, False]:
+                entities = self.find(objects_to_find, engine=engine, prune_candidates=prune_candidates)
+                self.assertEqual(entities, [entity for entity in default_entities if entity["Type"] == "bank_name"])
+
+    def test_cheapest_scorer_first(self):
+        prepared_entity = prepare_entities([{"expected_texts": ["19,102.60"], "scorer": ["partial_ratio", "exact", "digits"]}])[0]
+        self.assertEqual([scorer.name for scorer in prepared_entity.scorers], ["exact", "digits", "partial_ratio"])
+        self.assertFalse(prepared_entity.token_set_lines)
+        entities = find_entities_on_page(self.blocks, [prepared_entity], prepared_page=self.prepared_page, window_lines=3)
+        self.assertEqual([entity["Text"] for entity in entities], ["19,102.60"])
+
+    def test_registry(self):
+        self.assertTrue(get_scorer(None).token_set_lines)
+        self.assertIs(pickle.loads(pickle.dumps(get_scorer("jaro_winkler"))), get_scorer("jaro_winkler"))
+        with self.assertRaisesRegex(ValueError, "Unknown scorer"):
+            prepare_entities([{"expected_texts": ["JANE DOE"], "scorer": "soundex"}])
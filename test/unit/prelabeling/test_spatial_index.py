@@ -0,0 +1,27 @@
+import random
+from unittest import TestCase
+
+from helpers.spatial_index import SpatialGridIndex, bounding_box, boxes_intersect, expand_box
+
+
+def box_block(left, top, width, height):
+    return {"BlockType": "LINE", "Geometry": {"BoundingBox": {"Left": left, "Top": top, "Width": width, "Height": height}}}
+
+
+class SpatialGridIndexTest(TestCase):
+
+    def test_query_same_as_scan(self):
+        rng = random.Random(3)
+        blocks = [box_block(rng.uniform(-0.01, 0.9), rng.uniform(-0.01, 0.95), rng.uniform(0, 0.3), rng.uniform(0, 0.05))
+                  for _ in range(300)]
+        blocks.append({"BlockType": "LINE"})  # blocks without geometry are never returned
+        grid = SpatialGridIndex(blocks, grid_size=7)
+        for _ in range(200):
+            box = expand_box(bounding_box(rng.choice(blocks[:-1])), rng.uniform(0, 0.5), rng.uniform(0, 0.1))
+            expected = [position for position, block in enumerate(blocks[:-1])
+                        if boxes_intersect(bounding_box(block), box)]
+            self.assertEqual(grid.query(box), expected)
+
+    def test_bounding_box(self):
+        self.assertEqual(bounding_box(box_block(0.25, 0.5, 0.25, 0.125)), (0.25, 0.5, 0.5, 0.625))
+        self.assertIsNone(bounding_box({"BlockType": "WORD"}))
@@ -0,0 +1,140 @@
+import gzip
+import json
+import tempfile
+from unittest import TestCase
+
+from helpers.textract_cache import (
+    TEXTRACT_CACHE_VERSION,
+    LocalCacheBackend,
+    S3CacheBackend,
+    TextractCache,
+    textract_cache_key,
+)
+from prelabeling_fixtures import FakeS3Helper, load_blocks
+
+
+class FakeTextract(object):
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return len(self.pages), iter(self.pages)
+
+
+class TextractCacheTest(TestCase):
+
+    def setUp(self):
+        self.pages = [load_blocks('bank_stmt_0_1_blocks.json'), load_blocks('file2_1_blocks.json')]
+        self.document = b"%PDF-1.4 bank statement"
+        self.directory = tempfile.TemporaryDirectory()
+        self.now = 1000.0
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def cache(self, backend=None, **kwargs):
+        return TextractCache(backend or LocalCacheBackend(self.directory.name), clock=lambda: self.now, **kwargs)
+
+    def fetch(self, cache, textract):
+        number_pages, pages = cache.fetch_pages(self.document, textract)
+        return number_pages, list(pages)
+
+    def test_key(self):
+        key = textract_cache_key(self.document)
+        self.assertEqual(key, textract_cache_key(bytes(self.document)))
+        self.assertNotEqual(key, textract_cache_key(self.document + b" "))
+        self.assertNotEqual(key, textract_cache_key(self.document, api="StartDocumentAnalysis"))
+        self.assertEqual(textract_cache_key(self.document, features=["TABLES", "FORMS"]),
+                         textract_cache_key(self.document, features=["FORMS", "TABLES"]))
+
+    def test_hit_after_miss(self):
+        textract = FakeTextract(self.pages)
+        self.assertEqual(self.fetch(self.cache(), textract), (2, self.pages))
+        # another container reads the entry written by the first one
+        cache = self.cache()
+        self.assertEqual(self.fetch(cache, textract), (2, self.pages))
+        self.assertEqual(textract.calls, 1)
+        self.assertEqual(dict(cache.metrics), {"hits": 1, "misses": 0, "expired": 0, "writes": 0, "errors": 0})
+
+    def test_entry_written_after_the_last_page(self):
+        textract = FakeTextract(self.pages)
+        cache = self.cache()
+        number_pages, pages = cache.fetch_pages(self.document, textract)
+        self.assertEqual(next(pages), self.pages[0])
+        self.assertIsNone(LocalCacheBackend(self.directory.name).read(textract_cache_key(self.document)))
+        self.assertEqual(list(pages), self.pages[1:])
+        self.assertEqual(cache.metrics["writes"], 1)
+
+    def test_ttl(self):
+        textract = FakeTextract(self.pages)
+        cache = self.cache(ttl_seconds=60)
+        self.fetch(cache, textract)
+        self.now += 61
+        self.fetch(cache, textract)
+        self.assertEqual(textract.calls, 2)
+        self.assertEqual(cache.metrics["expired"], 1)
+        self.assertEqual(cache.metrics["misses"], 2)
+        self.assertEqual(cache.metrics["writes"], 2)
+        # the entry written again is fresh
+        self.fetch(cache, textract)
+        self.assertEqual(cache.metrics["hits"], 1)
+
+    def test_unreadable_entry(self):
+        backend = LocalCacheBackend(self.directory.name)
+        backend.write(textract_cache_key(self.document), b"not gzip")
+        textract = FakeTextract(self.pages)
+        cache = self.cache(backend)
+        self.assertEqual(self.fetch(cache, textract), (2, self.pages))
+        self.assertEqual(cache.metrics["errors"], 1)
+        self.assertEqual(self.fetch(cache, textract), (2, self.pages))
+        self.assertEqual(textract.calls, 1)
+
+    def test_malformed_header(self):
+        backend = LocalCacheBackend(self.directory.name)
+        key = textract_cache_key(self.document)
+        for header in [[], {"version": TEXTRACT_CACHE_VERSION, "pages": 2}, {"version": TEXTRACT_CACHE_VERSION,
+                                                                            "created": "yesterday", "pages": 2}]:
+            backend.write(key, gzip.compress(json.dumps(header).encode("utf-8") + b"\n"))
+            cache = self.cache(backend, ttl_seconds=60)
+            self.assertIsNone(cache.get(key))
+            self.assertEqual(cache.metrics["errors"], 1)
+            self.assertEqual(cache.metrics["misses"], 1)
+            # the entry is evicted, the next run writes a valid one
+            self.assertIsNone(backend.read(key))
+
+    def test_truncated_entry(self):
+        backend = LocalCacheBackend(self.directory.name)
+        key = textract_cache_key(self.document)
+        textract = FakeTextract(self.pages)
+        self.fetch(self.cache(backend), textract)
+        entry = backend.read(key)
+        header = json.dumps({"version": TEXTRACT_CACHE_VERSION, "created": self.now, "pages": 2}).encode("utf-8")
+        # a body cut short, then an entry missing its last page
+        for content in [entry[:len(entry) // 2], gzip.compress(header + b"\n" + json.dumps(self.pages[0]).encode("utf-8")
+                                                                + b"\n")]:
+            backend.write(key, content)
+            cache = self.cache(backend)
+            self.assertIsNone(cache.get(key))
+            self.assertEqual(cache.metrics["errors"], 1)
+            # Textract is called again and all pages are handed over
+            self.assertEqual(self.fetch(cache, textract), (2, self.pages))
+        self.assertEqual(textract.calls, 3)
+
+    def test_s3_backend(self):
+        s3_helper = FakeS3Helper()
+        backend = S3CacheBackend(s3_helper, "bucket", "prelabeling/textract-cache/")
+        textract = FakeTextract(self.pages)
+        cache = self.cache(backend, ttl_seconds=60)
+        self.fetch(cache, textract)
+        self.assertEqual(list(s3_helper.objects),
+                         ["s3://bucket/prelabeling/textract-cache/{}.json.gz".format(textract_cache_key(self.document))])
+        # the blocks are stored compressed
+        self.assertLess(len(next(iter(s3_helper.objects.values()))), len(json.dumps(self.pages)) / 3)
+        self.assertEqual(self.fetch(cache, textract), (2, self.pages))
+        self.assertEqual(textract.calls, 1)
+        self.now += 61
+        self.assertIsNone(cache.get(textract_cache_key(self.document)))
+        self.assertEqual(s3_helper.objects, {})
@@ -0,0 +1,90 @@
+from unittest import TestCase
+
+from helpers.textract_reader import MAX_RESULTS, prefetch, stream_document_pages
+from prelabeling_fixtures import load_blocks
+
+
+class FakeTextractClient(object):
+    """Asynchronous text detection job of a document, in progress on the first status check."""
+
+    def __init__(self, blocks, number_pages, status="SUCCEEDED"):
+        self.blocks = blocks
+        self.number_pages = number_pages
+        self.status = status
+        self.requests = []
+
+    def start_document_text_detection(self, DocumentLocation):
+        self.document_location = DocumentLocation
+        return {"JobId": "job-1"}
+
+    def get_document_text_detection(self, JobId, MaxResults, NextToken=None):
+        self.requests.append(NextToken)
+        if len(self.requests) == 1:
+            return {"JobStatus": "IN_PROGRESS"}
+        if self.status == "FAILED":
+            return {"JobStatus": "FAILED", "StatusMessage": "Unsupported document format"}
+        start = int(NextToken or 0)
+        response = {"JobStatus": self.status, "DocumentMetadata": {"Pages": self.number_pages},
+                    "Blocks": self.blocks[start:start + MaxResults]}
+        if start + MaxResults < len(self.blocks):
+            response["NextToken"] = str(start + MaxResults)
+        return response
+
+
+class TextractReaderTest(TestCase):
+
+    def setUp(self):
+        # a three pages document made of the sample pages, its blocks fill several result pages
+        self.pages = [[dict(block, Page=page_number) for block in load_blocks(filename)]
+                      for page_number, filename in enumerate(['bank_stmt_0_1_blocks.json', 'file2_1_blocks.json',
+                                                              'scanned_1_blocks.json'], start=1)]
+        self.blocks = [block for page_blocks in self.pages for block in page_blocks]
+
+    def test_stream_document_pages(self):
+        for prefetch_results in [False, True]:
+            client = FakeTextractClient(self.blocks, 3)
+            number_pages, pages = stream_document_pages("s3://bucket/pdf/doc.pdf", client, polling_interval=0,
+                                                        prefetch_results=prefetch_results)
+            self.assertEqual(client.document_location, {"S3Object": {"Bucket": "bucket", "Name": "pdf/doc.pdf"}})
+            self.assertEqual(number_pages, 3)
+            self.assertEqual(list(pages), self.pages)
+            # one status check in progress, then one request per result page
+            self.assertEqual(len(client.requests), 1 + -(-len(self.blocks) // MAX_RESULTS))
+
+    def test_pages_handed_over_before_the_last_result_page(self):
+        client = FakeTextractClient(self.blocks, 3)
+        _, pages = stream_document_pages("s3://bucket/pdf/doc.pdf", client, polling_interval=0,
+                                         prefetch_results=False)
+        self.assertEqual(next(pages), self.pages[0])
+        # the first page ends in the first result page, the next block tells that it is complete
+        self.assertEqual(client.requests, [None, None])
+
+    def test_prefetch(self):
+        read = []
+
+        def items():
+            for item in range(5):
+                read.append(item)
+                yield item
+
+        prefetched = prefetch(items())
+        self.assertEqual(next(prefetched), 0)
+        self.assertLessEqual(len(read), 2)
+        self.assertEqual(list(prefetched), [1, 2, 3, 4])
+
+        def failing():
+            yield 0
+            raise RuntimeError("throttled")
+
+        with self.assertRaisesRegex(RuntimeError, "throttled"):
+            list(prefetch(failing()))
+
+    def test_failed_job(self):
+        client = FakeTextractClient(self.blocks, 3, status="FAILED")
+        with self.assertRaisesRegex(ValueError, "Unsupported document format"):
+            stream_document_pages("s3://bucket/pdf/doc.pdf", client, polling_interval=0)
+
+    def test_job_timeout(self):
+        client = FakeTextractClient(self.blocks, 3, status="IN_PROGRESS")
+        with self.assertRaisesRegex(TimeoutError, "still in progress"):
+            stream_document_pages("s3://bucket/pdf/doc.pdf", client, polling_interval=0, timeout=0)
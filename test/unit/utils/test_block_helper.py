@@ -1,5 +1,6 @@
+import json
 from unittest import TestCase
-from utils.block_helper import Block, BoundingBox, Geometry, Point, Relationship, extend_polygon, get_points
+from utils.block_helper import Block, BoundingBox, Geometry, Point, Relationship, extend_polygon, get_annotation_blocks, get_points
 
 
 class BlockHelperTest(TestCase):
@@ -87,3 +88,16 @@ class BlockHelperTest(TestCase):
         block_word.extend_geometry(Geometry(10, 10, 10, 25))
         self.assertEqual(block_word.Geometry.BoundingBox.__dict__, BoundingBox(15, 25, 5, 10).__dict__)
         self.assertListEqual([p.__dict__ for p in block_word.Geometry.Polygon], [p.__dict__ for p in get_points(15, 25, 5, 10)])
+
+    def test_get_annotation_blocks(self):
+        with open('test/unit/resources/sample_blocks/sample_file1_1_blocks.json', 'r') as f:
+            blocks = json.loads(f.read())
+        annotation_blocks = get_annotation_blocks(blocks)
+        self.assertEqual(len(annotation_blocks), len(blocks))
+        self.assertFalse(any('blockIndex' in block or 'parentBlockIndex' in block for block in annotation_blocks))
+        line = annotation_blocks[0]
+        self.assertEqual(line['BlockType'], 'LINE')
+        words = annotation_blocks[1:1 + len(line['Relationships'][0]['Ids'])]
+        self.assertEqual([word['Id'] for word in words], line['Relationships'][0]['Ids'])
+        self.assertEqual({word['BlockType'] for word in words}, {'WORD'})
+        self.assertEqual([word['Relationships'] for word in words], [[]] * len(words))